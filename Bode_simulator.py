@@ -1,244 +1,627 @@
+import sys
+import time
+import traceback
+
+# Mốc đo thời gian khởi động (xem --startup-report)
+_T_START = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import numpy as np
-import matplotlib.pyplot as plt
+# Figure + canvas TkAgg dựng trực tiếp, không qua pyplot (không nạp trình quản lý figure/backend của pyplot).
+# bode_montecarlo (multiprocessing, concurrent.futures) chỉ được import khi mở hộp thoại Monte Carlo.
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from scipy import signal
-
-# --- CLASS HỖ TRỢ THANH CUỘN ---
-class ScrollableFrame(ttk.Frame):
-    def __init__(self, container, *args, **kwargs):
-        super().__init__(container, *args, **kwargs)
-        canvas = tk.Canvas(self, height=300) 
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = ttk.Frame(canvas)
-        self.scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+from matplotlib.figure import Figure
 
-# --- WIDGET DÙNG CHUNG CHO POLE VÀ ZERO ---
-class ComponentRowWidget:
-    def __init__(self, parent, c_type, index, initial_r, initial_c, update_callback, remove_callback, reorder_callback):
-        self.update_callback = update_callback
-        self.remove_callback = remove_callback
-        self.reorder_callback = reorder_callback
-        self.index = index
-        self.c_type = c_type # "P" hoặc "Z"
-        
-        self.frame = ttk.Frame(parent)
-        self.frame.pack(fill=tk.X, pady=2)
-        
-        self.lbl_idx = ttk.Label(self.frame, text=f"{c_type}{index+1}", width=3, font=("Arial", 9, "bold"))
-        self.lbl_idx.pack(side=tk.LEFT, padx=(0, 5))
-
-        ttk.Label(self.frame, text="R:").pack(side=tk.LEFT)
-        self.var_r = tk.StringVar(value=str(initial_r))
-        self.entry_r = ttk.Entry(self.frame, textvariable=self.var_r, width=7)
-        self.entry_r.pack(side=tk.LEFT, padx=1)
-        self.entry_r.bind('<Return>', self.on_change)
-        self.entry_r.bind('<FocusOut>', self.on_change)
-
-        ttk.Label(self.frame, text="C:").pack(side=tk.LEFT)
-        self.var_c = tk.StringVar(value=f"{initial_c:.2e}")
-        self.entry_c = ttk.Entry(self.frame, textvariable=self.var_c, width=7)
-        self.entry_c.pack(side=tk.LEFT, padx=1)
-        self.entry_c.bind('<Return>', self.on_change)
-        self.entry_c.bind('<FocusOut>', self.on_change)
-
-        ttk.Label(self.frame, text="Hz:").pack(side=tk.LEFT)
-        initial_f = 1.0 / (2 * np.pi * initial_r * initial_c) if initial_c > 0 and initial_r > 0 else 0
-        self.var_f = tk.StringVar(value=f"{initial_f:.1f}")
-        self.entry_f = ttk.Entry(self.frame, textvariable=self.var_f, width=7)
-        self.entry_f.pack(side=tk.LEFT, padx=1)
-        self.entry_f.bind('<Return>', self.on_change_f)
-        self.entry_f.bind('<FocusOut>', self.on_change_f)
-
-        self.btn_del = ttk.Button(self.frame, text="X", width=2, command=lambda: remove_callback(self))
-        self.btn_del.pack(side=tk.LEFT, padx=5)
-
-    def get_values(self):
-        try:
-            r = float(self.var_r.get())
-            c = float(self.var_c.get())
-            return r, c
-        except ValueError:
-            return 1000, 1e-6
+import bode_engine
+import bode_export
+import bode_miller
+import bode_model
+import bode_plot
+import bode_profiling
+import bode_rootlocus
+import bode_views
+import bode_worker
 
-    def set_values(self, r, c, f=None):
-        self.var_r.set(f"{r:.0f}")
-        self.var_c.set(f"{c:.2e}")
-        if f is None:
-            f = 1.0 / (2 * np.pi * r * c)
-        self.var_f.set(f"{f:.1f}")
+_T_IMPORTED = time.perf_counter()
 
-    def get_freq(self):
-        try:
-            r = float(self.var_r.get())
-            c = float(self.var_c.get())
-            if r <= 0 or c <= 0: return 0
-            return 1.0 / (2 * np.pi * r * c)
-        except ValueError:
-            return 0
+# Giới hạn tốc độ vẽ lại khi kéo (~60 fps)
+FRAME_INTERVAL_MS = 16
 
-    def on_change(self, event=None):
-        try:
-            r = float(self.var_r.get())
-            c = float(self.var_c.get())
-            if r <= 0 or c <= 0: return
-            f = 1.0 / (2 * np.pi * r * c)
-            self.var_f.set(f"{f:.1f}")
-            self.reorder_callback()
-        except ValueError:
-            pass
+# Chu kỳ hỏi kết quả từ luồng tính toán nền (ms)
+WORKER_POLL_MS = 4
 
-    def on_change_f(self, event=None):
-        try:
-            f = float(self.var_f.get())
-            r = float(self.var_r.get())
-            if f <= 0 or r <= 0: return
-            c = 1.0 / (2 * np.pi * r * f)
-            self.var_c.set(f"{c:.2e}")
-            self.reorder_callback()
-        except ValueError:
-            pass
+# Chu kỳ hỏi tiến độ Monte Carlo (ms)
+MC_POLL_MS = 100
 
-    def update_from_drag(self, new_f):
+# Các tab đồ thị phụ; nội dung (Figure, widget) chỉ dựng khi tab được chọn lần đầu
+SIDE_TABS = ("Root Locus", "Nyquist", "Nichols", "Đáp ứng thời gian")
+
+# --- DANH SÁCH POLE/ZERO ---
+class ComponentListView:
+    # Mỗi Pole/Zero là một item của Treeview (không phải một hàng widget), Tk chỉ vẽ các
+    # hàng đang hiển thị. Item "P3" luôn là hàng thứ 3 của model: sắp xếp lại chỉ cần ghi
+    # lại giá trị các hàng đổi, không phải pack lại widget. Sửa ô bằng một Entry dùng chung.
+    COLUMNS = ("R", "C_base", "Freq")
+
+    def __init__(self, parent, model, edit_callback, remove_callback):
+        self.model = model
+        self.edit_callback = edit_callback      # (c_type, index, r, c)
+        self.remove_callback = remove_callback  # (c_type, index)
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=self.COLUMNS, show="tree headings", height=15, selectmode="browse")
+        self.tree.heading("#0", text="Idx")
+        self.tree.column("#0", width=45, stretch=False)
+        for col in self.COLUMNS:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=75, anchor=tk.E)
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind('<Double-1>', self.begin_edit)
+        self.tree.bind('<Delete>', lambda e: self.remove_selected())
+        self.editor = None
+        # Giá trị đang hiển thị của từng item, để chỉ cập nhật hàng thay đổi
+        self._shown = {}
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    @staticmethod
+    def _row_values(r, c):
+        f = 1.0 / (2 * np.pi * r * c)
+        return (f"{r:.0f}", f"{c:.2e}", f"{f:.1f}")
+
+    def refresh_row(self, c_type, index):
+        iid = f"{c_type}{index}"
+        vals = self._row_values(*self.model.get_values(c_type, index))
+        if self._shown.get(iid) != vals:
+            self.tree.item(iid, values=vals)
+            self._shown[iid] = vals
+
+    def refresh(self):
+        # Đồng bộ toàn bộ danh sách với model: thêm/xóa item ở cuối, ghi lại hàng đổi giá trị
+        n_poles = self.model.count("P")
+        for c_type in ("P", "Z"):
+            n = self.model.count(c_type)
+            for i in range(n):
+                iid = f"{c_type}{i}"
+                if iid not in self._shown:
+                    pos = i if c_type == "P" else n_poles + i
+                    vals = self._row_values(*self.model.get_values(c_type, i))
+                    self.tree.insert("", pos, iid=iid, text=f"{c_type}{i+1}", values=vals)
+                    self._shown[iid] = vals
+                else:
+                    self.refresh_row(c_type, i)
+            i = n
+            while f"{c_type}{i}" in self._shown:
+                self.tree.delete(f"{c_type}{i}")
+                del self._shown[f"{c_type}{i}"]
+                i += 1
+
+    @staticmethod
+    def _parse_iid(iid):
+        return iid[0], int(iid[1:])
+
+    def remove_selected(self):
+        sel = self.tree.selection()
+        if sel:
+            self.remove_callback(*self._parse_iid(sel[0]))
+
+    # --- SỬA TRỰC TIẾP TRÊN Ô ---
+    def begin_edit(self, event):
+        iid = self.tree.identify_row(event.y)
+        col = self.tree.identify_column(event.x)
+        if not iid or col == "#0": return
+        bbox = self.tree.bbox(iid, col)
+        if not bbox: return
+        self.cancel_edit()
+        x, y, w, h = bbox
+        self.editor = ttk.Entry(self.tree)
+        self.editor.place(x=x, y=y, width=w, height=h)
+        self.editor.insert(0, self.tree.set(iid, col))
+        self.editor.select_range(0, tk.END)
+        self.editor.focus_set()
+        self.editor.bind('<Return>', lambda e: self.commit_edit(iid, col))
+        self.editor.bind('<FocusOut>', lambda e: self.commit_edit(iid, col))
+        self.editor.bind('<Escape>', lambda e: self.cancel_edit())
+
+    def cancel_edit(self):
+        if self.editor is not None:
+            editor, self.editor = self.editor, None
+            editor.destroy()
+
+    def commit_edit(self, iid, col):
+        if self.editor is None: return
+        text = self.editor.get()
+        self.cancel_edit()
+        c_type, index = self._parse_iid(iid)
+        r, c = self.model.get_values(c_type, index)
         try:
-            r = float(self.var_r.get())
-            if new_f <= 0: return
-            c = 1.0 / (2 * np.pi * r * new_f)
-            self.var_f.set(f"{new_f:.1f}")
-            self.var_c.set(f"{c:.2e}")
+            value = float(text)
         except ValueError:
-            pass
-
-    def destroy(self):
-        self.frame.destroy()
+            return
+        if value <= 0: return
+        column = self.COLUMNS[int(col[1:]) - 1]
+        if column == "R":
+            r = value
+        elif column == "C_base":
+            c = value
+        else:
+            # Nhập tần số: giữ R, tính lại C
+            c = float(f"{1.0 / (2 * np.pi * r * value):.2e}")
+        if (r, c) != self.model.get_values(c_type, index):
+            self.edit_callback(c_type, index, r, c)
 
 # --- QUẢN LÝ HỆ THỐNG ---
+def _model_property(name):
+    # Thuộc tính của SystemManager đọc/ghi thẳng vào SystemModel
+    return property(lambda self: getattr(self.model, name),
+                    lambda self, value: setattr(self.model, name, value))
+
+
 class SystemManager:
-    def __init__(self, name, color, line_style):
+    gain_val = _model_property("gain_val")
+    miller_mode = _model_property("miller_mode")
+    miller_av2 = _model_property("miller_av2")
+    cc_val = _model_property("cc_val")
+    beta = _model_property("beta")
+
+    def __init__(self, key, name, color, line_style):
+        self.key = key
         self.name = name
         self.color = color
         self.line_style = line_style
-        self.active = False
-        self.gain_val = 10000000.0 
-        
-        self.pole_widgets = [] 
-        self.zero_widgets = [] 
-        
-        self.container_frame = None 
+        self.tab = None
+        # Dữ liệu gốc nằm trong model (mảng NumPy); các widget chỉ là phần hiển thị
+        self.model = bode_model.SystemModel(gain_val=10000000.0)
         
+        # Danh sách Pole/Zero trên giao diện (ComponentListView)
+        self.list_view = None
+
         # Miller Variables
         self.var_miller = None 
-        self.miller_mode = False
-        self.miller_av2 = 100.0
-        self.cc_val = 0.0
         self.entry_cc = None 
         self.lbl_cin = None
         self.lbl_cout = None
-        self.base_poles = [] 
 
     def get_poles_rad(self):
-        # Trả về list các Pole (rad/s)
-        pole_rads = []
-        
-        c_miller_in = 0.0
-        c_miller_out = 0.0
-        if self.miller_mode:
-            c_miller_in = self.cc_val * (1 + self.miller_av2)
-            c_miller_out = self.cc_val * (1 + 1.0/self.miller_av2)
-
-        for i, widget in enumerate(self.pole_widgets):
-            r, c_base = widget.get_values()
-            c_total = c_base
-            if self.miller_mode:
-                if i == 0: c_total += c_miller_in
-                elif i == 1: c_total += c_miller_out
-            
-            w = 1.0/(r*c_total)
-            pole_rads.append(-w) 
-            
-        return sorted(pole_rads, key=lambda x: abs(x))
+        # Trả về mảng các Pole (rad/s), sắp theo |p|
+        return self.model.poles_rad()
 
     def get_zeros_rad(self):
-        # Trả về list các Zero (rad/s) - RHP Zero có phần thực dương
-        zero_rads = []
-        for widget in self.zero_widgets:
-            r, c = widget.get_values()
-            w = 1.0/(r*c)
-            zero_rads.append(w) 
-        return sorted(zero_rads)
-
-    def reorder_widgets(self):
-        if not self.container_frame: return
-        
-        # Sort Poles
-        self.pole_widgets.sort(key=lambda w: w.get_freq())
-        for i, widget in enumerate(self.pole_widgets):
-            widget.frame.pack_forget()
-            widget.frame.pack(fill=tk.X, pady=2)
-            widget.lbl_idx.config(text=f"P{i+1}")
-            widget.index = i
-            
-        # Sort Zeros
-        self.zero_widgets.sort(key=lambda w: w.get_freq())
-        for i, widget in enumerate(self.zero_widgets):
-            widget.frame.pack_forget()
-            widget.frame.pack(fill=tk.X, pady=2)
-            widget.lbl_idx.config(text=f"Z{i+1}")
-            widget.index = i
+        # Trả về mảng các Zero (rad/s) - RHP Zero có phần thực dương
+        return self.model.zeros_rad()
+
+    def reorder_rows(self):
+        # Sắp xếp dữ liệu trong model theo tần số rồi ghi lại các hàng đổi giá trị
+        for c_type in ("P", "Z"):
+            self.model.sort(c_type)
+        self.refresh_rows()
+
+    def refresh_rows(self):
+        if self.list_view is not None:
+            self.list_view.refresh()
+
+# --- CỬA SỔ PHÂN TÍCH MONTE CARLO ---
+class MonteCarloDialog:
+    # Lấy mẫu dung sai cho một hệ trên process pool; tiến độ được hỏi bằng root.after
+    # nên giao diện chính vẫn kéo/vẽ bình thường trong lúc chạy
+    def __init__(self, app, system):
+        import bode_montecarlo
+        self.mc = bode_montecarlo
+        self.app = app
+        self.system = system
+        self.run = None
+        self._poll_job = None
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title(f"Monte Carlo dung sai - {system.name}")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        form = ttk.Frame(self.win, padding=10)
+        form.pack(side=tk.LEFT, fill=tk.Y)
+        self.vars = {}
+        for key, label, default in [("n", "Số mẫu:", "10000"), ("r", "Dung sai R (%):", "5"),
+                                    ("c", "Dung sai C (%):", "10"), ("av2", "Dung sai Av2 (%):", "0"),
+                                    ("cc", "Dung sai Cc (%):", "0")]:
+            ttk.Label(form, text=label).pack(anchor=tk.W)
+            self.vars[key] = tk.StringVar(value=default)
+            ttk.Entry(form, textvariable=self.vars[key], width=12).pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(form, text="Phân bố (normal: ±tol = 3σ):").pack(anchor=tk.W)
+        self.var_dist = tk.StringVar(value="uniform")
+        ttk.Combobox(form, textvariable=self.var_dist, values=self.mc.DISTRIBUTIONS,
+                     state="readonly", width=10).pack(fill=tk.X, pady=(0, 5))
+        # Ghi đáp ứng + chỉ số của từng mẫu ra file memmap (mỗi process ghi vùng riêng)
+        self.var_export = tk.BooleanVar(value=False)
+        ttk.Checkbutton(form, text="Ghi đáp ứng từng mẫu (.bodemm)", variable=self.var_export).pack(anchor=tk.W, pady=(0, 10))
+
+        self.btn_run = ttk.Button(form, text="Chạy", command=self.start)
+        self.btn_run.pack(fill=tk.X, pady=2)
+        ttk.Button(form, text="Hủy", command=self.cancel).pack(fill=tk.X, pady=2)
+        self.progress = ttk.Progressbar(form, orient=tk.HORIZONTAL, mode="determinate", maximum=100)
+        self.progress.pack(fill=tk.X, pady=5)
+        self.lbl_status = ttk.Label(form, text="", justify=tk.LEFT)
+        self.lbl_status.pack(anchor=tk.W)
+
+        self.fig = Figure(figsize=(6, 4))
+        self.ax_pm, self.ax_fc = self.fig.subplots(2, 1)
+        self.fig.subplots_adjust(hspace=0.5)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.win)
+        self.canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+
+    def start(self):
+        if self.run is not None: return
+        try:
+            n = int(self.vars["n"].get())
+            spec = self.mc.ToleranceSpec(
+                r_pct=float(self.vars["r"].get()), c_pct=float(self.vars["c"].get()),
+                av2_pct=float(self.vars["av2"].get()), cc_pct=float(self.vars["cc"].get()),
+                distribution=self.var_dist.get())
+        except ValueError:
+            messagebox.showerror("Lỗi", "Giá trị không hợp lệ.", parent=self.win)
+            return
+        trace = self.app.traces.get(self.system.key)
+        if trace is None or n <= 0: return
+        export_path = None
+        if self.var_export.get():
+            export_path = filedialog.asksaveasfilename(parent=self.win, title="Lưu đáp ứng các mẫu",
+                                                       defaultextension=".bodemm", filetypes=[("Memmap", "*.bodemm")])
+            if not export_path: return
+        self.snapshot = self.system.model.to_dict()
+        self.run = self.mc.MonteCarloRun(self.system.model, trace.resp.f, spec, n, export_path=export_path).start()
+        self.lbl_status.config(text="Đang chạy...")
+        self._poll_job = self.app.root.after(MC_POLL_MS, self.poll)
+
+    def poll(self):
+        self._poll_job = None
+        try:
+            done, total = self.run.progress()
+            self.progress["value"] = 100.0 * done / max(total, 1)
+            if not self.run.finished():
+                self._poll_job = self.app.root.after(MC_POLL_MS, self.poll)
+                return
+            res = self.run.result()
+        except Exception as e:
+            # Không để lỗi thoát ra vòng lặp Tk: dừng lần chạy, cho phép bấm "Chạy" lại
+            self.run.cancel()
+            self.run = None
+            self.lbl_status.config(text=f"Lỗi: {e}")
+            return
+        self.run = None
+        self.show_result(res)
+
+    def cancel(self):
+        if self.run is None: return
+        if self._poll_job is not None:
+            self.app.root.after_cancel(self._poll_job)
+            self._poll_job = None
+        self.run.cancel()
+        res = self.run.result()
+        self.run = None
+        if res.n_samples:
+            self.show_result(res)
+        else:
+            self.lbl_status.config(text="Đã hủy.")
+
+    def show_result(self, res):
+        if res.n_samples == 0:
+            # Mọi lô đều lỗi: không có gì để vẽ
+            self.lbl_status.config(text="Lỗi: " + "\n".join(res.errors) if res.errors else "Không có mẫu nào.")
+            return
+        stats = res.summary()
+        lines = [f"Số mẫu: {res.n_samples}"]
+        if res.errors:
+            lines.append(f"Có lô bị lỗi: {'; '.join(res.errors)}")
+        for key, label, fmt in [("pm_deg", "PM (°)", ".1f"), ("fc_hz", "fc (Hz)", ".3g"), ("gm_db", "GM (dB)", ".1f")]:
+            st = stats[key]
+            if st is None:
+                lines.append(f"{label}: N/A")
+            else:
+                lines.append(f"{label}: {st['min']:{fmt}} .. {st['max']:{fmt}} (P5 {st['p5']:{fmt}}, P95 {st['p95']:{fmt}})")
+        self.lbl_status.config(text="\n".join(lines))
+
+        for ax, data, title in [(self.ax_pm, res.pm, "Phân bố PM (deg)"), (self.ax_fc, res.fc, "Phân bố fc (Hz)")]:
+            ax.clear()
+            data = data[np.isfinite(data)]
+            if len(data):
+                ax.hist(data, bins=50, color=self.system.color, alpha=0.7)
+            ax.set_title(title, fontsize=9)
+        self.canvas.draw()
+
+        # Dải bao biên độ/pha trên đồ thị chính, giữ đến khi hệ bị sửa
+        self.app.mc_snapshots[self.system.key] = self.snapshot
+        self.app.plot_view.set_envelope(self.system.key, res.f, res.mag_lo, res.mag_hi, res.phase_lo, res.phase_hi)
+        self.app.canvas.draw()
+
+    def close(self):
+        self.cancel()
+        self.win.destroy()
+
+
+# --- TAB ROOT LOCUS ---
+class RootLocusPanel:
+    # Quét Gain DC hoặc Cc của hệ đang chọn; pole vòng kín của mọi điểm quét được giải chung một lần
+    PARAMS = ("Gain DC", "Cc (Miller)")
+    # Phải quét lại toàn bộ nên không cập nhật ở khung nhanh khi kéo
+    LIVE = False
+
+    def __init__(self, app, frame):
+        self.app = app
+        self.frame = frame
+        controls = ttk.Frame(self.frame, padding=5)
+        controls.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(controls, text="Quét:").pack(side=tk.LEFT)
+        self.var_param = tk.StringVar(value=self.PARAMS[0])
+        ttk.Combobox(controls, textvariable=self.var_param, values=self.PARAMS, state="readonly",
+                     width=12).pack(side=tk.LEFT, padx=2)
+        self.var_from = tk.StringVar(value="")
+        self.var_to = tk.StringVar(value="")
+        self.var_n = tk.StringVar(value="400")
+        for label, var in [("Từ:", self.var_from), ("Đến:", self.var_to), ("Số điểm:", self.var_n)]:
+            ttk.Label(controls, text=label).pack(side=tk.LEFT, padx=(10, 0))
+            ttk.Entry(controls, textvariable=var, width=9).pack(side=tk.LEFT, padx=2)
+        ttk.Button(controls, text="Tính", command=lambda: self.refresh(app.selected_system(), warn=True)).pack(side=tk.LEFT, padx=10)
+        ttk.Label(controls, text="(để trống Từ/Đến: tự chọn khoảng)", foreground="gray").pack(side=tk.LEFT)
+
+        self.fig = Figure(figsize=(8, 6))
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.view = bode_views.RootLocusView(self.fig)
+
+    def sweep_values(self, param, system):
+        if param == "cc":
+            lo, hi = bode_miller.CC_MIN, bode_miller.CC_MAX
+        else:
+            lo, hi = system.gain_val / 1e3, system.gain_val * 1e2
+        lo = float(self.var_from.get()) if self.var_from.get().strip() else lo
+        hi = float(self.var_to.get()) if self.var_to.get().strip() else hi
+        n = max(int(self.var_n.get()), 2)
+        return np.logspace(np.log10(lo), np.log10(hi), n)
+
+    def refresh(self, system, warn=False):
+        if system is None: return
+        param = "cc" if self.var_param.get() == self.PARAMS[1] else "gain"
+        if param == "cc" and system.model.count("P") < 2:
+            if warn: messagebox.showwarning("Cảnh báo", "Cần ít nhất 2 Pole (P1, P2) để quét Cc.")
+            return
+        try:
+            values = self.sweep_values(param, system)
+        except ValueError:
+            if warn: messagebox.showerror("Lỗi", "Khoảng quét không hợp lệ.")
+            return
+        if param == "cc":
+            sweep = bode_rootlocus.sweep_cc
+            current = system.cc_val if system.miller_mode else 0.0
+        else:
+            sweep = bode_rootlocus.sweep_gain
+            current = system.gain_val
+        # Giải pole vòng kín + dò nhánh trên luồng nền với bản sao model; vẽ khi có kết quả
+        model = system.model.copy()
+        self.app.submit_task("root_locus", lambda: sweep(model, values),
+                             lambda locus: self.present(locus, system, current))
+
+    def present(self, locus, system, current):
+        if system not in self.app.systems: return
+        trace = self.app.traces.get(system.key)
+        pm = trace.metrics.pm if trace is not None else None
+        self.view.render(locus, system, current, pm)
+
+    def show(self):
+        self.refresh(self.app.selected_system())
+
+
+# --- TAB NYQUIST / NICHOLS ---
+class CurveViewPanel:
+    # Vẽ lại từ đáp ứng đã có trong app.traces nên chuyển tab không phải tính gì thêm
+    LIVE = True
+
+    def __init__(self, app, frame, view_cls):
+        self.app = app
+        self.frame = frame
+        self.fig = Figure(figsize=(8, 6))
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.view = view_cls(self.fig)
+
+    def traces(self):
+        return [self.app.traces[s.key] for s in self.app.systems if s.key in self.app.traces]
+
+    def refresh(self):
+        self.view.render(self.traces())
+
+    def show(self):
+        self.refresh()
+
+
+class TimeResponsePanel(CurveViewPanel):
+    # Chọn vòng hở/vòng kín, bước/xung; pole/zero lấy từ trace nên theo kịp khi kéo
+    def __init__(self, app, frame):
+        super().__init__(app, frame, bode_views.TimeResponseView)
+        controls = ttk.Frame(self.frame, padding=5)
+        controls.pack(side=tk.TOP, fill=tk.X, before=self.canvas.get_tk_widget())
+        ttk.Label(controls, text="Hiển thị:").pack(side=tk.LEFT)
+        modes = bode_views.TimeResponseView.MODES
+        self.var_mode = tk.StringVar(value=modes[self.view.mode])
+        combo = ttk.Combobox(controls, textvariable=self.var_mode, values=list(modes.values()), state="readonly", width=18)
+        combo.pack(side=tk.LEFT, padx=2)
+        combo.bind('<<ComboboxSelected>>', lambda e: self.set_mode(self.var_mode.get()))
+
+    def set_mode(self, label):
+        self.view.mode = next(k for k, v in bode_views.TimeResponseView.MODES.items() if v == label)
+        self.refresh()
+
+    def refresh(self):
+        # Đáp ứng thời gian (phân thức từng phần / expm) tính trên luồng nền; trace là ảnh chụp bất biến
+        traces, mode = self.traces(), self.view.mode
+        self.app.submit_task("time_response", lambda: bode_views.TimeResponseView.compute(traces, mode),
+                             lambda responses: self.present(traces, mode, responses))
+
+    def present(self, traces, mode, responses):
+        if mode != self.view.mode: return
+        self.view.render(traces, responses)
+
+
+class FrameRequest:
+    # Ảnh chụp trạng thái (chỉ gồm mảng bất biến) để luồng nền tính đáp ứng + chỉ số
+    # mà không đọc widget hay model đang bị sửa trên luồng chính
+    def __init__(self, compute, fast, systems, grid_systems, adaptive, budget, dirty, old_traces, fixed):
+        self.compute = compute
+        self.fast = fast
+        self.systems = systems            # [(sys, gain, poles, zeros, beta)]
+        self.grid_systems = grid_systems  # [(gain, poles, zeros)] dùng để dựng lưới tần số
+        self.adaptive = adaptive
+        self.budget = budget
+        self.dirty = dirty
+        self.old_traces = old_traces
+        self.fixed = fixed                # {key: BodeResponse} đã có sẵn (vd. tra bảng Cc)
+        self.t_request = time.perf_counter()
+
+    def __call__(self):
+        return self, self.compute(self)
+
+    def absorb(self, older):
+        # Yêu cầu vẽ đầy đủ không được mất khi bị thay bằng một khung hình kéo
+        self.fast = self.fast and older.fast
+
 
 # --- APP CHÍNH ---
 class BodePlotterApp:
-    def __init__(self, root):
+    def __init__(self, root, threaded=True, report_startup=False, profile=False):
+        # Thời gian khởi động theo từng giai đoạn (s); in ra khi vẽ xong khung đầu tiên nếu report_startup
+        t0 = time.perf_counter()
+        self.startup_times = {"imports": _T_IMPORTED - _T_START, "tk_root": t0 - _T_IMPORTED}
+        self.report_startup = report_startup
+        self._startup_pending = True
+        # Đo thời gian từng giai đoạn (tắt mặc định, bật bằng --profile hoặc ô chọn "Đo thời gian")
+        self.profiler = bode_profiling.Profiler(enabled=profile)
         self.root = root
         self.root.title("Advanced Bode Simulator (Poles & RHP Zeros)")
         self.root.geometry("1400x900")
 
-        self.sys1 = SystemManager("Av1", "blue", "-")
-        self.sys1.active = True
-        self.sys2 = SystemManager("Av2", "orange", "-.")
+        # Danh sách hệ thống so sánh (Av1, Av2, ...), thêm/xóa tùy ý
+        self.systems = []
+        self._next_system_id = 1
 
         self.dragging_sys = None
-        self.dragging_widget = None
+        self.dragging_item = None
         self.cursor_annotation = None 
         self.plot_data = {} 
 
+        # Bộ lập lịch: gom mọi yêu cầu cập nhật thành một lần tính + vẽ
+        self.redraw_stats = {"requested": 0, "executed": 0}
+        self.dirty_systems = set()
+        self.traces = {}
+        self._update_job = None
+        self._pending_full = False
+        self._pending_drag_f = None
+        self._last_frame_t = 0.0
+        # Chỉ mục marker pole/zero (dựng lại khi model đổi) và con trỏ đọc giá trị khi rê chuột
+        self._marker_index = None
+        self._marker_sig = None
+        self._hover_f = None
+        self._hover_job = None
+        # Cache LRU đáp ứng theo trạng thái hệ (gain, poles, zeros, lưới tần số)
+        self.response_cache = bode_engine.ResponseCache(maxsize=256)
+        # Mọi tính toán đáp ứng chạy trên luồng nền; luồng chính chỉ vẽ
+        self.worker = bode_worker.ComputeWorker(threaded=threaded)
+        self._worker_poll_job = None
+        # Việc nặng ngoài khung hình (root locus, đáp ứng thời gian, bảng/tổng hợp Cc): mỗi loại một worker,
+        # yêu cầu mới thay yêu cầu cũ cùng loại
+        self.task_workers = {}
+        self._inflight_dirty = set()
+        self._shown_version = 0
+        # Trạng thái hệ lúc chạy Monte Carlo, để bỏ dải bao khi hệ đã bị sửa
+        self.mc_snapshots = {}
+        # Thanh kéo Cc: bảng tra theo hệ và hệ đang được kéo (None nếu không kéo)
+        self.cc_tables = {}
+        self.scrub_system = None
+        self._scrub_waiting = None
+        self._refine_job = None
+
         # Control Panel
         control_panel = ttk.Frame(self.root, padding="10")
         control_panel.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
 
-        self.btn_add_av2 = ttk.Button(control_panel, text="+ Kích hoạt Av2", command=self.activate_av2)
-        self.btn_add_av2.pack(fill=tk.X, pady=(0, 10))
+        sys_btn_frame = ttk.Frame(control_panel)
+        sys_btn_frame.pack(fill=tk.X, pady=(0, 10))
+        ttk.Button(sys_btn_frame, text="+ Thêm hệ thống", command=self.add_system).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ttk.Button(sys_btn_frame, text="- Xóa hệ thống đang chọn", command=self.remove_selected_system).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ttk.Button(control_panel, text="Monte Carlo dung sai (hệ đang chọn)...",
+                   command=self.open_monte_carlo).pack(fill=tk.X, pady=(0, 5))
+        ttk.Button(control_panel, text="Xuất đáp ứng và chỉ số...",
+                   command=self.export_data).pack(fill=tk.X, pady=(0, 10))
+
+        # Lưới tần số thích ứng (làm dày quanh góc pole/zero và các điểm cắt)
+        grid_frame = ttk.Frame(control_panel)
+        grid_frame.pack(fill=tk.X, pady=(0, 10))
+        self.var_adaptive = tk.BooleanVar(value=False)
+        ttk.Checkbutton(grid_frame, text="Lưới tần số thích ứng", variable=self.var_adaptive,
+                        command=self.request_update).pack(side=tk.LEFT)
+        ttk.Label(grid_frame, text="Số điểm:").pack(side=tk.LEFT, padx=(10, 0))
+        self.var_grid_points = tk.StringVar(value="400")
+        entry_points = ttk.Entry(grid_frame, textvariable=self.var_grid_points, width=6)
+        entry_points.pack(side=tk.LEFT, padx=2)
+        entry_points.bind('<Return>', lambda e: self.request_update())
+
+        # Đo hiệu năng: thời gian từng giai đoạn + overlay, ghi trace / cProfile khi cần
+        perf_frame = ttk.Frame(control_panel)
+        perf_frame.pack(fill=tk.X, pady=(0, 10))
+        self.var_profile = tk.BooleanVar(value=profile)
+        ttk.Checkbutton(perf_frame, text="Đo thời gian", variable=self.var_profile,
+                        command=self.toggle_profiling).pack(side=tk.LEFT)
+        self.var_cprofile = tk.BooleanVar(value=False)
+        ttk.Checkbutton(perf_frame, text="cProfile", variable=self.var_cprofile,
+                        command=self.toggle_cprofile).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(perf_frame, text="Ghi trace...", command=self.dump_trace).pack(side=tk.RIGHT)
+
+        # Thanh trạng thái: lỗi từ luồng nền (chi tiết in ra stderr)
+        self.lbl_status = ttk.Label(control_panel, text="", foreground="red", wraplength=300, justify=tk.LEFT)
+        self.lbl_status.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.notebook = ttk.Notebook(control_panel)
         self.notebook.pack(fill=tk.BOTH, expand=True)
 
-        self.tab1 = ttk.Frame(self.notebook)
-        self.tab2 = ttk.Frame(self.notebook)
-        self.notebook.add(self.tab1, text='Hệ thống 1 (Av1)')
-        self.notebook.add(self.tab2, text='Hệ thống 2 (Av2)')
-
-        self.setup_tab(self.tab1, self.sys1)
-        self.setup_tab(self.tab2, self.sys2)
-        self.notebook.tab(1, state="disabled")
+        self.add_system()
+        t1 = time.perf_counter()
+        self.startup_times["controls"] = t1 - t0
 
         # Plot Frame
         plot_frame = ttk.Frame(self.root)
         plot_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
 
-        self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(8, 6), sharex=True)
+        self.fig = Figure(figsize=(8, 6))
+        self.ax1, self.ax2 = self.fig.subplots(2, 1, sharex=True)
         self.fig.subplots_adjust(left=0.08, bottom=0.08, right=0.95, top=0.92, hspace=0.35)
         
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
+        # Các tab đồ thị: Bode và các đồ thị phụ (tính lại khi tab đang hiển thị)
+        self.plot_notebook = ttk.Notebook(plot_frame)
+        self.plot_notebook.pack(fill=tk.BOTH, expand=True)
+        bode_tab = ttk.Frame(self.plot_notebook)
+        self.plot_notebook.add(bode_tab, text="Bode")
+        # Tab phụ chỉ có khung rỗng; side_panel() dựng nội dung khi tab được chọn lần đầu
+        self.side_tabs = {}
+        self.side_panels = {}
+        for name in SIDE_TABS:
+            self.side_tabs[name] = ttk.Frame(self.plot_notebook)
+            self.plot_notebook.add(self.side_tabs[name], text=name)
+        self.plot_notebook.bind('<<NotebookTabChanged>>', lambda e: self.refresh_side_views())
+        self.notebook.bind('<<NotebookTabChanged>>', lambda e: self.refresh_side_views())
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=bode_tab)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
+        self.plot_view = bode_plot.BodePlotView(self.fig, self.ax1, self.ax2, profiler=self.profiler)
+
         self.canvas.mpl_connect('button_press_event', self.on_press)
         self.canvas.mpl_connect('motion_notify_event', self.on_drag)
         self.canvas.mpl_connect('button_release_event', self.on_release)
+        self.canvas.mpl_connect('axes_leave_event', self.on_hover)
+        self._t_ready = time.perf_counter()
+        self.startup_times["figure"] = self._t_ready - t1
 
         self.update_plot()
 
@@ -255,6 +638,13 @@ class BodePlotterApp:
         gain_entry.bind('<FocusOut>', lambda e: self.update_gain(system, gain_entry))
         ttk.Button(top_frame, text="Cập nhật Gain", command=lambda: self.update_gain(system, gain_entry)).pack(fill=tk.X)
 
+        # Hồi tiếp beta: vẽ thêm Acl = A / (1 + beta*A) tính từ đáp ứng vòng hở đã có
+        ttk.Label(top_frame, text="Hệ số hồi tiếp β (trống = chỉ vòng hở):").pack(anchor=tk.W, pady=(5, 0))
+        beta_entry = ttk.Entry(top_frame)
+        beta_entry.pack(fill=tk.X, pady=5)
+        beta_entry.bind('<Return>', lambda e: self.update_beta(system, beta_entry))
+        beta_entry.bind('<FocusOut>', lambda e: self.update_beta(system, beta_entry))
+
         ttk.Separator(parent, orient='horizontal').pack(fill='x', pady=10)
 
         # Miller Frame
@@ -293,6 +683,27 @@ class BodePlotterApp:
         lbl_cout.pack(anchor=tk.W, padx=10)
         system.lbl_cout = lbl_cout
 
+        # Thanh kéo Cc (thang log): đáp ứng lấy từ bảng tra tính sẵn nên cập nhật tức thì
+        ttk.Label(miller_frame, text="Kéo Cc (log10 F):").pack(anchor=tk.W, pady=(5,0))
+        scale_cc = ttk.Scale(miller_frame, from_=np.log10(bode_miller.CC_MIN), to=np.log10(bode_miller.CC_MAX),
+                             orient=tk.HORIZONTAL, command=lambda v: self.on_cc_scrub(system, v))
+        scale_cc.pack(fill=tk.X)
+        scale_cc.bind('<ButtonPress-1>', lambda e: self.begin_cc_scrub(system))
+        scale_cc.bind('<ButtonRelease-1>', lambda e: self.end_cc_scrub(system))
+
+        # Tìm Cc tự động theo PM mục tiêu (fc tối thiểu là ràng buộc tùy chọn)
+        ttk.Label(miller_frame, text="PM mục tiêu (°):").pack(anchor=tk.W, pady=(5,0))
+        entry_pm = ttk.Entry(miller_frame)
+        entry_pm.insert(0, "60")
+        entry_pm.pack(fill=tk.X)
+        ttk.Label(miller_frame, text="fc tối thiểu (Hz, tùy chọn):").pack(anchor=tk.W, pady=(5,0))
+        entry_fc_min = ttk.Entry(miller_frame)
+        entry_fc_min.pack(fill=tk.X)
+        ttk.Button(miller_frame, text="Tìm Cc theo PM",
+                   command=lambda: self.synthesize_cc(system, entry_pm, entry_fc_min)).pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(miller_frame, text="Đường cong Cc–PM theo Av2...",
+                   command=lambda: self.show_cc_tradeoff(system)).pack(fill=tk.X, pady=(2, 0))
+
         ttk.Separator(parent, orient='horizontal').pack(fill='x', pady=10)
 
         # Buttons Panel
@@ -301,21 +712,18 @@ class BodePlotterApp:
         ttk.Button(btn_frame, text="+ Thêm Pole", command=lambda: self.add_component(system, "P")).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
         ttk.Button(btn_frame, text="+ Thêm Zero (RHP)", command=lambda: self.add_component(system, "Z")).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
 
-        lbl_header = ttk.Frame(parent)
-        lbl_header.pack(fill=tk.X)
-        ttk.Label(lbl_header, text="Idx", width=4).pack(side=tk.LEFT)
-        ttk.Label(lbl_header, text="R", width=9).pack(side=tk.LEFT)
-        ttk.Label(lbl_header, text="C_base", width=9).pack(side=tk.LEFT)
-        ttk.Label(lbl_header, text="Freq", width=9).pack(side=tk.LEFT)
-
-        scroll_container = ScrollableFrame(parent)
-        scroll_container.pack(fill=tk.BOTH, expand=True)
-        system.container_frame = scroll_container.scrollable_frame 
+        list_view = ComponentListView(parent, system.model,
+                                      edit_callback=lambda c_type, idx, r, c: self.handle_component_edit(system, c_type, idx, r, c),
+                                      remove_callback=lambda c_type, idx: self.remove_component(system, c_type, idx))
+        ttk.Button(parent, text="- Xóa dòng đang chọn (Delete)", command=list_view.remove_selected).pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(parent, text="Nhấn đúp vào ô để sửa R, C hoặc tần số.", foreground="gray").pack(anchor=tk.W)
+        list_view.pack(fill=tk.BOTH, expand=True)
+        system.list_view = list_view
 
     def toggle_miller(self, system, entry_av2, entry_cc):
         system.miller_mode = system.var_miller.get()
         if system.miller_mode:
-            if len(system.pole_widgets) < 2:
+            if system.model.count("P") < 2:
                 messagebox.showwarning("Cảnh báo", "Cần ít nhất 2 Pole (P1, P2) để chạy chế độ Miller.")
                 system.var_miller.set(False)
                 system.miller_mode = False
@@ -325,15 +733,13 @@ class BodePlotterApp:
             entry_cc.config(state="normal")
             
             try:
-                system.miller_av2 = float(entry_av2.get())
-            except:
+                system.miller_av2, _ = bode_model.check_miller(entry_av2.get(), 0.0)
+            except ValueError:
                 system.miller_av2 = 100.0
+                entry_av2.delete(0, tk.END)
+                entry_av2.insert(0, "100")
 
-            system.base_poles = []
-            system.reorder_widgets()
-            for w in system.pole_widgets:
-                r, c = w.get_values()
-                system.base_poles.append((r, c))
+            system.reorder_rows()
             
             system.cc_val = 0.0
             entry_cc.delete(0, tk.END)
@@ -345,148 +751,344 @@ class BodePlotterApp:
             system.lbl_cin.config(text="Cin_m: 0.00 pF")
             system.lbl_cout.config(text="Cout_m: 0.00 pF")
             
-        self.update_plot()
+        self.request_update(system)
 
     def update_miller_params_from_entry(self, system, entry_av2, entry_cc):
         if not system.miller_mode: return
         try:
-            av2 = float(entry_av2.get())
             cc_str = entry_cc.get()
-            cc = float(cc_str) if cc_str else 0.0
-            
-            if av2 <= 0: av2 = 1.0
-            if cc < 0: cc = 0.0
+            av2, cc = bode_model.check_miller(entry_av2.get(), cc_str or 0.0)
+            if (av2, cc) == (system.miller_av2, system.cc_val): return
 
             system.miller_av2 = av2
             system.cc_val = cc
             
             self.update_miller_display(system)
-            self.update_plot()
+            self.request_update(system)
         except ValueError:
-            pass
+            # Av2 <= 0 hoặc Cc < 0 bị từ chối (cùng quy tắc với file thiết kế): trả ô nhập về giá trị đang dùng
+            entry_av2.delete(0, tk.END)
+            entry_av2.insert(0, f"{system.miller_av2:g}")
+            entry_cc.delete(0, tk.END)
+            entry_cc.insert(0, f"{system.cc_val:.3e}")
             
+    # --- THANH KÉO Cc ---
+    def begin_cc_scrub(self, system):
+        if not system.miller_mode: return
+        table = self.cc_tables.get(system.key)
+        if table is not None and table.matches(system.model):
+            self._start_cc_scrub(system)
+            return
+        # Dựng bảng tra trên luồng nền; trong lúc chờ, thanh kéo cập nhật đầy đủ như khi nhập Cc
+        self._scrub_waiting = system
+        model = system.model.copy()
+        self.submit_task("cc_table", lambda: bode_miller.CcScrubTable(model),
+                         lambda table: self._cc_table_ready(system, table))
+
+    def _cc_table_ready(self, system, table):
+        self.cc_tables[system.key] = table
+        if self._scrub_waiting is system:
+            self._scrub_waiting = None
+            if system.miller_mode and table.matches(system.model):
+                self._start_cc_scrub(system)
+
+    def _start_cc_scrub(self, system):
+        self.scrub_system = system
+        self.plot_view.begin_interaction(system.key)
+        self.canvas.draw()
+
+    def on_cc_scrub(self, system, value):
+        if not system.miller_mode: return
+        system.cc_val = 10 ** float(value)
+        system.entry_cc.delete(0, tk.END)
+        system.entry_cc.insert(0, f"{system.cc_val:.3e}")
+        self.update_miller_display(system)
+        # Không nhấn giữ (vd. bàn phím): cập nhật đầy đủ như khi nhập Cc
+        self.request_update(system, fast=self.scrub_system is system)
+
+    def end_cc_scrub(self, system):
+        if self._scrub_waiting is system:
+            self._scrub_waiting = None
+        if self.scrub_system is not system: return
+        self.scrub_system = None
+        self.plot_view.end_interaction()
+        # Vị trí cuối được tính chính xác (không nội suy)
+        self.request_update(system)
+
+    def _refine_cc_table(self):
+        # Tinh chỉnh bảng tra lúc rảnh, vài nút mỗi lần để không chặn khung hình
+        self._refine_job = None
+        system = self.scrub_system
+        if system is None: return
+        table = self.cc_tables[system.key]
+        table.refine(max_new=4)
+        if table.has_pending():
+            self._refine_job = self.root.after_idle(self._refine_cc_table)
+
+    def set_cc(self, system, cc):
+        system.cc_val = cc
+        system.entry_cc.delete(0, tk.END)
+        system.entry_cc.insert(0, f"{cc:.3e}")
+        self.update_miller_display(system)
+        self.request_update(system)
+
+    def synthesize_cc(self, system, entry_pm, entry_fc_min):
+        if not system.miller_mode:
+            messagebox.showwarning("Cảnh báo", "Hãy bật chế độ Miller trước.")
+            return
+        try:
+            target_pm = float(entry_pm.get())
+            fc_str = entry_fc_min.get().strip()
+            target_fc = float(fc_str) if fc_str else None
+        except ValueError:
+            messagebox.showerror("Lỗi", "PM hoặc fc không hợp lệ.")
+            return
+        model = system.model.copy()
+        self.submit_task(f"solve_cc:{system.key}", lambda: bode_miller.solve_cc(model, target_pm, target_fc),
+                         lambda sol: self._cc_solved(system, sol, target_pm, target_fc))
+
+    def _cc_solved(self, system, sol, target_pm, target_fc):
+        if system not in self.systems or not system.miller_mode: return
+        if sol is None:
+            messagebox.showwarning("Không tìm được", f"Không có Cc trong [{bode_miller.CC_MIN:.0e}, {bode_miller.CC_MAX:.0e}] F "
+                                   f"đạt PM ≥ {target_pm:.1f}° với Av2 = {system.miller_av2:g}.")
+            return
+        self.set_cc(system, sol.cc)
+        if not sol.fc_ok:
+            messagebox.showwarning("Cảnh báo", f"Cc = {sol.cc:.3e} F đạt PM {sol.pm:.1f}° nhưng fc = {sol.fc:.3e} Hz "
+                                   f"thấp hơn fc tối thiểu {target_fc:.3e} Hz.")
+
+    def show_cc_tradeoff(self, system):
+        if system.model.count("P") < 2:
+            messagebox.showwarning("Cảnh báo", "Cần ít nhất 2 Pole (P1, P2) để bù Miller.")
+            return
+        av2_values = system.miller_av2 * np.array([0.1, 0.3, 1.0, 3.0, 10.0])
+        model = system.model.copy()
+        self.submit_task(f"cc_tradeoff:{system.key}", lambda: bode_miller.cc_pm_tradeoff(model, av2_values),
+                         lambda res: self._show_cc_tradeoff(system, av2_values, *res))
+
+    def _show_cc_tradeoff(self, system, av2_values, cc, pm, fc):
+        if system not in self.systems: return
+        win = tk.Toplevel(self.root)
+        win.title(f"Đánh đổi Cc–PM - {system.name}")
+        fig = Figure(figsize=(6, 5))
+        ax_pm, ax_fc = fig.subplots(2, 1, sharex=True)
+        for av2, pm_row, fc_row in zip(av2_values, pm, fc):
+            ax_pm.semilogx(cc, pm_row, label=f"Av2 = {av2:g}")
+            ax_fc.loglog(cc, fc_row)
+        if system.miller_mode and system.cc_val > 0:
+            for ax in (ax_pm, ax_fc):
+                ax.axvline(system.cc_val, color='k', ls=':')
+        ax_pm.set_ylabel("PM (deg)"); ax_pm.grid(True, which="major", alpha=0.5); ax_pm.legend(fontsize='small')
+        ax_fc.set_ylabel("fc (Hz)"); ax_fc.set_xlabel("Cc (F)"); ax_fc.grid(True, which="major", alpha=0.5)
+        canvas = FigureCanvasTkAgg(fig, master=win)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas.draw()
+
     def update_miller_display(self, system):
         c_in = system.cc_val * (1 + system.miller_av2)
         c_out = system.cc_val * (1 + 1.0/system.miller_av2)
         system.lbl_cin.config(text=f"Cin_m (P1): {c_in*1e12:.2f} pF")
         system.lbl_cout.config(text=f"Cout_m (P2): {c_out*1e12:.2f} pF")
 
+    def handle_component_edit(self, system, c_type, index, r, c):
+        with self.profiler.stage("edit"):
+            system.model.set_values(c_type, index, r, c)
+            self.handle_reorder_and_plot(system)
+
     def handle_reorder_and_plot(self, system):
         if not system.miller_mode:
-            system.reorder_widgets()
-        self.update_plot()
+            system.reorder_rows()
+        else:
+            system.refresh_rows()
+        self.request_update(system)
 
     def add_component(self, system, c_type):
         if c_type == "P":
-            target_list = system.pole_widgets
             def_r = 1000; def_c = 1e-6
-            if len(target_list) > 0:
-                pr, pc = target_list[-1].get_values()
+            n = system.model.count("P")
+            if n > 0:
+                pr, pc = system.model.get_values("P", n - 1)
                 def_c = pc / 10
         else: 
-            target_list = system.zero_widgets
             def_r = 1000; def_c = 1e-9 
 
-        idx = len(target_list)
-        new_widget = ComponentRowWidget(
-            system.container_frame, c_type, idx, def_r, def_c, 
-            update_callback=self.update_plot, 
-            remove_callback=lambda w: self.remove_component(system, w, c_type),
-            reorder_callback=lambda: self.handle_reorder_and_plot(system) 
-        )
-        target_list.append(new_widget)
-        
-        if c_type == "P" and system.miller_mode:
-            system.base_poles.append((def_r, def_c))
-            
+        system.model.add(c_type, def_r, def_c)
         self.handle_reorder_and_plot(system)
 
-    def remove_component(self, system, widget, c_type):
+    def remove_component(self, system, c_type, index):
         if c_type == "P":
-            if system.miller_mode and widget.index < 2:
+            if system.miller_mode and index < 2:
                 messagebox.showwarning("Lỗi", "Không thể xóa P1/P2 trong chế độ Miller.")
                 return
-            if system.miller_mode and widget.index < len(system.base_poles):
-                 system.base_poles.pop(widget.index)
-            system.pole_widgets.remove(widget)
-        else:
-            system.zero_widgets.remove(widget)
             
-        widget.destroy()
+        system.model.remove(c_type, index)
         self.handle_reorder_and_plot(system)
 
-    def activate_av2(self):
-        self.sys2.active = True
-        self.notebook.tab(1, state="normal")
-        self.notebook.select(1)
-        self.btn_add_av2.config(text="- Xóa Đồ Thị Av2", command=self.deactivate_av2)
-        self.update_plot()
-
-    def deactivate_av2(self):
-        self.sys2.active = False
-        self.notebook.tab(1, state="disabled")
-        self.notebook.select(0)
-        self.btn_add_av2.config(text="+ Kích hoạt Av2", command=self.activate_av2)
-        self.update_plot()
+    def add_system(self):
+        n = self._next_system_id
+        self._next_system_id += 1
+        system = SystemManager(f"sys{n}", f"Av{n}", *bode_plot.system_style(n - 1))
+        system.tab = ttk.Frame(self.notebook)
+        self.notebook.add(system.tab, text=f'Hệ thống {n} ({system.name})')
+        self.setup_tab(system.tab, system)
+        self.systems.append(system)
+        self.notebook.select(system.tab)
+        self.request_update(system)
+        return system
+
+    def selected_system(self):
+        selected = self.notebook.select()
+        return next((s for s in self.systems if str(s.tab) == str(selected)), None)
+
+    def remove_selected_system(self):
+        system = self.selected_system()
+        if system is None: return
+        if len(self.systems) == 1:
+            messagebox.showwarning("Cảnh báo", "Cần giữ lại ít nhất một hệ thống.")
+            return
+        self.systems.remove(system)
+        self.notebook.forget(system.tab)
+        system.tab.destroy()
+        self.request_update()
+
+    def open_monte_carlo(self):
+        system = self.selected_system()
+        if system is not None:
+            MonteCarloDialog(self, system)
+
+    def export_data(self):
+        # Đáp ứng phức, dB, pha và chỉ số của mọi hệ trong khung hình hiện tại
+        traces = [self.traces[s.key] for s in self.systems if s.key in self.traces]
+        if not traces:
+            messagebox.showinfo("Xuất dữ liệu", "Chưa có đáp ứng nào để xuất.")
+            return
+        path = filedialog.asksaveasfilename(title="Xuất đáp ứng và chỉ số", defaultextension=".npz",
+                                            filetypes=[("NumPy nén", "*.npz"), ("Memmap", "*.bodemm"), ("CSV", "*.csv")])
+        if not path: return
+        try:
+            bode_export.export_traces(path, traces, meta={"source": "gui", "adaptive": bool(self.var_adaptive.get())})
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Lỗi", f"Không xuất được dữ liệu: {e}")
+
+    def side_panel(self, name):
+        panel = self.side_panels.get(name)
+        if panel is None:
+            frame = self.side_tabs[name]
+            if name == "Root Locus":
+                panel = RootLocusPanel(self, frame)
+            elif name == "Nyquist":
+                panel = CurveViewPanel(self, frame, bode_views.NyquistView)
+            elif name == "Nichols":
+                panel = CurveViewPanel(self, frame, bode_views.NicholsView)
+            else:
+                panel = TimeResponsePanel(self, frame)
+            self.side_panels[name] = panel
+        return panel
+
+    def refresh_side_views(self, fast=False):
+        # Chỉ vẽ đồ thị phụ của tab đang hiển thị. Nyquist/Nichols/đáp ứng thời gian đủ rẻ để cập nhật
+        # cả ở khung nhanh (khi kéo); root locus phải quét lại nên chờ khung đầy đủ
+        if not hasattr(self, "side_tabs"): return
+        current = str(self.plot_notebook.select())
+        name = next((n for n, frame in self.side_tabs.items() if str(frame) == current), None)
+        if name is None:
+            return
+        panel = self.side_panels.get(name)
+        if fast and (panel is None or not panel.LIVE):
+            return
+        self.side_panel(name).show()
 
     def update_gain(self, system, entry):
         try:
-            val = float(entry.get())
+            with self.profiler.stage("edit"):
+                val = float(entry.get())
+            if val == system.gain_val: return
             system.gain_val = val
-            self.update_plot()
+            self.request_update(system)
         except: pass
 
+    def update_beta(self, system, entry):
+        text = entry.get().strip()
+        try:
+            val = float(text) if text else None
+            if val is not None and not val > 0:
+                raise ValueError(text)
+        except ValueError:
+            # Trả ô nhập về giá trị đang dùng trước khi báo lỗi: hộp thoại lấy focus và gây <FocusOut>,
+            # nếu ô vẫn giữ chữ sai thì lỗi sẽ hiện lại lần nữa
+            entry.delete(0, tk.END)
+            if system.beta is not None:
+                entry.insert(0, f"{system.beta:g}")
+            messagebox.showerror("Lỗi", "β phải là số dương.")
+            return
+        if val == system.beta: return
+        system.beta = val
+        # Đáp ứng vòng hở không đổi (trúng cache), đường vòng kín suy từ log H đã có trong trace
+        self.request_update(system)
+
     # --- DRAG LOGIC ---
+    def marker_index(self):
+        sig = bode_plot.MarkerIndex.signature(self.systems)
+        if sig != self._marker_sig:
+            self._marker_index = bode_plot.MarkerIndex(self.systems)
+            self._marker_sig = sig
+        return self._marker_index
+
     def on_press(self, event):
         if event.inaxes != self.ax1 and event.inaxes != self.ax2: return
         if not event.xdata: return
-
-        click_hz = event.xdata
-        closest_dist = float('inf')
-        target_sys = None; target_widget = None
-        
-        for sys in [self.sys1, self.sys2]:
-            if not sys.active: continue
-            
-            pole_rads = sys.get_poles_rad()
-            for i, p_rad in enumerate(pole_rads):
-                f_hz = abs(p_rad) / (2 * np.pi)
-                dist = abs(np.log10(f_hz) - np.log10(click_hz))
-                if dist < 0.05 and dist < closest_dist:
-                    closest_dist = dist
-                    target_sys = sys
-                    target_widget = sys.pole_widgets[i] 
-
-            zero_rads = sys.get_zeros_rad()
-            for i, z_rad in enumerate(zero_rads):
-                f_hz = abs(z_rad) / (2 * np.pi)
-                dist = abs(np.log10(f_hz) - np.log10(click_hz))
-                if dist < 0.05 and dist < closest_dist:
-                    closest_dist = dist
-                    target_sys = sys
-                    target_widget = sys.zero_widgets[i]
-
-        if target_sys:
+        with self.profiler.stage("on_press"):
+            self._press(event)
+
+    def _press(self, event):
+        # Marker gần nhất trong phạm vi 0.05 decade, tìm bằng bisect trên chỉ mục đã sắp
+        hit = self.marker_index().nearest(event.xdata, 0.05)
+        if hit:
+            target_sys, c_type, row, target_f = hit
             self.dragging_sys = target_sys
-            self.dragging_widget = target_widget
+            self.dragging_item = (c_type, row)
+            self.plot_view.clear_hover()
+            self.plot_view.begin_interaction(target_sys.key)
             if self.cursor_annotation:
                 self.cursor_annotation.remove(); self.cursor_annotation = None
-                self.canvas.draw()
+            # Vẽ đầy đủ một lần để cache nền tĩnh trước khi kéo
+            self.canvas.draw()
         else:
             self.handle_curve_click(event)
 
     def on_drag(self, event):
-        if self.dragging_widget is None: return
+        if self.dragging_item is None:
+            self.on_hover(event)
+            return
         if event.inaxes is None or event.xdata <= 0: return
 
-        new_f = event.xdata
+        # Chỉ giữ vị trí chuột mới nhất, các vị trí trung gian bị bỏ qua
+        self._pending_drag_f = event.xdata
+        self.request_update(self.dragging_sys, fast=True)
+
+    def on_hover(self, event):
+        # Gộp các sự kiện rê chuột liên tiếp, chỉ vẽ vị trí mới nhất khi rảnh
+        inside = event.inaxes in (self.ax1, self.ax2) and event.xdata and event.xdata > 0
+        if getattr(event, "name", None) == "axes_leave_event":
+            inside = False
+        self._hover_f = event.xdata if inside else None
+        if self._hover_job is None:
+            self._hover_job = self.root.after_idle(self._run_hover)
+
+    def _run_hover(self):
+        self._hover_job = None
+        if self._hover_f is None or self.dragging_item is not None or self.scrub_system is not None:
+            self.plot_view.clear_hover()
+        else:
+            self.plot_view.hover(self._hover_f)
+
+    def apply_drag(self, new_f):
         sys = self.dragging_sys
+        c_type, idx = self.dragging_item
         
-        is_zero = self.dragging_widget.c_type == "Z"
-        
-        if not is_zero and sys.miller_mode and (self.dragging_widget.index == 0 or self.dragging_widget.index == 1):
-            idx = self.dragging_widget.index
-            r_base, c_base = sys.base_poles[idx]
+        if c_type == "P" and sys.miller_mode and idx < 2:
+            r_base, c_base = sys.model.get_values("P", idx)
             
             c_total_req = 1.0 / (2 * np.pi * r_base * new_f)
             
@@ -504,16 +1106,25 @@ class BodePlotterApp:
             sys.entry_cc.delete(0, tk.END)
             sys.entry_cc.insert(0, f"{c_miller_needed:.2e}")
             self.update_miller_display(sys)
-            self.update_plot()
             
         else:
-            self.dragging_widget.update_from_drag(new_f)
-            self.update_plot()
+            r, _ = sys.model.get_values(c_type, idx)
+            c = float(f"{1.0 / (2 * np.pi * r * new_f):.2e}")
+            sys.model.set_values(c_type, idx, r, c)
+            sys.list_view.refresh_row(c_type, idx)
 
     def on_release(self, event):
+        with self.profiler.stage("on_release"):
+            self._release(event)
+
+    def _release(self, event):
         if self.dragging_sys:
+            if self._pending_drag_f is not None:
+                self.apply_drag(self._pending_drag_f)
+                self._pending_drag_f = None
+            self.plot_view.end_interaction()
             self.handle_reorder_and_plot(self.dragging_sys)
-        self.dragging_sys = None; self.dragging_widget = None
+        self.dragging_sys = None; self.dragging_item = None
 
     def handle_curve_click(self, event):
         if self.cursor_annotation:
@@ -523,9 +1134,7 @@ class BodePlotterApp:
         click_px = event.inaxes.transData.transform((event.xdata, event.ydata))
 
         for sys_name, data in self.plot_data.items():
-            if sys_name == "sys1": sys = self.sys1
-            else: sys = self.sys2
-            if not sys.active: continue
+            sys = self.traces[sys_name].sys
             f_arr, mag_arr, phase_arr = data
             y_arr = mag_arr if event.inaxes == self.ax1 else phase_arr
             unit = "dB" if event.inaxes == self.ax1 else "deg"
@@ -550,101 +1159,220 @@ class BodePlotterApp:
             self.canvas.draw()
         else: self.canvas.draw()
 
-    def update_plot(self):
-        self.ax1.clear(); self.ax2.clear()
-        self.plot_data = {}
-
-        # Tìm pole/zero có tần số thấp nhất để set trục X, tối thiểu là 0.01Hz
-        poles_all = self.sys1.get_poles_rad() + (self.sys2.get_poles_rad() if self.sys2.active else [])
-        zeros_all = self.sys1.get_zeros_rad() + (self.sys2.get_zeros_rad() if self.sys2.active else [])
-        all_freqs_rad = [abs(x) for x in poles_all + zeros_all]
-        
-        # Determine F_max
-        if not all_freqs_rad: 
-            f_max_hz = 1e6
-        else: 
-            f_max_hz = max(all_freqs_rad) / (2*np.pi) * 100.0
-        
-        # [FIX] Start frequency at 0.01 Hz
-        f = np.logspace(-2, np.log10(f_max_hz), 1000)
-        w = 2 * np.pi * f
-        
-        global_min_phase = 0
-        info_str = ""
-
-        for s_key, sys in [("sys1", self.sys1), ("sys2", self.sys2)]:
-            if not sys.active: continue
-            
-            poles_rad = sys.get_poles_rad()
-            zeros_rad = sys.get_zeros_rad()
-            
-            # Tính K
-            denom = 1.0
-            if zeros_rad: denom = np.prod([-z for z in zeros_rad])
-            numer = 1.0
-            if poles_rad: numer = np.prod([-p for p in poles_rad])
-            k_gain = sys.gain_val * numer / denom
-            
-            sys_model = signal.ZerosPolesGain(zeros_rad, poles_rad, k_gain)
-            _, mag, phase = signal.bode(sys_model, w)
-            
-            if np.min(phase) < global_min_phase: global_min_phase = np.min(phase)
-            mask = mag >= -40
-            if np.any(mask):
-                fm, mm, pm = f[mask], mag[mask], phase[mask]
-                self.plot_data[s_key] = (fm, mm, pm)
-                self.ax1.semilogx(fm, mm, color=sys.color, ls=sys.line_style, lw=2, label=f'{sys.name} (Gain)')
-                self.ax2.semilogx(fm, pm, color=sys.color, ls=sys.line_style, lw=2, label=f'{sys.name} (Phase)')
-                
-                # Vẽ Poles
-                for i, p_rad in enumerate(poles_rad):
-                    f_hz = abs(p_rad)/(2*np.pi)
-                    if f_hz <= f_max_hz:
-                        self.ax1.axvline(x=f_hz, color=sys.color, ls='--', alpha=0.5)
-                        self.ax2.axvline(x=f_hz, color=sys.color, ls='--', alpha=0.5)
-                        self.ax1.text(f_hz, -0.1, f"P{i+1}", transform=self.ax1.get_xaxis_transform(), rotation=0, va='top', ha='center', fontweight='bold', color=sys.color)
-                
-                # Vẽ Zeros
-                for i, z_rad in enumerate(zeros_rad):
-                    f_hz = abs(z_rad)/(2*np.pi)
-                    if f_hz <= f_max_hz:
-                        self.ax1.axvline(x=f_hz, color=sys.color, ls=':', alpha=0.8, lw=2)
-                        self.ax2.axvline(x=f_hz, color=sys.color, ls=':', alpha=0.8, lw=2)
-                        self.ax1.text(f_hz, -0.15, f"Z{i+1}", transform=self.ax1.get_xaxis_transform(), rotation=0, va='top', ha='center', fontweight='bold', color='red')
-
-                # Metrics
-                idx0 = np.where(mag <= 0)[0]
-                f0_str, pm_str = "N/A", "N/A"
-                if len(idx0) > 0:
-                    fc = f[idx0[0]]
-                    phm = 180 + phase[idx0[0]]
-                    f0_str, pm_str = f"{fc:.2e} Hz", f"{phm:.1f}°"
-                    self.ax1.plot(fc, 0, 'o', color=sys.color)
-                    self.ax1.axvline(x=fc, color=sys.color, ls='-.', alpha=0.8)
-                    self.ax2.axvline(x=fc, color=sys.color, ls='-.', alpha=0.8)
-                
-                av_db = mag[0]
-                idx_3db = np.where(mag <= (av_db - 3))[0]
-                bw_hz = f[idx_3db[0]] if len(idx_3db) > 0 else 0
-
-                info_str += f"[{sys.name}]\nAv: {mag[0]:.1f}dB | BW: {bw_hz:.2e}Hz\nGain Cross: {f0_str}\nPM: {pm_str}\n\n"
-
-        if info_str:
-            self.ax1.text(0.02, 0.05, info_str.strip(), transform=self.ax1.transAxes, fontsize=9, va='bottom', bbox=dict(boxstyle='round', facecolor='white', alpha=0.9))
-
-        self.ax1.set_title("Biểu đồ Bode (Gain & Phase)") # [NEW] Title
-        self.ax1.axhline(0, color='k', lw=1.5); self.ax1.grid(True, which="major", alpha=0.5); self.ax1.legend(fontsize='small')
-        self.ax1.set_ylabel('|H(s)| (dB)'); self.ax1.set_ylim(bottom=-40, top=max(self.ax1.get_ylim()[1], 10))
-        self.ax2.set_ylabel('Phase (deg)'); self.ax2.set_xlabel('Freq (Hz)'); self.ax2.grid(True, which="major", alpha=0.5)
-        
-        # [UPDATE] X-Axis start at 0.01Hz explicitly
-        self.ax2.set_xlim(left=0.01) 
-        
-        pb = max(np.floor(global_min_phase/45)*45, -270)
-        self.ax2.set_ylim(bottom=pb, top=10); self.ax2.set_yticks(np.arange(0, pb-1, -45))
-        self.canvas.draw()
+    # --- LẬP LỊCH CẬP NHẬT ---
+    def request_update(self, system=None, fast=False):
+        # Đánh dấu hệ cần tính lại; mọi yêu cầu trước lần chạy kế tiếp được gộp làm một
+        self.redraw_stats["requested"] += 1
+        if system is None:
+            self.dirty_systems.update(s.key for s in self.systems)
+        else:
+            self.dirty_systems.add(system.key)
+        if not fast:
+            self._pending_full = True
+        if self._update_job is not None:
+            return
+        if fast:
+            elapsed_ms = (time.perf_counter() - self._last_frame_t) * 1000
+            delay = int(max(0, FRAME_INTERVAL_MS - elapsed_ms))
+            self._update_job = self.root.after(delay, self._run_update)
+        else:
+            self._update_job = self.root.after_idle(self._run_update)
+
+    def _run_update(self):
+        self._update_job = None
+        if self._pending_drag_f is not None and self.dragging_item is not None:
+            with self.profiler.stage("apply_drag"):
+                self.apply_drag(self._pending_drag_f)
+        self._pending_drag_f = None
+        fast = not self._pending_full
+        self._pending_full = False
+        self.redraw_stats["executed"] += 1
+        with self.profiler.stage("snapshot"):
+            self.update_plot(fast=fast)
+        self._last_frame_t = time.perf_counter()
+
+    def grid_budget(self):
+        try:
+            return max(int(self.var_grid_points.get()), 50)
+        except ValueError:
+            return 400
+
+    def update_plot(self, fast=False):
+        # fast=True khi kéo Pole: tái sử dụng artist và chỉ blit phần thay đổi.
+        # Chụp trạng thái rồi gửi sang luồng nền; kết quả được vẽ trong _poll_worker.
+        active = self.systems
+
+        # Khi kéo Cc, hệ đang kéo dùng lưới cố định của bảng tra, không làm đổi lưới của các hệ khác
+        scrub = self.scrub_system
+        fixed = {}
+        grid_systems = [(sys.gain_val, sys.get_poles_rad(), sys.get_zeros_rad()) for sys in active if sys is not scrub]
+        if scrub is not None:
+            # Tra bảng Cc × tần số thay vì tính lại đáp ứng (nhanh, làm ngay trên luồng chính)
+            table = self.cc_tables[scrub.key]
+            fixed[scrub.key] = table.response(scrub.cc_val)
+            grid_systems += table.end_systems
+            if table.has_pending() and self._refine_job is None:
+                self._refine_job = self.root.after_idle(self._refine_cc_table)
+
+        # Hệ đã gửi đi nhưng chưa vẽ vẫn phải tính lại nếu yêu cầu cũ bị thay thế
+        self._inflight_dirty |= self.dirty_systems
+        self.dirty_systems = set()
+        req = FrameRequest(self._compute_frame, fast,
+                           [(sys, sys.gain_val, sys.get_poles_rad(), sys.get_zeros_rad(), sys.beta) for sys in active],
+                           grid_systems, self.var_adaptive.get(), self.grid_budget(), set(self._inflight_dirty),
+                           self.traces, fixed)
+        self.worker.submit(req, merge=lambda old, new: new.absorb(old))
+        self._schedule_poll()
+
+    def _compute_frame(self, req):
+        # Chạy trên luồng nền: không đụng tới Tk hay matplotlib
+        # [FIX] Start frequency at 0.01 Hz, F_max = 100 x pole/zero cao nhất
+        with self.profiler.stage("grid"):
+            if req.adaptive:
+                f = bode_engine.adaptive_grid(req.grid_systems, n_points=req.budget)
+            else:
+                f = bode_engine.frequency_grid(np.concatenate([np.concatenate([p, z]) for _, p, z in req.grid_systems]))
+
+        # Chỉ tính lại hệ bị đánh dấu; hệ còn lại dùng kết quả cũ nếu lưới tần số không đổi
+        traces = {}
+        need = []
+        for sys, gain, poles, zeros, beta in req.systems:
+            old = req.old_traces.get(sys.key)
+            if sys.key in req.fixed:
+                traces[sys.key] = bode_plot.SystemTrace(sys.key, sys, poles, zeros, req.fixed[sys.key], gain=gain, beta=beta)
+            elif sys.key not in req.dirty and old is not None and old.beta == beta and np.array_equal(old.resp.f, f):
+                traces[sys.key] = old
+            else:
+                need.append((sys, gain, poles, zeros, beta))
+
+        # Các hệ cần tính được đánh giá chung trong một lần (hệ × tần số)
+        with self.profiler.stage("response"):
+            resps = self.response_cache.evaluate_many([(gain, poles, zeros) for _, gain, poles, zeros, _ in need], f)
+        for (sys, gain, poles, zeros, beta), resp in zip(need, resps):
+            traces[sys.key] = bode_plot.SystemTrace(sys.key, sys, poles, zeros, resp, gain=gain, beta=beta)
+        traces = [traces[sys.key] for sys, *_ in req.systems]
+        # Chỉ số vòng hở và vòng kín (hệ có beta)
+        with self.profiler.stage("metrics"):
+            bode_plot.fill_metrics(traces)
+        return traces
+
+    def submit_task(self, name, compute, present):
+        # compute() chạy trên luồng nền (không đụng Tk/model đang sửa); present(kết quả) chạy trên
+        # luồng Tk, chỉ cho yêu cầu mới nhất cùng tên
+        worker = self.task_workers.get(name)
+        if worker is None:
+            worker = self.task_workers[name] = bode_worker.ComputeWorker(threaded=self.worker.threaded)
+        worker.submit(lambda: (present, compute()))
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        if self._worker_poll_job is None:
+            self._worker_poll_job = self.root.after(WORKER_POLL_MS, self._poll_worker)
+
+    def report_error(self, where, error):
+        # Lỗi từ luồng nền hoặc khi vẽ kết quả: traceback ra stderr, tóm tắt trên thanh trạng thái
+        traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+        self.lbl_status.config(text=f"Lỗi ({where}): {error}")
+
+    def _poll_worker(self):
+        self._worker_poll_job = None
+        try:
+            self._poll_frames()
+            for name, worker in list(self.task_workers.items()):
+                for version, result, error in worker.poll():
+                    if error is not None:
+                        self.report_error(name, error)
+                    elif version == worker.version:
+                        present, value = result
+                        try:
+                            present(value)
+                        except Exception as e:
+                            self.report_error(name, e)
+        finally:
+            # Một lỗi không được làm dừng vòng hỏi, nếu không đồ thị sẽ đứng yên
+            if self.worker.busy or any(w.busy for w in self.task_workers.values()):
+                self._schedule_poll()
+
+    def _poll_frames(self):
+        done = self.worker.poll()
+        for version, result, error in done:
+            if error is not None:
+                self.report_error("tính đáp ứng", error)
+        # Chỉ vẽ kết quả mới nhất, bỏ qua kết quả cũ hơn khung đã vẽ
+        fresh = [(v, r) for v, r, e in done if e is None and v > self._shown_version]
+        if fresh:
+            version, (req, traces) = fresh[-1]
+            self._shown_version = version
+            if version == self.worker.version:
+                self._inflight_dirty = set()
+            try:
+                self._present_frame(req, traces)
+            except Exception as e:
+                self.report_error("vẽ", e)
+
+    def _present_frame(self, req, traces):
+        fast = req.fast
+        if not fast:
+            self.lbl_status.config(text="")
+        if not fast and self.cursor_annotation:
+            self.cursor_annotation.remove(); self.cursor_annotation = None
+        self.traces = {t.key: t for t in traces}
+
+        # Dải bao Monte Carlo chỉ còn đúng khi hệ chưa bị sửa
+        if not fast:
+            for key, snap in list(self.mc_snapshots.items()):
+                sys = next((s for s in self.systems if s.key == key), None)
+                if sys is None or sys.model.to_dict() != snap:
+                    del self.mc_snapshots[key]
+                    self.plot_view.clear_envelope(key)
+
+        if self.profiler.enabled:
+            self.plot_view.set_overlay(self.profiler.overlay_text())
+        self.plot_data = self.plot_view.render(traces, fast=fast)
+        self._last_frame_t = time.perf_counter()
+        with self.profiler.stage("side_views"):
+            self.refresh_side_views(fast)
+        # Độ trễ khung: từ lúc chụp trạng thái tới khi đã vẽ xong
+        self.profiler.record("frame", req.t_request, time.perf_counter())
+        if self._startup_pending:
+            self._finish_startup()
+
+    # --- ĐO HIỆU NĂNG ---
+    def toggle_profiling(self):
+        self.profiler.enabled = bool(self.var_profile.get())
+        if not self.profiler.enabled:
+            self.profiler.reset()
+            self.plot_view.set_overlay(None)
+        self.request_update()
+
+    def toggle_cprofile(self):
+        if self.var_cprofile.get():
+            self.profiler.start_cprofile()
+            return
+        path = filedialog.asksaveasfilename(title="Lưu kết quả cProfile", defaultextension=".prof",
+                                            filetypes=[("cProfile", "*.prof"), ("Tất cả", "*.*")])
+        self.profiler.stop_cprofile(path or None)
+
+    def dump_trace(self):
+        if not self.profiler.enabled:
+            messagebox.showinfo("Đo thời gian", "Hãy bật \"Đo thời gian\" rồi thao tác trước khi ghi trace.")
+            return
+        path = filedialog.asksaveasfilename(title="Lưu trace", defaultextension=".json",
+                                            filetypes=[("Chrome trace", "*.json"), ("Tất cả", "*.*")])
+        if path:
+            n = self.profiler.dump_trace(path)
+            messagebox.showinfo("Đo thời gian", f"Đã ghi {n} sự kiện vào {path}\n(mở bằng chrome://tracing hoặc Perfetto).")
+
+    def _finish_startup(self):
+        # Khung đầu tiên đã vẽ: khép lại báo cáo thời gian khởi động
+        self._startup_pending = False
+        self.startup_times["first_frame"] = self._last_frame_t - self._t_ready
+        self.startup_times["total"] = self._last_frame_t - _T_START
+        if self.report_startup:
+            print("Thời gian khởi động (ms): " + ", ".join(f"{k} {v * 1e3:.1f}" for k, v in self.startup_times.items()),
+                  file=sys.stderr)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = BodePlotterApp(root)
+    app = BodePlotterApp(root, report_startup="--startup-report" in sys.argv, profile="--profile" in sys.argv)
     root.mainloop()
@@ -0,0 +1,361 @@
+"""Bộ benchmark không giao diện cho các đường nóng: tính đáp ứng, vẽ lại, kéo pole, Miller, bộ nhớ.
+
+Kết quả ghi ra JSON để so sánh giữa các commit:
+    python benchmarks/bench_bode.py -o bench.json
+    python benchmarks/bench_bode.py --quick -o new.json --compare bench.json
+
+Phần "app" (update_plot, kéo qua on_press/on_drag/on_release) cần Tk có màn hình; cửa sổ được
+ẩn ngay (withdraw). Không có màn hình (vd. CI) thì chạy qua xvfb-run, hoặc bỏ hẳn phần đó bằng
+--skip app. Nếu phần "app" được chọn mà không mở được Tk, các số đo còn lại vẫn được ghi nhưng
+mã thoát là 2 và JSON ghi rõ các số đo bị thiếu; --compare cũng báo số đo có trong file cũ mà
+thiếu trong lần chạy mới.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import bode_engine  # noqa: E402
+import bode_metrics  # noqa: E402
+import bode_miller  # noqa: E402
+import bode_model  # noqa: E402
+import bode_plot  # noqa: E402
+
+POLE_COUNTS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+SYSTEM_COUNTS = [1, 4, 10]
+SECTIONS = ("response", "render", "drag", "miller", "memory", "app")
+# Số đo của phần "app"; ghi trong JSON khi phần này không chạy được
+APP_MEASUREMENTS = ("update_plot_full", "drag", "miller_set_cc")
+
+
+# --- HỆ TỔNG HỢP ---
+def synthetic_model(n_poles, n_zeros=None, seed=0, miller=False):
+    # Pole trải 1 Hz .. 1 GHz, zero (RHP) 1 kHz .. 10 GHz; R cố định, C suy từ tần số.
+    # Cùng seed -> cùng hệ, để số đo so sánh được giữa các lần chạy
+    rng = np.random.default_rng(seed)
+    n_zeros = max(n_poles // 5, 0) if n_zeros is None else n_zeros
+    model = bode_model.SystemModel(gain_val=1e5)
+    for kind, n, lo, hi in (("P", n_poles, 0, 9), ("Z", n_zeros, 3, 10)):
+        for f in np.sort(10 ** rng.uniform(lo, hi, n)):
+            model.add(kind, 1e3, 1.0 / (2 * np.pi * 1e3 * f))
+    if miller and n_poles >= 2:
+        model.miller_mode = True
+        model.miller_av2 = 100.0
+        model.cc_val = 1e-12
+    return model
+
+
+def synthetic_system(n_poles, n_zeros=None, seed=0):
+    # (gain, poles, zeros) rad/s cho engine
+    m = synthetic_model(n_poles, n_zeros, seed)
+    return m.gain_val, m.poles_rad(), m.zeros_rad()
+
+
+# --- ĐO THỜI GIAN ---
+def _stats(samples):
+    ms = np.asarray(samples) * 1e3
+    return {"n": len(ms), "min_ms": float(ms.min()), "median_ms": float(np.median(ms)),
+            "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max())}
+
+
+def _timeit(fn, repeat):
+    fn()   # khởi động (cache, import lười)
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return _stats(out)
+
+
+def _traces(models, f=None):
+    systems = [(m.gain_val, m.poles_rad(), m.zeros_rad()) for m in models]
+    if f is None:
+        f = bode_engine.frequency_grid(np.concatenate([np.concatenate([p, z]) for _, p, z in systems]))
+    resps = bode_engine.evaluate_batch(systems, f)
+    # Nét liền cho mọi hệ để số đo không phụ thuộc kiểu nét đứt
+    plot_systems = [bode_plot.PlotSystem(f"sys{i}", f"sys{i}", m, bode_plot.system_style(i)[0]) for i, m in enumerate(models)]
+    traces = [bode_plot.SystemTrace(s.key, s, p, z, r) for s, (_, p, z), r in zip(plot_systems, systems, resps)]
+    bode_plot.fill_metrics(traces)
+    return traces
+
+
+def _agg_view():
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(2, 1, sharex=True)
+    return bode_plot.BodePlotView(fig, ax1, ax2)
+
+
+# --- CÁC PHẦN BENCHMARK ---
+def bench_response(repeat):
+    # Tính đáp ứng + chỉ số chính xác theo số pole (lưới 1000 điểm)
+    rows = []
+    for n in POLE_COUNTS:
+        gain, P, Z = synthetic_system(n, seed=n)
+        f = bode_engine.frequency_grid(np.concatenate([P, Z]))
+        resp = bode_engine.evaluate(gain, P, Z, f)
+        rows.append({"poles": n, "zeros": len(Z), "points": len(f),
+                     "evaluate": _timeit(lambda: bode_engine.evaluate(gain, P, Z, f), repeat),
+                     "metrics": _timeit(lambda: bode_metrics.compute_metrics(gain, P, Z, resp), repeat)})
+    return rows
+
+
+def bench_render(repeat):
+    # Vẽ lại đầy đủ (như update_plot khi không kéo) trên canvas Agg
+    rows = []
+    for n_sys in SYSTEM_COUNTS:
+        traces = _traces([synthetic_model(4, 1, seed=i) for i in range(n_sys)])
+        view = _agg_view()
+        rows.append({"systems": n_sys, "full_render": _timeit(lambda: view.render(traces, fast=False), repeat)})
+    return rows
+
+
+def bench_drag(steps):
+    # Kéo P2 qua 2 decade: mỗi khung sửa model -> tính lại hệ đang kéo -> render nhanh (blit)
+    rows = []
+    for n_sys in SYSTEM_COUNTS:
+        models = [synthetic_model(4, 1, seed=i) for i in range(n_sys)]
+        traces = _traces(models)
+        f = traces[0].resp.f
+        view = _agg_view()
+        view.render(traces)
+        model = models[0]
+        r, c = model.get_values("P", 1)
+        f0 = 1.0 / (2 * np.pi * r * c)
+        view.begin_interaction(traces[0].key)
+        view.canvas.draw()
+        samples = []
+        for fz in f0 * np.logspace(0, 2, steps):
+            t0 = time.perf_counter()
+            model.set_values("P", 1, r, 1.0 / (2 * np.pi * r * fz))
+            resp = bode_engine.evaluate(model.gain_val, model.poles_rad(), model.zeros_rad(), f)
+            traces[0] = bode_plot.SystemTrace(traces[0].key, traces[0].sys, model.poles_rad(), model.zeros_rad(), resp)
+            view.render(traces, fast=True)
+            samples.append(time.perf_counter() - t0)
+        view.end_interaction()
+        rows.append({"systems": n_sys, "frame": _stats(samples)})
+    return rows
+
+
+def bench_miller(repeat):
+    # Đổi Cc ở chế độ Miller: tính lại pole + đáp ứng + chỉ số; và tra bảng của thanh kéo Cc
+    out = []
+    for n in (2, 10, 50):
+        model = synthetic_model(n, 1, seed=n, miller=True)
+        cc_values = np.logspace(-14, -10, 16)
+        f = bode_engine.frequency_grid(bode_miller.miller_poles_rad(model, cc_values[:1], np.array([100.0]))[0])
+
+        def recompute():
+            for cc in cc_values:
+                model.cc_val = cc
+                P, Z = model.poles_rad(), model.zeros_rad()
+                bode_metrics.compute_metrics(model.gain_val, P, Z, bode_engine.evaluate(model.gain_val, P, Z, f))
+
+        t0 = time.perf_counter()
+        table = bode_miller.CcScrubTable(model)
+        build = time.perf_counter() - t0
+        out.append({"poles": n,
+                    "recompute_per_cc": {k: (v / len(cc_values) if k.endswith("_ms") else v)
+                                         for k, v in _timeit(recompute, repeat).items()},
+                    "scrub_table_build_ms": build * 1e3,
+                    "scrub_lookup": _timeit(lambda: table.response(3e-12), repeat),
+                    "solve_cc": _timeit(lambda: bode_miller.solve_cc(model, 45.0), max(repeat // 10, 1))})
+    return out
+
+
+def bench_memory():
+    # Bộ nhớ mỗi hệ: model + trace (đáp ứng, chỉ số) + artist trên đồ thị, đo bằng tracemalloc
+    rows = []
+    # Làm nóng trước: bộ nhớ cấp một lần (cache, import lười) không tính cho hệ đầu tiên
+    _agg_view().render(_traces([synthetic_model(4)]))
+    for n_poles in (4, 50, 500):
+        # 500 pole x 8 hệ = hàng nghìn artist marker, vẽ dưới tracemalloc mất cả phút
+        n_sys = 8 if n_poles <= 50 else 2
+        tracemalloc.start()
+        base = tracemalloc.take_snapshot()
+        models = [synthetic_model(n_poles, seed=i) for i in range(n_sys)]
+        after_models = tracemalloc.take_snapshot()
+        traces = _traces(models)
+        after_traces = tracemalloc.take_snapshot()
+        view = _agg_view()
+        view.render(traces)
+        after_view = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        def diff(a, b):
+            return sum(s.size_diff for s in b.compare_to(a, "filename")) / n_sys / 1024
+        rows.append({"poles": n_poles, "model_kib": diff(base, after_models),
+                     "trace_kib": diff(after_models, after_traces), "artists_kib": diff(after_traces, after_view)})
+    return rows
+
+
+def bench_app(steps, repeat):
+    # Qua đúng đường đi của giao diện: BodePlotterApp với worker đồng bộ, cửa sổ Tk ẩn
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": f"Tk không mở được màn hình: {e}", "missing": list(APP_MEASUREMENTS)}
+    root.withdraw()
+    import Bode_simulator
+
+    app = Bode_simulator.BodePlotterApp(root, threaded=False)
+    sys0 = app.systems[0]
+
+    def flush():
+        while app._update_job is not None or app._worker_poll_job is not None or app.worker.busy:
+            root.update()
+            time.sleep(0.0005)
+        root.update()
+
+    for kind, r, c in [("P", 1e5, 1e-12), ("P", 1e3, 1e-12), ("P", 1e2, 1e-13), ("Z", 1e3, 1e-9)]:
+        sys0.model.add(kind, r, c)
+    sys0.reorder_rows()
+    for i in range(3):
+        other = app.add_system()
+        for f in synthetic_model(4, 0, seed=i).freqs_hz("P"):
+            other.model.add("P", 1e3, 1.0 / (2 * np.pi * 1e3 * f))
+        other.reorder_rows()
+    flush()
+
+    def full():
+        app.request_update()
+        flush()
+
+    out = {"update_plot_full": _timeit(full, repeat)}
+
+    class Event:
+        def __init__(self, ax, x, y=0.0):
+            self.inaxes, self.xdata, self.ydata, self.button, self.key = ax, x, y, 1, None
+            self.name = "motion_notify_event"
+            self.x, self.y = ax.transData.transform((x, y))
+
+    f0 = abs(sys0.model.poles_rad()[1]) / (2 * np.pi)
+    t0 = time.perf_counter()
+    app.on_press(Event(app.ax1, f0))
+    press = time.perf_counter() - t0
+    samples = []
+    for fz in f0 * np.logspace(0, 2, steps):
+        t0 = time.perf_counter()
+        app.on_drag(Event(app.ax1, fz))
+        flush()
+        samples.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    app.on_release(Event(app.ax1, fz))
+    flush()
+    out["drag"] = {"press_ms": press * 1e3, "frame": _stats(samples), "release_ms": (time.perf_counter() - t0) * 1e3}
+
+    sys0.miller_mode = True
+    sys0.var_miller.set(True)
+    out["miller_set_cc"] = _timeit(lambda: (app.set_cc(sys0, sys0.cc_val * 1.1 + 1e-13), flush()), repeat)
+    root.destroy()
+    return out
+
+
+# --- GHI / SO SÁNH ---
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "matplotlib": matplotlib.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+def _flatten(obj, prefix=""):
+    # {"render": [{"systems": 4, "full_render": {"median_ms": ..}}]} -> {"render[systems=4].full_render.median_ms": ..}
+    out = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            out.update(_flatten(v, f"{prefix}.{k}" if prefix else k))
+    elif isinstance(obj, list):
+        for item in obj:
+            tag = next((f"{k}={item[k]}" for k in ("poles", "systems") if isinstance(item, dict) and k in item), None)
+            out.update(_flatten(item, f"{prefix}[{tag}]"))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix] = obj
+    return out
+
+
+def compare(old, new, threshold=1.2):
+    # In các số đo median (ms) và bộ nhớ (KiB) chậm/tăng hơn threshold lần; trả về số dòng hồi quy
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    tracked = lambda k: k.endswith("median_ms") or k.endswith("_kib") or k.endswith("build_ms")
+    keys = [k for k in b if k in a and tracked(k)]
+    # Số đo có trong file cũ mà lần này không có (vd. phần "app" bị bỏ qua vì không có màn hình)
+    missing = [k for k in a if k not in b and tracked(k)]
+    worse = len(missing)
+    for k in missing:
+        print(f"{k:<60} {a[k]:>10.3f} ->       THIẾU")
+    for k in keys:
+        ratio = b[k] / a[k] if a[k] > 0 else float("inf")
+        flag = "CHẬM HƠN" if ratio > threshold else ""
+        worse += bool(flag)
+        print(f"{k:<60} {a[k]:>10.3f} -> {b[k]:>10.3f}  x{ratio:5.2f} {flag}")
+    print(f"{worse - len(missing)} / {len(keys)} số đo vượt ngưỡng x{threshold}, {len(missing)} số đo bị thiếu")
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark không giao diện cho các đường nóng của Bode simulator.")
+    parser.add_argument("-o", "--output", default="-", help="File JSON kết quả (mặc định stdout)")
+    parser.add_argument("--quick", action="store_true", help="Ít lần lặp hơn (kiểm tra nhanh)")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, help="Chỉ chạy các phần này")
+    parser.add_argument("--skip", nargs="+", choices=SECTIONS, default=[],
+                        help="Bỏ các phần này (vd. --skip app khi không có màn hình)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="So sánh với kết quả cũ, thoát mã 1 nếu có hồi quy")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Ngưỡng hồi quy cho --compare (tỉ lệ)")
+    args = parser.parse_args(argv)
+
+    repeat, steps = (5, 20) if args.quick else (30, 100)
+    sections = {"response": lambda: bench_response(repeat), "render": lambda: bench_render(max(repeat // 3, 2)),
+                "drag": lambda: bench_drag(steps), "miller": lambda: bench_miller(repeat),
+                "memory": bench_memory, "app": lambda: bench_app(steps, max(repeat // 3, 2))}
+    results = {}
+    for name, fn in sections.items():
+        if (args.only and name not in args.only) or name in args.skip:
+            continue
+        t0 = time.perf_counter()
+        results[name] = fn()
+        print(f"[{name}] {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+
+    report = {"meta": _metadata(), "args": {"quick": args.quick}, "results": results}
+    text = json.dumps(report, indent=1)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+
+    status = 0
+    skipped = results.get("app", {}).get("skipped")
+    if skipped:
+        # Không im lặng bỏ qua: đây chính là các số đo của đường đi giao diện
+        print(f"[app] LỖI: {skipped}. Thiếu số đo: {', '.join(results['app']['missing'])}. "
+              "Chạy với màn hình (vd. xvfb-run) hoặc bỏ phần này bằng --skip app.", file=sys.stderr)
+        status = 2
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            old = json.load(fh)
+        if compare(old, report, args.threshold):
+            status = status or 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""So sánh bode_engine với scipy.signal.bode: sai số và thời gian mỗi khung hình.
+
+Chạy: python benchmarks/bench_engine.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import signal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bode_engine  # noqa: E402
+import bode_metrics  # noqa: E402
+
+
+def random_system(rng, n_poles, n_zeros):
+    poles = -2 * np.pi * 10 ** rng.uniform(0, 6, n_poles)
+    zeros = 2 * np.pi * 10 ** rng.uniform(3, 7, n_zeros)
+    return 1e4, poles, zeros
+
+
+def scipy_bode(gain_dc, poles, zeros, f):
+    # Đúng như update_plot cũ: dựng ZerosPolesGain rồi gọi signal.bode
+    k = gain_dc * np.prod(-poles) / np.prod(-zeros) if len(zeros) else gain_dc * np.prod(-poles)
+    _, mag, phase = signal.bode(signal.ZerosPolesGain(zeros, poles, k), 2 * np.pi * f)
+    return mag, phase
+
+
+def engine_bode(gain_dc, poles, zeros, f):
+    resp = bode_engine.evaluate(gain_dc, poles, zeros, f)
+    return resp.mag_db, resp.phase_deg
+
+
+def grid_crossover(resp):
+    # Cách cũ: lấy điểm lưới đầu tiên có mag <= 0 dB
+    idx0 = np.where(resp.mag_db <= 0)[0]
+    return resp.f[idx0[0]] if len(idx0) else None
+
+
+def best_time(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def many_poles(n_poles):
+    # Nhiều pole ký sinh tần số cao: prod(-p) tràn số với cách tính K cũ
+    poles = -2 * np.pi * np.logspace(6, 9, n_poles)
+    zeros = 2 * np.pi * np.logspace(7, 9, max(n_poles // 10, 1))
+    return 1e5, poles, zeros
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'poles':>5} {'zeros':>5} {'scipy (ms)':>11} {'engine (ms)':>12} {'speedup':>8} "
+          f"{'max |dB|':>9} {'max |deg|':>9}")
+    for n_p, n_z in [(1, 0), (2, 1), (4, 1), (8, 2)]:
+        gain, poles, zeros = random_system(rng, n_p, n_z)
+        f = bode_engine.frequency_grid(np.concatenate([poles, zeros]))
+        mag_s, ph_s = scipy_bode(gain, poles, zeros, f)
+        mag_e, ph_e = engine_bode(gain, poles, zeros, f)
+        t_s = best_time(lambda: scipy_bode(gain, poles, zeros, f))
+        t_e = best_time(lambda: engine_bode(gain, poles, zeros, f))
+        print(f"{n_p:>5} {n_z:>5} {t_s * 1e3:>11.3f} {t_e * 1e3:>12.3f} {t_s / t_e:>7.1f}x "
+              f"{np.max(np.abs(mag_s - mag_e)):>9.1e} {np.max(np.abs(ph_s - ph_e)):>9.1e}")
+
+    print()
+    print(f"{'poles':>5} {'zeros':>5} {'engine (ms)':>12} {'scipy finite':>13} {'engine finite':>14}")
+    for n_p in [10, 50, 100, 200, 500]:
+        gain, poles, zeros = many_poles(n_p)
+        f = bode_engine.frequency_grid(np.concatenate([poles, zeros]))
+        with np.errstate(all="ignore"):
+            mag_s, _ = scipy_bode(gain, poles, zeros, f)
+        mag_e, _ = engine_bode(gain, poles, zeros, f)
+        t_e = best_time(lambda: engine_bode(gain, poles, zeros, f), repeat=5)
+        print(f"{n_p:>5} {len(zeros):>5} {t_e * 1e3:>12.3f} {str(np.isfinite(mag_s).all()):>13} "
+              f"{str(np.isfinite(mag_e).all()):>14}")
+
+    print()
+    print("Sai số gain crossover (decade) so với lưới 200k điểm, hệ trải 13 decade:")
+    gain = 1e7
+    poles = -2 * np.pi * np.array([10.0, 1e5, 3e6, 1e8])
+    zeros = 2 * np.pi * np.array([1e9])
+    f_fixed = bode_engine.frequency_grid(np.concatenate([poles, zeros]))
+    f_ref = np.logspace(-2, np.log10(f_fixed[-1]), 200000)
+    fc_ref = grid_crossover(bode_engine.evaluate(gain, poles, zeros, f_ref))
+    for name, f in [("fixed 1000", f_fixed)] + [
+            (f"adaptive {n}", bode_engine.adaptive_grid([(gain, poles, zeros)], n_points=n)) for n in (150, 300, 600)]:
+        resp = bode_engine.evaluate(gain, poles, zeros, f)
+        fc = grid_crossover(resp)
+        fc_exact = bode_metrics.compute_metrics(gain, poles, zeros, resp).fc
+        t = best_time(lambda: bode_engine.evaluate(gain, poles, zeros, f))
+        t_m = best_time(lambda: bode_metrics.compute_metrics(gain, poles, zeros, resp))
+        print(f"{name:>14}: {len(f):>5} điểm, lỗi {abs(np.log10(fc / fc_ref)):.1e}, {t * 1e3:.3f} ms | "
+              f"tìm nghiệm: lỗi {abs(np.log10(fc_exact / fc_ref)):.1e}, {t_m * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Đánh giá hàng loạt thiết kế không cần giao diện (không import tkinter).
+
+Ví dụ:
+    python bode_cli.py designs.json
+    python bode_cli.py designs.csv --format csv -o metrics.csv
+    python bode_cli.py designs.jsonl --adaptive --points 400 --responses out/
+    python bode_cli.py sweep.jsonl --export sweep.bodemm --f-range 0.01 1e9
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+import bode_engine
+import bode_export
+import bode_metrics
+import bode_model
+
+METRIC_FIELDS = ["name", "dc_db", "fc_hz", "pm_deg", "gm_db", "f180_hz", "bw_hz", "n_gain_crossovers"]
+# Chỉ có khi thiết kế khai báo "beta" (vòng kín Acl = A / (1 + beta*A))
+CLOSED_LOOP_FIELDS = ["beta", "cl_dc_db", "cl_peaking_db", "cl_f_peak_hz", "cl_bw_hz", "loop_fc_hz", "loop_pm_deg",
+                      "loop_gm_db"]
+
+
+# --- TÍNH THEO LÔ ---
+def design_grid(systems, n_points=bode_engine.N_POINTS, adaptive=False):
+    # Lưới tần số chung cho các (gain, poles, zeros)
+    if adaptive:
+        return bode_engine.adaptive_grid(systems, n_points=n_points)
+    roots = np.concatenate([np.concatenate([p, z]) for _, p, z in systems] or [np.empty(0)])
+    return bode_engine.frequency_grid(roots, n_points=n_points)
+
+
+def evaluate_designs(designs, n_points=bode_engine.N_POINTS, adaptive=False, chunk=256, f=None):
+    # designs: iterable (tên, SystemModel). Mỗi lô dùng chung một lưới tần số (hoặc lưới f cố định
+    # cho mọi lô), đáp ứng và chỉ số của cả lô được tính trong một lần.
+    # Trả về lần lượt (tên, model, đáp ứng, chỉ số).
+    designs = iter(designs)
+    while True:
+        batch = list(itertools.islice(designs, chunk))
+        if not batch:
+            return
+        systems = [(m.gain_val, m.poles_rad(), m.zeros_rad()) for _, m in batch]
+        grid = f if f is not None else design_grid(systems, n_points, adaptive)
+        resps = bode_engine.evaluate_batch(systems, grid)
+        metrics = bode_metrics.compute_metrics_batch(systems, grid, log_h=np.stack([r.log_h for r in resps]))
+        for (name, model), resp, m in zip(batch, resps, metrics):
+            yield name, model, resp, m
+
+
+def iter_valid(dicts, log):
+    # (tên, SystemModel) từ các dict thiết kế; bỏ qua thiết kế lỗi (ghi ra log) thay vì dừng cả lô
+    for i, d in enumerate(dicts):
+        name = d.get("name") or f"design{i}"
+        try:
+            yield name, bode_model.SystemModel.from_dict(d)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[bỏ qua] {name}: {e}", file=log)
+
+
+def metrics_record(name, m, cl=None):
+    rec = {"name": name}
+    rec.update(m.as_dict())
+    rec["n_gain_crossovers"] = len(m.gain_crossovers)
+    if cl is not None:
+        rec.update(cl.as_dict())
+    return rec
+
+
+# --- GHI KẾT QUẢ ---
+def safe_filename(name):
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tính PM, GM, crossover, BW cho nhiều thiết kế từ file JSON/JSONL/CSV.")
+    parser.add_argument("input", help="File thiết kế (.json, .jsonl, .csv) hoặc '-' để đọc JSON Lines từ stdin")
+    parser.add_argument("-o", "--output", default="-", help="File kết quả (mặc định stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="Định dạng kết quả chỉ số")
+    parser.add_argument("--points", type=int, default=bode_engine.N_POINTS, help="Số điểm tần số")
+    parser.add_argument("--adaptive", action="store_true", help="Dùng lưới tần số thích ứng")
+    parser.add_argument("--chunk", type=int, default=256, help="Số thiết kế mỗi lô tính chung")
+    parser.add_argument("--responses", metavar="DIR", help="Ghi đáp ứng (f, mag_db, phase_deg) của từng thiết kế ra DIR/<tên>.npz")
+    parser.add_argument("--inline-response", action="store_true", help="(jsonl) kèm mảng đáp ứng trong từng dòng kết quả")
+    parser.add_argument("--export", metavar="FILE",
+                        help="Ghi đáp ứng phức, dB, pha và chỉ số của mọi thiết kế vào một file: "
+                             ".bodemm (memmap), .npz (nén) hoặc .csv (dạng dài, ghi nối tiếp)")
+    parser.add_argument("--f-range", type=float, nargs=2, metavar=("FMIN", "FMAX"),
+                        help="Lưới log cố định (Hz) cho mọi thiết kế; khi --export mà không có lưới này, "
+                             "mỗi bản ghi được lưu kèm lưới tần số của lô chứa nó")
+    args = parser.parse_args(argv)
+
+    if args.responses:
+        os.makedirs(args.responses, exist_ok=True)
+    designs = iter_valid(bode_model.iter_design_dicts(args.input), sys.stderr)
+    f = None
+    if args.f_range:
+        f = np.logspace(np.log10(args.f_range[0]), np.log10(args.f_range[1]), args.points)
+    exporter = None
+    if args.export:
+        # Không có lưới cố định: vẫn ghi nối tiếp từng lô, mỗi bản ghi kèm lưới riêng
+        # (lưới của lô, tối đa args.points điểm)
+        exporter = bode_export.open_writer(args.export, f, meta={"source": "bode_cli", "input": args.input,
+                                                                 "n_points": args.points, "adaptive": args.adaptive},
+                                           n_freq=args.points)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        writer = None
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=METRIC_FIELDS + CLOSED_LOOP_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+        count = 0
+        for name, model, resp, m in evaluate_designs(designs, n_points=args.points, adaptive=args.adaptive,
+                                                      chunk=args.chunk, f=f):
+            cl = None
+            if model.beta is not None:
+                cl = bode_metrics.compute_closed_loop(model.gain_val, model.poles_rad(), model.zeros_rad(), resp,
+                                                      model.beta)[1]
+            rec = metrics_record(name, m, cl)
+            if writer is not None:
+                writer.writerow(rec)
+            else:
+                if args.inline_response:
+                    rec.update(f_hz=resp.f.tolist(), mag_db=resp.mag_db.tolist(), phase_deg=resp.phase_deg.tolist())
+                out.write(json.dumps(rec) + "\n")
+            if args.responses:
+                np.savez(os.path.join(args.responses, safe_filename(name) + ".npz"),
+                         f_hz=resp.f, mag_db=resp.mag_db, phase_deg=resp.phase_deg)
+            if exporter is not None:
+                exporter.append([name], resp.log_h[None], [m], grids=None if f is not None else resp.f)
+            count += 1
+        print(f"Đã đánh giá {count} thiết kế.", file=sys.stderr)
+    finally:
+        if exporter is not None:
+            exporter.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
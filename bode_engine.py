@@ -0,0 +1,271 @@
+"""Engine tính đáp ứng tần số cho hệ Pole/Zero, không phụ thuộc Tk."""
+from collections import OrderedDict
+
+import numpy as np
+
+# Trục tần số bắt đầu từ 0.01 Hz (giống giao diện chính)
+F_MIN_HZ = 0.01
+N_POINTS = 1000
+# Số phần tử tối đa của mảng trung gian (hệ × tần số × pole/zero) mỗi lần tính theo lô
+BATCH_ELEMENTS = 1 << 22
+
+
+# --- LƯỚI TẦN SỐ ---
+def f_max_for(roots_rad):
+    # F_max = 100 lần tần số của pole/zero cao nhất, mặc định 1 MHz
+    roots_rad = np.asarray(roots_rad, dtype=complex)
+    if roots_rad.size == 0:
+        return 1e6
+    return np.max(np.abs(roots_rad)) / (2 * np.pi) * 100.0
+
+
+def frequency_grid(roots_rad, f_min=F_MIN_HZ, n_points=N_POINTS):
+    return np.logspace(np.log10(f_min), np.log10(f_max_for(roots_rad)), n_points)
+
+
+# --- TÍNH ĐÁP ỨNG ---
+# Dạng chuẩn hóa: H(s) = A0 * prod(1 - s/z) / prod(1 - s/p).
+# Làm việc với log H nên không phải tính prod(-p)/prod(-z) (tràn số khi có
+# nhiều pole tần số cao); chi phí tuyến tính theo số pole/zero.
+def _is_real(roots):
+    return not np.iscomplexobj(roots) or not np.any(roots.imag)
+
+
+def _real_log_sum(w, inv_roots, sign, log_k):
+    # Pole/zero thực (trường hợp của mạch RC): 1 - jw/r
+    # -> ln|.| = 0.5*ln(1 + (w/r)^2), pha = -atan(w/r), chỉ cần phép tính số thực.
+    # Zero và pole xếp chung một mảng x = (1/r) * w với trục tần số nằm trong cùng (liền bộ nhớ),
+    # rồi cộng có dấu (+zero, -pole) bằng một phép nhân vectơ-ma trận thay cho np.sum.
+    # w: (F,) hoặc (S, F), inv_roots: (N,) hoặc (S, N) -> (F,) hoặc (S, F)
+    x = inv_roots[..., :, None] * w[..., None, :]
+    x2 = x * x
+    np.log1p(x2, out=x2)
+    np.arctan(x, out=x)
+    mag = np.matmul(0.5 * sign, x2)
+    out = np.empty(mag.shape, dtype=complex)
+    out.real = mag + np.real(log_k)
+    out.imag = np.imag(log_k) - np.matmul(sign, x)
+    return out
+
+
+def _log_factors(w, roots):
+    # Pole/zero phức: tổng log(1 - s/r) trên số phức
+    roots = np.asarray(roots)
+    if roots.size == 0:
+        return np.zeros(w.shape, dtype=complex)
+    s = 1j * w
+    return np.sum(np.log1p(-s[:, None] / roots[None, :].astype(complex)), axis=1)
+
+
+def zpk_log_response(gain_dc, poles, zeros, w):
+    # log H(jw): phần thực = ln|H|, phần ảo = pha (rad) đã liên tục
+    # vì mỗi thừa số (1 - s/r) không bao giờ cắt nhánh âm của log với w > 0
+    w = np.asarray(w, dtype=float)
+    poles = np.asarray(poles)
+    zeros = np.asarray(zeros)
+    log_k = np.log(complex(gain_dc))
+    if _is_real(poles) and _is_real(zeros):
+        with np.errstate(divide="ignore"):
+            inv = 1.0 / np.concatenate([zeros.real, poles.real])
+        sign = np.concatenate([np.ones(len(zeros)), -np.ones(len(poles))])
+        return _real_log_sum(w, inv, sign, log_k)
+    return log_k + _log_factors(w, zeros) - _log_factors(w, poles)
+
+
+def zpk_response(gain_dc, poles, zeros, w):
+    return np.exp(zpk_log_response(gain_dc, poles, zeros, w))
+
+
+# --- TÍNH THEO LÔ (NHIỀU HỆ / NHIỀU ĐIỂM) ---
+def pad_roots(root_lists):
+    # Gộp các danh sách pole/zero dài ngắn khác nhau thành mảng 2D;
+    # chỗ trống điền inf nên thừa số (1 - s/inf) = 1, không ảnh hưởng kết quả
+    n = max((len(r) for r in root_lists), default=0)
+    is_complex = any(np.iscomplexobj(r) and np.any(np.imag(r)) for r in root_lists)
+    out = np.full((len(root_lists), n), np.inf, dtype=complex if is_complex else float)
+    for i, r in enumerate(root_lists):
+        out[i, :len(r)] = r if is_complex else np.real(r)
+    return out
+
+
+def _log_factors_2d(w, roots):
+    # Pole/zero phức. w: (S, F), roots: (S, N) -> (S, F)
+    if roots.shape[1] == 0:
+        return np.zeros(w.shape, dtype=complex)
+    return np.sum(np.log1p(-(1j * w)[:, :, None] / roots[:, None, :]), axis=2)
+
+
+def batch_log_response(gains, poles_2d, zeros_2d, w):
+    # log H cho S hệ cùng lúc; w là lưới chung (F,) hoặc riêng từng hệ (S, F)
+    gains = np.asarray(gains)
+    w = np.asarray(w, dtype=float)
+    if w.ndim == 1:
+        w = np.broadcast_to(w, (len(gains), len(w)))
+    log_k = np.log(gains.astype(complex))[:, None]
+    if not np.iscomplexobj(poles_2d) and not np.iscomplexobj(zeros_2d):
+        with np.errstate(divide="ignore"):
+            inv = 1.0 / np.concatenate([zeros_2d, poles_2d], axis=1)
+        sign = np.concatenate([np.ones(zeros_2d.shape[1]), -np.ones(poles_2d.shape[1])])
+        return _real_log_sum(w, inv, sign, log_k)
+    return log_k + _log_factors_2d(w, zeros_2d) - _log_factors_2d(w, poles_2d)
+
+
+class BodeResponse:
+    """Đáp ứng trên lưới tần số, lưu ở dạng log H; dB, pha và các chỉ số đều lấy từ cùng mảng này."""
+
+    def __init__(self, f, log_h):
+        self.f = f
+        self.w = 2 * np.pi * f
+        self.log_h = log_h
+        self._mag_db = None
+        self._phase_deg = None
+
+    @property
+    def h(self):
+        return np.exp(self.log_h)
+
+    @property
+    def mag_db(self):
+        if self._mag_db is None:
+            self._mag_db = self.log_h.real * (20 / np.log(10))
+        return self._mag_db
+
+    @property
+    def phase_deg(self):
+        # Pha (độ) đã unwrap sẵn, cùng quy ước với scipy.signal.bode
+        if self._phase_deg is None:
+            self._phase_deg = np.degrees(self.log_h.imag)
+        return self._phase_deg
+
+
+def evaluate(gain_dc, poles, zeros, f):
+    f = np.asarray(f, dtype=float)
+    return BodeResponse(f, zpk_log_response(gain_dc, poles, zeros, 2 * np.pi * f))
+
+
+def batch_log_response_chunked(gains, poles_2d, zeros_2d, f):
+    # batch_log_response trên lưới chung, chia khối theo hàng để giới hạn bộ nhớ trung gian
+    f = np.asarray(f, dtype=float)
+    w = 2 * np.pi * f
+    n = len(gains)
+    step = max(1, BATCH_ELEMENTS // (len(f) * max(poles_2d.shape[1] + zeros_2d.shape[1], 1)))
+    if n <= step:
+        return batch_log_response(gains, poles_2d, zeros_2d, w)
+    return np.concatenate([batch_log_response(gains[i:i + step], poles_2d[i:i + step], zeros_2d[i:i + step], w)
+                           for i in range(0, n, step)])
+
+
+def evaluate_batch(systems, f):
+    # Nhiều hệ (gain_dc, poles, zeros) trên cùng lưới: một mảng 2D (hệ × tần số),
+    # pole/zero được đệm inf để cùng độ dài
+    f = np.asarray(f, dtype=float)
+    if not systems:
+        return []
+    gains = np.array([g for g, _, _ in systems], dtype=float)
+    P = pad_roots([np.asarray(p) for _, p, _ in systems])
+    Z = pad_roots([np.asarray(z) for _, _, z in systems])
+    log_h = batch_log_response_chunked(gains, P, Z, f)
+    return [BodeResponse(f, row) for row in log_h]
+
+
+# --- CACHE ĐÁP ỨNG (LRU) ---
+class ResponseCache:
+    # Ghi nhớ đáp ứng theo ảnh chụp (gain, poles, zeros, lưới tần số).
+    # Hệ không đổi khi vẽ lại, hoặc quay lại trạng thái cũ khi kéo/undo, sẽ không phải tính lại.
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    @staticmethod
+    def make_key(gain_dc, poles, zeros, f):
+        return (complex(gain_dc),
+                np.asarray(poles, dtype=complex).tobytes(),
+                np.asarray(zeros, dtype=complex).tobytes(),
+                np.asarray(f, dtype=float).tobytes())
+
+    def evaluate(self, gain_dc, poles, zeros, f):
+        key = self.make_key(gain_dc, poles, zeros, f)
+        resp = self._data.get(key)
+        if resp is not None:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return resp
+        self.misses += 1
+        resp = evaluate(gain_dc, poles, zeros, f)
+        self._data[key] = resp
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return resp
+
+    def evaluate_many(self, systems, f):
+        # Như evaluate() cho từng hệ, nhưng các hệ chưa có trong cache được tính chung một lô
+        keys = [self.make_key(g, p, z, f) for g, p, z in systems]
+        out = [self._data.get(k) for k in keys]
+        missing = [i for i, resp in enumerate(out) if resp is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        for i, k in enumerate(keys):
+            if out[i] is not None:
+                self._data.move_to_end(k)
+        for i, resp in zip(missing, evaluate_batch([systems[i] for i in missing], f)):
+            out[i] = resp
+            self._data[keys[i]] = resp
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return out
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+# --- LƯỚI TẦN SỐ THÍCH ỨNG ---
+def _crossings(x, y, level):
+    # Chỉ số i sao cho y đi qua `level` giữa x[i] và x[i+1]
+    d = y - level
+    return np.nonzero(np.signbit(d[:-1]) != np.signbit(d[1:]))[0]
+
+
+def adaptive_grid(systems, f_min=F_MIN_HZ, f_max=None, n_points=400):
+    # Lưới log thô, sau đó làm dày quanh góc pole/zero, điểm 0 dB, -3 dB và pha -180°
+    # của từng hệ trong `systems` (list các (gain_dc, poles, zeros)); tổng số điểm ~ n_points.
+    roots = [np.concatenate([np.asarray(p, dtype=complex), np.asarray(z, dtype=complex)])
+             for _, p, z in systems]
+    roots = np.concatenate(roots) if roots else np.empty(0, dtype=complex)
+    if f_max is None:
+        f_max = f_max_for(roots)
+    lo, hi = np.log10(f_min), np.log10(f_max)
+
+    n_coarse = max(n_points // 4, 32)
+    base = np.linspace(lo, hi, n_coarse)
+    step = base[1] - base[0]
+
+    # (tâm, nửa độ rộng) theo log10(Hz); giao cắt được ưu tiên hơn góc pole/zero
+    crossings = []
+    for gain_dc, poles, zeros in systems:
+        resp = evaluate(gain_dc, poles, zeros, 10 ** base)
+        mag, phase = resp.mag_db, resp.phase_deg
+        for y, level in ((mag, 0.0), (mag, mag[0] - 3), (phase, -180.0)):
+            for i in _crossings(base, y, level):
+                crossings.append((base[i] + step / 2, step / 2))
+    corners = [(c, 0.5) for c in np.log10(np.abs(roots[roots != 0]) / (2 * np.pi)) if lo <= c <= hi]
+    features = crossings + corners
+
+    remaining = n_points - n_coarse
+    if not features or remaining <= 0:
+        return 10 ** base
+    per = remaining // len(features)
+    if per < 3:
+        # Quá nhiều đặc điểm so với ngân sách: giữ giao cắt, lấy đều các góc còn lại
+        per = 3
+        keep = max(remaining // per - len(crossings), 0)
+        idx = np.linspace(0, len(corners) - 1, min(keep, len(corners))).astype(int) if corners else []
+        features = crossings[:remaining // per] + [corners[i] for i in np.unique(idx)]
+
+    pts = [base] + [np.linspace(c - hw, c + hw, per) for c, hw in features]
+    grid = np.unique(np.clip(np.concatenate(pts), lo, hi))
+    return 10 ** grid
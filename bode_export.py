@@ -0,0 +1,387 @@
+"""Xuất đáp ứng (phức, biên độ, pha) và chỉ số của nhiều hệ / cả một lần quét ra NPZ, file memmap hoặc CSV.
+
+File memmap (.bodemm) mở lại được không cần sao chép (np.memmap), kể cả khi lớn hơn RAM:
+    b = bode_export.load("sweep.bodemm")
+    b.f_hz, b.names, b["mag_db"] (S, N), b["pm_deg"] (S,), b.meta
+
+Khi các hệ không chung lưới tần số (lưới theo lô, lưới thích ứng, bảng tra Cc), f_hz chung để trống
+và mỗi bản ghi có thêm trường grid_hz (N,); bản ghi có ít điểm hơn N được đệm NaN ở cuối:
+    b.grid(i), b["mag_db"][i][:len(b.grid(i))]
+
+Bố cục .bodemm: MAGIC (8 byte) | độ dài header (uint64 little-endian) | header JSON |
+f_hz (float64, N hoặc 0) | S bản ghi có cấu trúc (tên, chỉ số, [grid_hz], h, mag_db, phase_deg).
+Các phần đều căn theo 64 byte.
+"""
+import csv
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+import bode_metrics
+
+FORMAT_VERSION = 2
+MAGIC = b"BODEMM01"
+ALIGN = 64
+# Độ dài tối đa của tên hệ trong bản ghi (cắt bớt nếu dài hơn)
+NAME_WIDTH = 32
+# Chừa chỗ để ghi lại header (số bản ghi) khi đóng file ghi nối tiếp
+HEADER_SLACK = 64
+METRIC_FIELDS = ("dc_db", "fc_hz", "pm_deg", "gm_db", "f180_hz", "bw_hz")
+RESPONSE_FIELDS = ("h", "mag_db", "phase_deg")
+# Lưới tần số riêng của từng bản ghi (chỉ có khi các hệ không chung lưới)
+GRID_FIELD = "grid_hz"
+EXTENSIONS = (".npz", ".bodemm", ".csv")
+
+
+def _align(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def record_dtype(n_freq, fields=RESPONSE_FIELDS, name_width=NAME_WIDTH, per_record_grid=False):
+    # Mỗi hệ một bản ghi; b["mag_db"] trên memmap là view (S, N) có bước nhảy, không sao chép
+    for fld in fields:
+        if fld not in RESPONSE_FIELDS:
+            raise ValueError(f"Trường đáp ứng không hỗ trợ: {fld}")
+    dt = [("name", f"<U{name_width}")] + [(m, "<f8") for m in METRIC_FIELDS]
+    if per_record_grid:
+        dt.append((GRID_FIELD, "<f8", (n_freq,)))
+    dt += [(fld, "<c16" if fld == "h" else "<f8", (n_freq,)) for fld in fields]
+    return np.dtype(dt)
+
+
+def _width(dtype):
+    # Số điểm tần số của một bản ghi
+    return next((dtype[k].shape[0] for k in dtype.names if dtype[k].shape), 0)
+
+
+def _pad(a, width, fill):
+    # (S, n) -> (S, width), n <= width, phần thiếu điền fill
+    if a.shape[1] == width:
+        return a
+    if a.shape[1] > width:
+        raise ValueError(f"Bản ghi có {a.shape[1]} điểm tần số, nhiều hơn {width} điểm của file.")
+    out = np.full((len(a), width), fill, dtype=a.dtype)
+    out[:, :a.shape[1]] = a
+    return out
+
+
+def make_records(dtype, names, log_h, metrics=None, grids=None):
+    # log_h (S, n) của bode_engine, n <= số điểm của bản ghi (phần thiếu đệm NaN);
+    # grids: lưới (n,) hoặc (S, n) khi dtype có GRID_FIELD; metrics: list StabilityMetrics (None -> NaN)
+    log_h = np.atleast_2d(log_h)
+    rec = np.zeros(len(log_h), dtype=dtype)
+    rec["name"] = [str(n)[:dtype["name"].itemsize // 4] for n in names]
+    fields = dtype.names
+    width = _width(dtype)
+    if GRID_FIELD in fields:
+        if grids is None:
+            raise ValueError("File có lưới riêng từng bản ghi: cần truyền grids.")
+        rec[GRID_FIELD] = _pad(np.broadcast_to(np.asarray(grids, dtype=float), log_h.shape), width, np.nan)
+    log_h = _pad(log_h, width, complex(np.nan, np.nan))
+    if "h" in fields:
+        rec["h"] = np.exp(log_h)
+    if "mag_db" in fields:
+        rec["mag_db"] = log_h.real * bode_metrics.DB_PER_NEPER
+    if "phase_deg" in fields:
+        rec["phase_deg"] = np.degrees(log_h.imag)
+    dicts = [m.as_dict() if m is not None else {} for m in metrics] if metrics is not None else None
+    for fld in METRIC_FIELDS:
+        if dicts is None:
+            rec[fld] = np.nan
+        else:
+            rec[fld] = [np.nan if d.get(fld) is None else d[fld] for d in dicts]
+    return rec
+
+
+def _header_bytes(header, size=None):
+    raw = json.dumps(header).encode("utf-8")
+    size = _align(len(raw) + HEADER_SLACK) if size is None else size
+    if len(raw) > size:
+        raise ValueError("Header không còn đủ chỗ để ghi lại.")
+    return raw + b" " * (size - len(raw))
+
+
+def _make_header(f, dtype, n_records, meta):
+    # n_freq: số điểm của f_hz chung (0 khi mỗi bản ghi có lưới riêng)
+    return {"version": FORMAT_VERSION, "n_records": int(n_records), "n_freq": len(f),
+            "dtype": [list(d) if len(d) == 2 else [d[0], d[1], list(d[2])] for d in dtype.descr],
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "meta": meta or {}}
+
+
+def _write_prefix(fh, header, f):
+    # -> (độ dài header, vị trí bắt đầu bản ghi)
+    hb = _header_bytes(header)
+    fh.write(MAGIC + struct.pack("<Q", len(hb)) + hb)
+    f_off = len(MAGIC) + 8 + len(hb)
+    data_off = _align(f_off + 8 * len(f))
+    fh.write(np.asarray(f, dtype="<f8").tobytes())
+    fh.write(b"\0" * (data_off - f_off - 8 * len(f)))
+    return len(hb), data_off
+
+
+# --- MEMMAP: GHI NỐI TIẾP ---
+class BundleWriter:
+    # Ghi nối tiếp từng lô, không giữ dữ liệu trong RAM (dùng cho lần quét không biết trước số hệ).
+    # Số bản ghi được ghi lại vào header khi close(). f=None: mỗi bản ghi một lưới riêng tối đa
+    # n_freq điểm, truyền bằng append(..., grids=)
+    def __init__(self, path, f, meta=None, fields=RESPONSE_FIELDS, name_width=NAME_WIDTH, n_freq=None):
+        self.path = path
+        self.f = np.empty(0) if f is None else np.asarray(f, dtype=float)
+        self.dtype = record_dtype(len(self.f) if f is not None else n_freq, fields, name_width,
+                                  per_record_grid=f is None)
+        self.meta = meta
+        self.n_records = 0
+        self._fh = open(path, "wb")
+        self._header_len, _ = _write_prefix(self._fh, _make_header(self.f, self.dtype, 0, meta), self.f)
+
+    def append(self, names, log_h, metrics=None, grids=None):
+        rec = make_records(self.dtype, names, log_h, metrics, grids)
+        self._fh.write(rec.tobytes())
+        self.n_records += len(rec)
+
+    def close(self):
+        if self._fh is None:
+            return
+        header = _make_header(self.f, self.dtype, self.n_records, self.meta)
+        self._fh.seek(len(MAGIC) + 8)
+        self._fh.write(_header_bytes(header, self._header_len))
+        self._fh.close()
+        self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# --- MEMMAP: CẤP PHÁT TRƯỚC, GHI SONG SONG ---
+def preallocate(path, f, n_records, meta=None, fields=RESPONSE_FIELDS, name_width=NAME_WIDTH):
+    # Tạo file đủ chỗ cho n_records bản ghi (file thưa, chưa tốn đĩa); các process con
+    # ghi vào vùng riêng của mình bằng write_records
+    f = np.asarray(f, dtype=float)
+    dtype = record_dtype(len(f), fields, name_width)
+    with open(path, "wb") as fh:
+        _, data_off = _write_prefix(fh, _make_header(f, dtype, n_records, meta), f)
+        fh.truncate(data_off + dtype.itemsize * n_records)
+
+
+def write_records(path, start, names, log_h, metrics=None):
+    b = load(path, mode="r+")
+    rec = make_records(b.records.dtype, names, log_h, metrics)
+    b.records[start:start + len(rec)] = rec
+    b.records.flush()
+
+
+# --- ĐỌC ---
+class Bundle:
+    # Kết quả đã xuất: f_hz (N,), records (S,) có cấu trúc; b["mag_db"] -> (S, N), b["pm_deg"] -> (S,)
+    def __init__(self, f_hz, records, meta, header=None):
+        self.f_hz = f_hz
+        self.records = records
+        self.meta = meta
+        self.header = header or {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, field):
+        return self.records[field]
+
+    @property
+    def names(self):
+        return self.records["name"]
+
+    @property
+    def fields(self):
+        return self.records.dtype.names
+
+    def grid(self, i):
+        # Lưới tần số của bản ghi i (đã bỏ phần đệm NaN nếu các bản ghi có lưới riêng)
+        if GRID_FIELD not in self.fields:
+            return self.f_hz
+        g = np.asarray(self.records[GRID_FIELD][i])
+        return g[np.isfinite(g)]
+
+
+def _load_bodemm(path, mode):
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Không phải file {MAGIC.decode()}: {path}")
+        (hlen,) = struct.unpack("<Q", fh.read(8))
+        header = json.loads(fh.read(hlen).decode("utf-8"))
+    if header["version"] > FORMAT_VERSION:
+        raise ValueError(f"Phiên bản file {header['version']} mới hơn bản đọc được ({FORMAT_VERSION}).")
+    dtype = np.dtype([tuple(d[:2]) + ((tuple(d[2]),) if len(d) > 2 else ()) for d in header["dtype"]])
+    n, nf = header["n_records"], header["n_freq"]
+    f_off = len(MAGIC) + 8 + hlen
+    data_off = _align(f_off + 8 * nf)
+    f_hz = np.memmap(path, dtype="<f8", mode="r", offset=f_off, shape=(nf,))
+    if n == 0:
+        return Bundle(f_hz, np.zeros(0, dtype=dtype), header["meta"], header)
+    records = np.memmap(path, dtype=dtype, mode=mode, offset=data_off, shape=(n,))
+    return Bundle(f_hz, records, header["meta"], header)
+
+
+def _load_npz(path):
+    with np.load(path) as z:
+        meta = json.loads(str(z["meta"])) if "meta" in z else {}
+        f_hz = z["f_hz"]
+        cols = {k: z[k] for k in z.files if k not in ("meta", "f_hz")}
+    names = cols.pop("names")
+    fields = tuple(fld for fld in RESPONSE_FIELDS if fld in cols)
+    per_record = GRID_FIELD in cols
+    width = cols[GRID_FIELD].shape[1] if per_record else len(f_hz)
+    dtype = record_dtype(width, fields, max(names.dtype.itemsize // 4, 1), per_record_grid=per_record)
+    records = np.zeros(len(names), dtype=dtype)
+    records["name"] = names
+    for k in dtype.names[1:]:
+        records[k] = cols[k] if k in cols else np.nan
+    return Bundle(f_hz, records, meta)
+
+
+def load(path, mode="r"):
+    # .bodemm mở bằng memmap (không đọc vào RAM); .npz được giải nén vào bộ nhớ
+    if os.path.splitext(path)[1].lower() == ".npz":
+        return _load_npz(path)
+    return _load_bodemm(path, mode)
+
+
+# --- NPZ ---
+def save_npz(path, names, f, log_h, metrics=None, meta=None, fields=RESPONSE_FIELDS, compressed=True, grids=None):
+    # Mỗi đại lượng một mảng: f_hz (N,), names (S,), h/mag_db/phase_deg (S, N), chỉ số (S,), meta (JSON).
+    # grids (S, N): lưới riêng từng bản ghi (đệm NaN), khi đó f_hz trống
+    log_h = np.atleast_2d(log_h)
+    dtype = record_dtype(log_h.shape[1], fields, max([len(str(n)) for n in names] + [1]), per_record_grid=grids is not None)
+    rec = make_records(dtype, names, log_h, metrics, grids)
+    f = np.empty(0) if grids is not None else f
+    arrays = {"f_hz": np.asarray(f, dtype=float), "names": rec["name"],
+              "meta": np.array(json.dumps({"version": FORMAT_VERSION, **(meta or {})}))}
+    arrays.update({k: rec[k] for k in rec.dtype.names[1:]})
+    (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+
+class NpzWriter:
+    # Cùng giao diện append/close với BundleWriter; NPZ chỉ ghi được một lần nên các lô được
+    # gom trong RAM tới khi close(). Lần quét lớn hơn RAM thì dùng .bodemm hoặc CSV.
+    def __init__(self, path, f, meta=None, fields=RESPONSE_FIELDS, compressed=True, n_freq=None):
+        self.path = path
+        self.f = None if f is None else np.asarray(f, dtype=float)
+        self.width = len(self.f) if f is not None else n_freq
+        self.meta = meta
+        self.fields = fields
+        self.compressed = compressed
+        self.names, self.log_h, self.metrics, self.grids = [], [], [], []
+
+    def append(self, names, log_h, metrics=None, grids=None):
+        log_h = np.atleast_2d(log_h)
+        self.names += [str(n) for n in names]
+        self.log_h.append(_pad(log_h, self.width, complex(np.nan, np.nan)))
+        self.metrics += list(metrics) if metrics is not None else [None] * len(log_h)
+        if self.f is None:
+            self.grids.append(_pad(np.broadcast_to(np.asarray(grids, dtype=float), log_h.shape), self.width, np.nan))
+
+    def close(self):
+        if self.log_h is None:
+            return
+        log_h = np.concatenate(self.log_h) if self.log_h else np.empty((0, self.width), dtype=complex)
+        grids = None
+        if self.f is None:
+            grids = np.concatenate(self.grids) if self.grids else np.empty((0, self.width))
+        save_npz(self.path, self.names, self.f, log_h, self.metrics, self.meta, self.fields, self.compressed, grids)
+        self.log_h = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# --- CSV ---
+class CsvStreamWriter:
+    # Dạng dài (mỗi dòng một điểm tần số của một hệ) để ghi nối tiếp lần quét rất lớn:
+    # name, f_hz, mag_db, phase_deg, re, im. Mỗi hệ được định dạng thành một khối rồi ghi một lần.
+    # out: đường dẫn hoặc file đã mở (vd. sys.stdout, không bị đóng khi close()).
+    # f=None: mỗi hệ một lưới riêng, truyền bằng append(..., grids=)
+    HEADER = ("name", "f_hz", "mag_db", "phase_deg", "re", "im")
+
+    def __init__(self, out, f, precision=9):
+        self._own = isinstance(out, (str, os.PathLike))
+        self.fh = open(out, "w", newline="", encoding="utf-8") if self._own else out
+        self.f = None if f is None else np.asarray(f, dtype=float)
+        self.precision = precision
+        self.n_rows = 0
+        csv.writer(self.fh, lineterminator="\n").writerow(self.HEADER)
+
+    @staticmethod
+    def _quoted(name):
+        # Tên theo quy tắc CSV; '%' được nhân đôi vì tên nằm trong chuỗi định dạng dòng
+        name = str(name)
+        if any(ch in name for ch in ',"\r\n'):
+            name = '"' + name.replace('"', '""') + '"'
+        return name.replace("%", "%%")
+
+    def append(self, names, log_h, metrics=None, grids=None):
+        # metrics không có chỗ trong dạng dài (xuất chỉ số bằng bode_cli --format csv)
+        log_h = np.atleast_2d(log_h)
+        grids = np.broadcast_to(np.asarray(self.f if grids is None else grids, dtype=float), log_h.shape)
+        mag = log_h.real * bode_metrics.DB_PER_NEPER
+        phase = np.degrees(log_h.imag)
+        h = np.exp(log_h)
+        row = f",%.{self.precision}g" * 5 + "\n"
+        for name, f, m, ph, hh in zip(names, grids, mag, phase, h):
+            cols = np.column_stack([f, m, ph, hh.real, hh.imag])
+            self.fh.write(((self._quoted(name) + row) * len(cols)) % tuple(cols.ravel()))
+            self.n_rows += len(cols)
+
+    def close(self):
+        if self._own and not self.fh.closed:
+            self.fh.close()
+        elif not self._own:
+            self.fh.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# --- TIỆN DỤNG ---
+def open_writer(path, f, meta=None, n_freq=None):
+    # Chọn bộ ghi theo đuôi file; mọi bộ ghi có append(names, log_h, metrics, grids) và close().
+    # f: lưới chung; f=None: mỗi bản ghi một lưới riêng tối đa n_freq điểm (truyền grids khi append)
+    if f is None and not n_freq:
+        raise ValueError("Cần lưới tần số chung hoặc số điểm tối đa của lưới riêng.")
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npz":
+        return NpzWriter(path, f, meta, n_freq=n_freq)
+    if ext == ".csv":
+        return CsvStreamWriter(path, f)
+    if ext == ".bodemm":
+        return BundleWriter(path, f, meta, n_freq=n_freq)
+    raise ValueError(f"Đuôi file không hỗ trợ: {ext} (dùng {', '.join(EXTENSIONS)})")
+
+
+def export_traces(path, traces, meta=None):
+    # Xuất các SystemTrace (giao diện / bode_render). Hệ không chung lưới (vd. đang kéo Cc với bảng tra,
+    # lưới thích ứng) được ghi với lưới riêng từng bản ghi, không nội suy
+    if not traces:
+        raise ValueError("Không có hệ nào để xuất.")
+    meta = dict(meta or {})
+    meta.setdefault("systems", [dict(name=t.sys.name, **t.sys.model.to_dict()) for t in traces])
+    f0 = traces[0].resp.f
+    if all(np.array_equal(t.resp.f, f0) for t in traces):
+        with open_writer(path, f0, meta) as w:
+            w.append([t.sys.name for t in traces], np.stack([t.resp.log_h for t in traces]), [t.metrics for t in traces])
+        return
+    with open_writer(path, None, meta, n_freq=max(len(t.resp.f) for t in traces)) as w:
+        for t in traces:
+            w.append([t.sys.name], t.resp.log_h[None], [t.metrics], grids=t.resp.f)
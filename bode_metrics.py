@@ -0,0 +1,201 @@
+"""Chỉ số ổn định chính xác (gain/phase crossover, PM, GM, BW -3dB) bằng tìm nghiệm trên đáp ứng giải tích."""
+import numpy as np
+
+import bode_engine
+
+DB_PER_NEPER = 20 / np.log(10)
+
+
+class StabilityMetrics:
+    # Tần số tính bằng Hz, biên độ bằng dB, pha bằng độ
+    def __init__(self, dc_db, gain_crossovers, phase_margins, phase_crossovers, gain_margins, bandwidth):
+        self.dc_db = dc_db
+        self.gain_crossovers = gain_crossovers
+        self.phase_margins = phase_margins
+        self.phase_crossovers = phase_crossovers
+        self.gain_margins = gain_margins
+        self.bandwidth = bandwidth
+
+    @property
+    def fc(self):
+        # Gain crossover đầu tiên (thấp nhất)
+        return float(self.gain_crossovers[0]) if len(self.gain_crossovers) else None
+
+    @property
+    def pm(self):
+        # PM xấu nhất trên mọi gain crossover
+        return float(np.min(self.phase_margins)) if len(self.phase_margins) else None
+
+    @property
+    def gm(self):
+        return float(np.min(self.gain_margins)) if len(self.gain_margins) else None
+
+    @property
+    def f180(self):
+        return float(self.phase_crossovers[0]) if len(self.phase_crossovers) else None
+
+    def as_dict(self):
+        return {"dc_db": self.dc_db, "fc_hz": self.fc, "pm_deg": self.pm, "gm_db": self.gm,
+                "f180_hz": self.f180, "bw_hz": self.bandwidth,
+                "gain_crossovers_hz": [float(x) for x in self.gain_crossovers],
+                "phase_crossovers_hz": [float(x) for x in self.phase_crossovers]}
+
+
+# --- TÌM NGHIỆM VECTOR HÓA ---
+def _refine(fn, a, b, fa, fb, tol=1e-12, maxiter=60):
+    # Regula falsi (biến thể Illinois) cho nhiều khoảng [a, b] cùng lúc; fn(x) -> mảng cùng shape
+    side = np.zeros(a.shape, dtype=int)
+    c = a
+    for _ in range(maxiter):
+        denom = fb - fa
+        c = np.where(denom != 0, (a * fb - b * fa) / np.where(denom != 0, denom, 1), 0.5 * (a + b))
+        fcv = fn(c)
+        keep_b = np.signbit(fcv) == np.signbit(fa)
+        # Nghiệm nằm giữa c và b: thay a; ngược lại thay b. Lặp lại cùng phía -> chia đôi đầu kia
+        fb = np.where(keep_b & (side == -1), fb / 2, fb)
+        fa = np.where(~keep_b & (side == 1), fa / 2, fa)
+        a, fa = np.where(keep_b, c, a), np.where(keep_b, fcv, fa)
+        b, fb = np.where(keep_b, b, c), np.where(keep_b, fb, fcv)
+        side = np.where(keep_b, -1, 1)
+        if np.all((np.abs(b - a) < tol) | (fcv == 0)):
+            break
+    return c
+
+
+def _brackets(y, level):
+    d = y - level
+    return np.nonzero(np.signbit(d[:-1]) != np.signbit(d[1:]))[0]
+
+
+# --- CHỈ SỐ ỔN ĐỊNH ---
+def compute_metrics_batch(systems, f, log_h=None):
+    # systems: list các (gain_dc, poles, zeros) (rad/s); f: lưới tần số chung (Hz).
+    # Mọi khoảng giao cắt của mọi hệ được tinh chỉnh trong một lần tìm nghiệm vector hóa.
+    gains = np.array([g for g, _, _ in systems], dtype=float)
+    P = bode_engine.pad_roots([np.asarray(p) for _, p, _ in systems])
+    Z = bode_engine.pad_roots([np.asarray(z) for _, _, z in systems])
+    return compute_metrics_arrays(gains, P, Z, f, log_h)
+
+
+def compute_metrics_arrays(gains, P, Z, f, log_h=None):
+    # Như compute_metrics_batch nhưng nhận sẵn mảng gain (S,) và pole/zero đã đệm (S, N)
+    f = np.asarray(f, dtype=float)
+    if log_h is None:
+        log_h = bode_engine.batch_log_response_chunked(gains, P, Z, f)
+    mag = log_h.real * DB_PER_NEPER
+    phase = np.degrees(log_h.imag)
+    dc_db = 20 * np.log10(np.abs(gains))
+    x = np.log10(f)
+
+    # Gom mọi khoảng giao cắt: (hệ, chỉ số lưới, loại, mức)
+    rows, idxs, kinds, levels = [], [], [], []
+    for s in range(len(gains)):
+        for kind, y, level in [(0, mag[s], 0.0), (2, mag[s], dc_db[s] - 3)]:
+            i = _brackets(y, level)
+            if kind == 2:
+                i = i[:1]   # BW: chỉ lấy lần đầu tụt 3 dB
+            rows += [s] * len(i); idxs += list(i); kinds += [kind] * len(i); levels += [level] * len(i)
+        # Pha cắt -180° (và -540°, ... nếu pha quay nhiều vòng)
+        lo, hi = np.min(phase[s]), np.max(phase[s])
+        for level in np.arange(-180.0, lo - 360.0, -360.0):
+            if level > hi: continue
+            i = _brackets(phase[s], level)
+            rows += [s] * len(i); idxs += list(i); kinds += [1] * len(i); levels += [level] * len(i)
+
+    rows = np.array(rows, dtype=int); idxs = np.array(idxs, dtype=int)
+    kinds = np.array(kinds, dtype=int); levels = np.array(levels, dtype=float)
+    roots_x = np.empty(0)
+    if len(rows):
+        Pk, Zk, gk = P[rows], Z[rows], gains[rows]
+
+        def residual(xk):
+            lh = bode_engine.batch_log_response(gk, Pk, Zk, (2 * np.pi * 10 ** xk)[:, None])[:, 0]
+            val = np.where(kinds == 1, np.degrees(lh.imag), lh.real * DB_PER_NEPER)
+            return val - levels
+
+        a, b = x[idxs], x[idxs + 1]
+        roots_x = _refine(residual, a, b, residual(a), residual(b))
+        lh = bode_engine.batch_log_response(gk, Pk, Zk, (2 * np.pi * 10 ** roots_x)[:, None])[:, 0]
+        mag_at, phase_at = lh.real * DB_PER_NEPER, np.degrees(lh.imag)
+
+    out = []
+    for s in range(len(gains)):
+        sel = rows == s
+        gc = sel & (kinds == 0); pc = sel & (kinds == 1); bw = sel & (kinds == 2)
+        order_g = np.argsort(roots_x[gc]); order_p = np.argsort(roots_x[pc])
+        out.append(StabilityMetrics(
+            dc_db=float(dc_db[s]),
+            gain_crossovers=10 ** roots_x[gc][order_g],
+            phase_margins=180 + phase_at[gc][order_g] if np.any(gc) else np.empty(0),
+            phase_crossovers=10 ** roots_x[pc][order_p],
+            gain_margins=-mag_at[pc][order_p] if np.any(pc) else np.empty(0),
+            bandwidth=float(10 ** roots_x[bw][0]) if np.any(bw) else None))
+    return out
+
+
+def log_one_plus(log_x):
+    # log(1 + x) tính từ log x: log x + log(1 + 1/x) khi |x| > 1, ngược lại log(1 + x),
+    # nên exp không bao giờ tràn dù |x| rất lớn hay rất nhỏ
+    big = log_x.real > 0
+    return np.where(big, log_x + np.log1p(np.exp(-np.where(big, log_x, 0))),
+                    np.log1p(np.exp(np.where(big, 0, log_x))))
+
+
+def nyquist_encirclements(log_h):
+    # Số vòng (theo chiều kim đồng hồ) đường Nyquist bao quanh -1, tính từ góc đã unwrap của 1 + H
+    # trên tần số dương rồi nhân đôi (nửa tần số âm là ảnh đối xứng). Không suy từ điểm cắt
+    # pha nên vẫn đúng khi RHP zero làm pha quay nhiều vòng. Với pole vòng hở đều ở LHP (P = 0),
+    # số pole vòng kín ở RHP Z = N.
+    arg = np.unwrap(log_one_plus(log_h).imag)
+    return int(np.round(-2 * (arg[-1] - arg[0]) / (2 * np.pi)))
+
+
+def compute_metrics(gain_dc, poles, zeros, resp):
+    # Một hệ, dùng lại đáp ứng đã tính trên lưới
+    return compute_metrics_batch([(gain_dc, poles, zeros)], resp.f, log_h=resp.log_h[None, :])[0]
+
+
+# --- VÒNG KÍN VỚI HỆ SỐ HỒI TIẾP BETA ---
+class ClosedLoopMetrics:
+    # Acl = A / (1 + beta*A). dc_db/peaking_db (dB), f_peak/bandwidth (Hz);
+    # loop: StabilityMetrics của độ lợi vòng beta*A (PM/GM thực sự của mạch hồi tiếp)
+    def __init__(self, beta, dc_db, peaking_db, f_peak, bandwidth, loop):
+        self.beta = beta
+        self.dc_db = dc_db
+        self.peaking_db = peaking_db
+        self.f_peak = f_peak
+        self.bandwidth = bandwidth
+        self.loop = loop
+
+    def as_dict(self):
+        return {"beta": self.beta, "cl_dc_db": self.dc_db, "cl_peaking_db": self.peaking_db,
+                "cl_f_peak_hz": self.f_peak, "cl_bw_hz": self.bandwidth,
+                "loop_fc_hz": self.loop.fc, "loop_pm_deg": self.loop.pm, "loop_gm_db": self.loop.gm}
+
+
+def closed_loop_log_response(log_h, beta):
+    # log Acl = log A - log(1 + beta*A), từng phần tử trên mảng đáp ứng vòng hở đã có.
+    # Phần ảo của log(1 + beta*A) là nhánh chính tại từng điểm, nhảy 2π mỗi khi 1 + beta*A cắt trục
+    # thực âm (vòng không ổn định); unwrap theo tần số, giữ nhánh chính ở tần số thấp nhất
+    log_1p = log_one_plus(log_h + np.log(beta))
+    return log_h - (log_1p.real + 1j * np.unwrap(log_1p.imag, axis=-1))
+
+
+def compute_closed_loop(gain_dc, poles, zeros, resp, beta):
+    # Trả về (BodeResponse vòng kín, ClosedLoopMetrics); không dựng lại mô hình LTI nào
+    log_cl = closed_loop_log_response(resp.log_h, beta)
+    cl = bode_engine.BodeResponse(resp.f, log_cl)
+    mag = cl.mag_db
+    dc_db = float(mag[0])
+    i_peak = int(np.argmax(mag))
+    # BW -3 dB: lần đầu tụt dưới mức DC - 3 dB, nội suy tuyến tính theo log f
+    i = _brackets(mag, dc_db - 3)
+    bandwidth = None
+    if len(i):
+        i = i[0]
+        x0, x1 = np.log10(resp.f[i]), np.log10(resp.f[i + 1])
+        y0, y1 = mag[i] - (dc_db - 3), mag[i + 1] - (dc_db - 3)
+        bandwidth = float(10 ** (x0 - y0 * (x1 - x0) / (y1 - y0)))
+    loop = compute_metrics(gain_dc * beta, poles, zeros, bode_engine.BodeResponse(resp.f, resp.log_h + np.log(beta)))
+    return cl, ClosedLoopMetrics(beta, dc_db, float(max(mag[i_peak] - dc_db, 0.0)), float(resp.f[i_peak]),
+                                 bandwidth, loop)
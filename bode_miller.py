@@ -0,0 +1,195 @@
+"""Tổng hợp tụ bù Miller: tìm Cc cho PM mục tiêu và đường cong đánh đổi Cc–PM theo Av2."""
+import numpy as np
+
+import bode_engine
+import bode_metrics
+
+# Khoảng quét Cc mặc định (F)
+CC_MIN = 1e-15
+CC_MAX = 1e-6
+
+
+def _miller_poles(pole_r, pole_c, cc, av2):
+    # av2 > 0 đã được bode_model.check_miller kiểm tra; không kẹp ở đây để khớp với SystemModel
+    cc = np.asarray(cc, dtype=float)
+    av2 = np.asarray(av2, dtype=float)
+    c_total = np.broadcast_to(pole_c, cc.shape + pole_c.shape).copy()
+    if c_total.shape[-1] > 0: c_total[..., 0] += cc * (1 + av2)
+    if c_total.shape[-1] > 1: c_total[..., 1] += cc * (1 + 1.0/av2)
+    return -1.0 / (pole_r * c_total)
+
+
+def miller_poles_rad(model, cc, av2):
+    # cc, av2: mảng cùng shape (S,) -> pole (S, Np) rad/s với Cin_m cộng vào P1, Cout_m cộng vào P2
+    return _miller_poles(model.pole_r, model.pole_c, cc, av2)
+
+
+def evaluate_cc(model, cc, av2, n_points=400):
+    # PM (độ) và fc (Hz) cho từng cặp (cc, av2), tính chung trên một lưới tần số; NaN nếu không có
+    cc, av2 = np.broadcast_arrays(np.atleast_1d(np.asarray(cc, dtype=float)), np.asarray(av2, dtype=float))
+    P = miller_poles_rad(model, cc.ravel(), av2.ravel())
+    Z = np.broadcast_to(model.zeros_rad(), (len(P), model.count("Z")))
+    gains = np.full(len(P), model.gain_val)
+    f = bode_engine.frequency_grid(np.concatenate([P.ravel(), Z[0]]), n_points=n_points)
+    ms = bode_metrics.compute_metrics_arrays(gains, P, Z, f)
+    nan = float("nan")
+    pm = np.array([m.pm if m.pm is not None else nan for m in ms]).reshape(cc.shape)
+    fc = np.array([m.fc if m.fc is not None else nan for m in ms]).reshape(cc.shape)
+    return pm, fc
+
+
+class CcSolution:
+    def __init__(self, cc, pm, fc, fc_ok=True):
+        self.cc = cc
+        self.pm = pm
+        self.fc = fc
+        # False nếu không Cc nào vừa đạt PM vừa giữ fc ≥ fc tối thiểu; khi đó cc là nghiệm chỉ theo PM
+        self.fc_ok = fc_ok
+
+
+def _bisect(ok, good, bad, tol):
+    # ok(good) đúng, ok(bad) sai: thu hẹp về biên giữa hai điểm, trả về phía thỏa
+    while abs(bad - good) > tol:
+        mid = 0.5 * (good + bad)
+        if ok(mid):
+            good = mid
+        else:
+            bad = mid
+    return good
+
+
+def solve_cc(model, target_pm, target_fc=None, av2=None, cc_min=CC_MIN, cc_max=CC_MAX, n_sweep=64, tol=1e-4):
+    # Quét Cc theo thang log (một lần tính theo lô) rồi chia đôi trên log10(Cc) để tìm biên.
+    # Không có target_fc: Cc nhỏ nhất đạt PM (fc lớn nhất có thể).
+    # Có target_fc: khoảng khả thi là các Cc vừa đạt PM vừa giữ fc ≥ target_fc; trả về Cc lớn nhất
+    # của khoảng đó (dư PM nhiều nhất mà vẫn đạt fc). Khoảng rỗng: trả về nghiệm chỉ theo PM với fc_ok=False.
+    # None nếu không Cc nào trong khoảng quét đạt PM.
+    if model.count("P") < 2:
+        raise ValueError("Cần ít nhất 2 Pole (P1, P2) để bù Miller.")
+    av2 = model.miller_av2 if av2 is None else av2
+    x = np.linspace(np.log10(cc_min), np.log10(cc_max), n_sweep)
+    pm, fc = evaluate_cc(model, 10 ** x, av2)
+    pm_ok = pm >= target_pm
+    if not np.any(pm_ok):
+        return None
+
+    def at(xv):
+        p, f = evaluate_cc(model, 10 ** xv, av2)
+        return float(p[0]), float(f[0])
+
+    def meets_pm(xv):
+        return at(xv)[0] >= target_pm
+
+    def feasible(xv):
+        p, f = at(xv)
+        return p >= target_pm and f >= target_fc
+
+    i = int(np.argmax(pm_ok))
+    x_pm = x[0] if i == 0 else _bisect(meets_pm, x[i], x[i - 1], tol)
+    if target_fc is None:
+        return CcSolution(float(10 ** x_pm), *at(x_pm))
+
+    # NaN (không có crossover) không đạt fc
+    ok = pm_ok & (fc >= target_fc)
+    if feasible(x_pm):
+        k, x_good = int(np.searchsorted(x, x_pm, side="right")), x_pm
+    elif np.any(ok):
+        k = int(np.argmax(ok))
+        x_good = x[k]
+    else:
+        return CcSolution(float(10 ** x_pm), *at(x_pm), fc_ok=False)
+    # Đi lên theo các điểm quét còn khả thi, rồi chia đôi biên trên của khoảng
+    while k < len(x) and ok[k]:
+        x_good = x[k]
+        k += 1
+    if k < len(x):
+        x_good = _bisect(feasible, x_good, x[k], tol)
+    return CcSolution(float(10 ** x_good), *at(x_good))
+
+
+def cc_pm_tradeoff(model, av2_values, cc_min=CC_MIN, cc_max=CC_MAX, n_cc=80):
+    # Lưới Av2 × Cc tính trong một lần: trả về cc (C,), pm và fc (A, C)
+    cc = np.logspace(np.log10(cc_min), np.log10(cc_max), n_cc)
+    av2 = np.asarray(av2_values, dtype=float)
+    pm, fc = evaluate_cc(model, cc[None, :], av2[:, None])
+    return cc, pm, fc
+
+
+# --- BẢNG TRA Cc × TẦN SỐ CHO THANH KÉO Cc ---
+class CcScrubTable:
+    # log H tính sẵn trên các nút log10(Cc) (lưới tần số cố định). Vị trí giữa hai nút
+    # được nội suy tuyến tính; khoảng nào vừa được tra mà chưa kiểm chứng thì xếp hàng
+    # để refine() tính điểm giữa và chèn thêm nút nếu sai số nội suy còn lớn.
+    def __init__(self, model, cc_min=CC_MIN, cc_max=CC_MAX, n_points=bode_engine.N_POINTS, n_init=33,
+                 tol=0.01, max_nodes=513):
+        self.key = self.model_key(model)
+        self.gain = model.gain_val
+        self.av2 = model.miller_av2
+        self.pole_r = model.pole_r.copy()
+        self.pole_c = model.pole_c.copy()
+        self.zeros = model.zeros_rad().copy()
+        self.tol = tol              # sai số cho phép của log H (neper ~ 0.087 dB / 0.57°)
+        self.max_nodes = max_nodes
+
+        # Lưới phủ pole ở cả hai đầu khoảng Cc nên dùng chung cho mọi vị trí thanh kéo
+        p_ends = self._poles(np.array([cc_min, cc_max]))
+        self.end_systems = [(self.gain, p_ends[0], self.zeros), (self.gain, p_ends[1], self.zeros)]
+        self.grid_roots = np.concatenate([p_ends.ravel(), self.zeros])
+        self.f = bode_engine.frequency_grid(self.grid_roots, n_points=n_points)
+        self.x = np.linspace(np.log10(cc_min), np.log10(cc_max), n_init)
+        self.log_h = self._compute(self.x)
+        self.verified = np.zeros(n_init - 1, dtype=bool)
+        self._pending = set()
+
+    @staticmethod
+    def model_key(model):
+        return (model.gain_val, model.miller_av2, model.pole_r.tobytes(), model.pole_c.tobytes(),
+                model.zero_r.tobytes(), model.zero_c.tobytes())
+
+    def matches(self, model):
+        return self.key == self.model_key(model)
+
+    def _poles(self, cc):
+        return _miller_poles(self.pole_r, self.pole_c, cc, self.av2)
+
+    def _compute(self, x):
+        P = self._poles(10 ** x)
+        Z = np.broadcast_to(self.zeros, (len(x), len(self.zeros)))
+        return bode_engine.batch_log_response_chunked(np.full(len(x), self.gain), P, Z, self.f)
+
+    def _interval(self, x):
+        return int(np.clip(np.searchsorted(self.x, x, side="right") - 1, 0, len(self.x) - 2))
+
+    def lookup(self, cc):
+        x = float(np.clip(np.log10(cc), self.x[0], self.x[-1]))
+        i = self._interval(x)
+        if not self.verified[i]:
+            self._pending.add(i)
+        t = (x - self.x[i]) / (self.x[i + 1] - self.x[i])
+        return (1 - t) * self.log_h[i] + t * self.log_h[i + 1]
+
+    def response(self, cc):
+        return bode_engine.BodeResponse(self.f, self.lookup(cc))
+
+    def has_pending(self):
+        return bool(self._pending) and len(self.x) < self.max_nodes
+
+    def refine(self, max_new=4):
+        # Tính điểm giữa của tối đa max_new khoảng đang chờ (một lần theo lô) rồi chèn nút
+        if not self.has_pending():
+            return 0
+        todo = sorted(self._pending)[:max_new]
+        self._pending.difference_update(todo)
+        mids = 0.5 * (self.x[todo] + self.x[np.add(todo, 1)])
+        exact = self._compute(mids)
+        # Chèn từ phải sang trái để chỉ số các khoảng bên trái không đổi
+        for i, xm, lh in sorted(zip(todo, mids, exact), key=lambda t: -t[0]):
+            err = np.max(np.abs(lh - 0.5 * (self.log_h[i] + self.log_h[i + 1])))
+            ok = err <= self.tol or self.x[i + 1] - self.x[i] < 1e-3
+            self.x = np.insert(self.x, i + 1, xm)
+            self.log_h = np.insert(self.log_h, i + 1, lh, axis=0)
+            self.verified = np.insert(self.verified, i + 1, ok)
+            self.verified[i] = ok
+            # Chỉ số các khoảng đang chờ ở bên phải tăng 1
+            self._pending = {j + 1 if j > i else j for j in self._pending}
+        return len(todo)
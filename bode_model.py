@@ -0,0 +1,279 @@
+"""Mô hình hệ thống (Gain, R/C của Pole/Zero, Miller) lưu bằng mảng NumPy, không phụ thuộc Tk."""
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+
+def check_miller(av2, cc):
+    # Kiểm tra chung cho giao diện, file thiết kế và Monte Carlo: công thức Miller
+    # Cin = Cc(1 + Av2), Cout = Cc(1 + 1/Av2) đúng với mọi Av2 > 0 (kể cả 0 < Av2 < 1)
+    av2, cc = float(av2), float(cc)
+    if not av2 > 0:
+        raise ValueError(f"Av2 phải dương (Av2={av2})")
+    if not cc >= 0:
+        raise ValueError(f"Cc không được âm (Cc={cc})")
+    return av2, cc
+
+
+class SystemModel:
+    # Nguồn dữ liệu gốc của một hệ: widget trên giao diện chỉ đồng bộ vào đây khi sửa.
+    # Pole/zero giữ theo thứ tự hàng trên giao diện (P1, P2, ... theo tần số gốc).
+    def __init__(self, gain_val=10000000.0):
+        self.gain_val = gain_val
+        self.pole_r = np.empty(0)
+        self.pole_c = np.empty(0)   # C_base, chưa cộng tụ Miller
+        self.zero_r = np.empty(0)
+        self.zero_c = np.empty(0)
+
+        self.miller_mode = False
+        self.miller_av2 = 100.0
+        self.cc_val = 0.0
+
+        # Hệ số hồi tiếp beta: None = chỉ xem vòng hở, ngược lại hiện thêm Acl = A / (1 + beta*A)
+        self.beta = None
+
+        # Tăng mỗi khi mảng R/C thay đổi; cùng với tham số Miller làm khóa cache
+        self._version = 0
+        self._cache_key = None
+        self._poles_rad = np.empty(0)
+        self._zeros_rad = np.empty(0)
+        self._pole_rows = np.empty(0, dtype=int)
+        self._zero_rows = np.empty(0, dtype=int)
+
+    def copy(self):
+        # Bản sao có mảng riêng: luồng nền đọc bản sao trong khi giao diện tiếp tục sửa model gốc
+        # (set_values sửa mảng tại chỗ)
+        other = SystemModel(self.gain_val)
+        other.pole_r, other.pole_c = self.pole_r.copy(), self.pole_c.copy()
+        other.zero_r, other.zero_c = self.zero_r.copy(), self.zero_c.copy()
+        other.miller_mode, other.miller_av2, other.cc_val = self.miller_mode, self.miller_av2, self.cc_val
+        other.beta = self.beta
+        other._version = self._version
+        return other
+
+    # --- THÊM / SỬA / XÓA ---
+    def _arrays(self, kind):
+        return (self.pole_r, self.pole_c) if kind == "P" else (self.zero_r, self.zero_c)
+
+    def _set_arrays(self, kind, r, c):
+        if kind == "P":
+            self.pole_r, self.pole_c = r, c
+        else:
+            self.zero_r, self.zero_c = r, c
+        self._version += 1
+
+    def count(self, kind):
+        return len(self._arrays(kind)[0])
+
+    def add(self, kind, r, c):
+        arr_r, arr_c = self._arrays(kind)
+        self._set_arrays(kind, np.append(arr_r, float(r)), np.append(arr_c, float(c)))
+        return len(arr_r)
+
+    def remove(self, kind, idx):
+        arr_r, arr_c = self._arrays(kind)
+        self._set_arrays(kind, np.delete(arr_r, idx), np.delete(arr_c, idx))
+
+    def get_values(self, kind, idx):
+        arr_r, arr_c = self._arrays(kind)
+        return float(arr_r[idx]), float(arr_c[idx])
+
+    def set_values(self, kind, idx, r, c):
+        arr_r, arr_c = self._arrays(kind)
+        if arr_r[idx] == r and arr_c[idx] == c:
+            return
+        arr_r[idx] = r
+        arr_c[idx] = c
+        self._version += 1
+
+    def freqs_hz(self, kind):
+        # Tần số gốc (Hz) của từng hàng, chưa tính Miller
+        arr_r, arr_c = self._arrays(kind)
+        return 1.0 / (2 * np.pi * arr_r * arr_c)
+
+    def sort(self, kind):
+        # Sắp xếp theo tần số tăng dần, trả về hoán vị để giao diện sắp lại các hàng theo
+        perm = np.argsort(self.freqs_hz(kind), kind="stable")
+        if np.any(perm != np.arange(len(perm))):
+            arr_r, arr_c = self._arrays(kind)
+            self._set_arrays(kind, arr_r[perm], arr_c[perm])
+        return perm
+
+    # --- MILLER ---
+    def miller_caps(self):
+        # Cin_m (cộng vào P1) và Cout_m (cộng vào P2)
+        c_in = self.cc_val * (1 + self.miller_av2)
+        c_out = self.cc_val * (1 + 1.0/self.miller_av2)
+        return c_in, c_out
+
+    def pole_c_total(self):
+        c_total = self.pole_c.copy()
+        if self.miller_mode:
+            c_in, c_out = self.miller_caps()
+            if len(c_total) > 0: c_total[0] += c_in
+            if len(c_total) > 1: c_total[1] += c_out
+        return c_total
+
+    # --- POLE / ZERO (rad/s) ---
+    def state_key(self):
+        # Đổi mỗi khi pole/zero (rad/s) có thể đổi: mảng R/C hoặc tham số Miller
+        return (self._version, self.miller_mode, self.miller_av2, self.cc_val)
+
+    def _refresh(self):
+        key = self.state_key()
+        if key == self._cache_key:
+            return
+        # Pole LHP (phần thực âm) sắp theo |p|, RHP Zero (phần thực dương) tăng dần.
+        # _pole_rows[i]: hàng (P1, P2, ...) sinh ra pole thứ i; khác thứ tự hàng khi bật Miller
+        wp = 1.0 / (self.pole_r * self.pole_c_total())
+        wz = 1.0 / (self.zero_r * self.zero_c)
+        self._pole_rows = np.argsort(wp, kind="stable")
+        self._zero_rows = np.argsort(wz, kind="stable")
+        self._poles_rad = -wp[self._pole_rows]
+        self._zeros_rad = wz[self._zero_rows]
+        self._poles_rad.flags.writeable = False
+        self._zeros_rad.flags.writeable = False
+        self._cache_key = key
+
+    def poles_rad(self):
+        self._refresh()
+        return self._poles_rad
+
+    def zeros_rad(self):
+        self._refresh()
+        return self._zeros_rad
+
+    def pole_rows(self):
+        self._refresh()
+        return self._pole_rows
+
+    def zero_rows(self):
+        self._refresh()
+        return self._zero_rows
+
+    # --- CHUYỂN ĐỔI DICT (JSON/CSV) ---
+    @classmethod
+    def from_dict(cls, d):
+        # {"gain": 1e7, "poles": [{"r": 1000, "c": 1e-6}, [1000, 1e-7]], "zeros": [...],
+        #  "miller": {"av2": 100, "cc": 1e-12}, "beta": 0.1}
+        if "error" in d:
+            # Bản ghi không đọc được từ iter_design_dicts
+            raise ValueError(d["error"])
+        gain = float(d.get("gain", 10000000.0))
+        if not gain > 0:
+            # Gain 0 cho dc_db = -inf, gain âm cho PM vô nghĩa (lệch 180°)
+            raise ValueError(f"gain phải dương (gain={gain})")
+        model = cls(gain_val=gain)
+        for kind, field in (("P", "poles"), ("Z", "zeros")):
+            for item in d.get(field) or []:
+                r, c = (item["r"], item["c"]) if isinstance(item, dict) else item
+                r, c = float(r), float(c)
+                if r <= 0 or c <= 0:
+                    raise ValueError(f"{field}: R và C phải dương (R={r}, C={c})")
+                model.add(kind, r, c)
+            # Giống giao diện: P1, P2, ... theo tần số gốc tăng dần
+            model.sort(kind)
+        miller = d.get("miller")
+        if miller:
+            if model.count("P") < 2:
+                raise ValueError("Cần ít nhất 2 Pole (P1, P2) để chạy chế độ Miller.")
+            model.miller_mode = True
+            model.miller_av2, model.cc_val = check_miller(miller.get("av2", 100.0), miller.get("cc", 0.0))
+        beta = d.get("beta")
+        if beta is not None:
+            beta = float(beta)
+            if beta <= 0:
+                raise ValueError(f"beta phải dương (beta={beta})")
+            model.beta = beta
+        return model
+
+    def to_dict(self):
+        d = {"gain": self.gain_val,
+             "poles": [{"r": float(r), "c": float(c)} for r, c in zip(self.pole_r, self.pole_c)],
+             "zeros": [{"r": float(r), "c": float(c)} for r, c in zip(self.zero_r, self.zero_c)]}
+        if self.miller_mode:
+            d["miller"] = {"av2": self.miller_av2, "cc": self.cc_val}
+        if self.beta is not None:
+            d["beta"] = self.beta
+        return d
+
+
+# --- ĐỌC FILE THIẾT KẾ ---
+def _parse_rc_list(text):
+    # "1000:1e-6; 1000:1e-7" -> [(1000, 1e-6), (1000, 1e-7)]
+    out = []
+    for part in (text or "").replace(",", ";").split(";"):
+        part = part.strip()
+        if part:
+            rc = part.split(":")
+            if len(rc) != 2:
+                raise ValueError(f"'{part}' không đúng dạng R:C")
+            out.append((float(rc[0]), float(rc[1])))
+    return out
+
+
+def _csv_row_to_dict(row):
+    d = {"name": row.get("name") or None,
+         "gain": float(row["gain"]) if row.get("gain") else 10000000.0,
+         "poles": _parse_rc_list(row.get("poles")),
+         "zeros": _parse_rc_list(row.get("zeros"))}
+    if row.get("av2") or row.get("cc"):
+        d["miller"] = {"av2": float(row.get("av2") or 100.0), "cc": float(row.get("cc") or 0.0)}
+    if row.get("beta"):
+        d["beta"] = float(row["beta"])
+    return d
+
+
+def _bad_record(where, name, err):
+    # Bản ghi lỗi vẫn được trả ra để một dòng hỏng không làm dừng cả lô; from_dict sẽ báo lỗi
+    return {"name": name, "error": f"{where}: {err}"}
+
+
+def _json_lines(lines, path):
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            d = json.loads(line)
+        except ValueError as e:
+            yield _bad_record(f"{path} dòng {lineno}", None, e)
+            continue
+        yield d if isinstance(d, dict) else _bad_record(f"{path} dòng {lineno}", None, "không phải object JSON")
+
+
+def iter_design_dicts(path):
+    # Đọc lần lượt từng thiết kế (dict) từ .json, .jsonl hoặc .csv; "-" là stdin (JSON Lines).
+    # Dòng không đọc được cho ra dict {"name", "error"} thay vì ném lỗi giữa chừng
+    ext = os.path.splitext(path)[1].lower()
+    if path == "-":
+        yield from _json_lines(sys.stdin, "stdin")
+        return
+    with open(path, newline="", encoding="utf-8") as fh:
+        if ext == ".csv":
+            reader = csv.DictReader(fh)
+            for row in reader:
+                try:
+                    yield _csv_row_to_dict(row)
+                except ValueError as e:
+                    yield _bad_record(f"{path} dòng {reader.line_num}", row.get("name") or None, e)
+        elif ext in (".jsonl", ".ndjson"):
+            yield from _json_lines(fh, path)
+        else:
+            try:
+                data = json.load(fh)
+            except ValueError as e:
+                yield _bad_record(path, None, e)
+                return
+            if isinstance(data, dict):
+                data = data.get("designs", [data])
+            for d in data:
+                yield d if isinstance(d, dict) else _bad_record(path, None, "không phải object JSON")
+
+
+def iter_designs(path):
+    # (tên, SystemModel) cho từng thiết kế; tên mặc định design<i>
+    for i, d in enumerate(iter_design_dicts(path)):
+        yield d.get("name") or f"design{i}", SystemModel.from_dict(d)
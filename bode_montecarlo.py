@@ -0,0 +1,245 @@
+"""Phân tích Monte Carlo dung sai linh kiện R/C (và Av2/Cc của Miller), chạy theo lô trên process pool."""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+import bode_engine
+import bode_export
+import bode_metrics
+import bode_model
+
+DISTRIBUTIONS = ("uniform", "normal")
+# Số lô mỗi process: đủ để cân tải khi lô chạy nhanh chậm khác nhau và để thanh tiến độ chạy đều,
+# nhưng mỗi lô vẫn đủ lớn để tính vector hóa hiệu quả
+TASKS_PER_WORKER = 4
+MIN_CHUNK = 200
+MAX_CHUNK = 5000
+# Mỗi khối SEED_BLOCK mẫu có một SeedSequence con riêng. Khối cố định, không phụ thuộc số process
+# hay kích thước lô, nên cùng seed luôn cho cùng các mẫu; lô chỉ là cách gom các khối để gửi đi
+SEED_BLOCK = 100
+
+
+def chunk_size(n_samples, workers):
+    # Kích thước lô sao cho có khoảng TASKS_PER_WORKER lô cho mỗi process
+    n_tasks = TASKS_PER_WORKER * max(workers, 1)
+    return int(min(max(math.ceil(n_samples / n_tasks), MIN_CHUNK), MAX_CHUNK))
+
+
+def seed_blocks(n_samples, seed):
+    # [(số mẫu, SeedSequence)] của từng khối, theo thứ tự mẫu
+    sizes = [SEED_BLOCK] * (n_samples // SEED_BLOCK) + ([n_samples % SEED_BLOCK] if n_samples % SEED_BLOCK else [])
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+class ToleranceSpec:
+    # Dung sai theo % của từng đại lượng. "uniform": đều trong ±tol;
+    # "normal": Gauss với ±tol là 3 sigma
+    def __init__(self, r_pct=5.0, c_pct=10.0, av2_pct=0.0, cc_pct=0.0, distribution="uniform"):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Phân bố không hỗ trợ: {distribution}")
+        self.r_pct = r_pct
+        self.c_pct = c_pct
+        self.av2_pct = av2_pct
+        self.cc_pct = cc_pct
+        self.distribution = distribution
+
+    def sample(self, rng, nominal, pct, n):
+        # nominal: (N,) hoặc số -> (n, N) hoặc (n,)
+        nominal = np.asarray(nominal, dtype=float)
+        shape = (n,) + nominal.shape
+        tol = pct / 100.0
+        if tol <= 0:
+            return np.broadcast_to(nominal, shape).copy()
+        if self.distribution == "uniform":
+            dev = rng.uniform(-tol, tol, shape)
+        else:
+            dev = rng.normal(0.0, tol / 3.0, shape)
+        # Không cho linh kiện âm hoặc bằng 0
+        return nominal * np.maximum(1.0 + dev, 1e-6)
+
+
+class MonteCarloResult:
+    # pm/fc/gm/bw: một giá trị mỗi mẫu (NaN nếu không có); mag/phase lo-hi: đường bao trên lưới f;
+    # errors: thông báo lỗi của các lô thất bại (mẫu của chúng không có trong kết quả)
+    def __init__(self, f, pm, fc, gm, bw, mag_lo, mag_hi, phase_lo, phase_hi, errors=()):
+        self.f = f
+        self.pm = pm
+        self.fc = fc
+        self.gm = gm
+        self.bw = bw
+        self.mag_lo, self.mag_hi = mag_lo, mag_hi
+        self.phase_lo, self.phase_hi = phase_lo, phase_hi
+        self.errors = list(errors)
+
+    @property
+    def n_samples(self):
+        return len(self.pm)
+
+    def summary(self):
+        def stats(x):
+            x = x[np.isfinite(x)]
+            if len(x) == 0:
+                return None
+            p5, p50, p95 = np.percentile(x, [5, 50, 95])
+            return {"min": float(np.min(x)), "p5": float(p5), "median": float(p50), "p95": float(p95), "max": float(np.max(x))}
+        return {"n_samples": self.n_samples, "pm_deg": stats(self.pm), "fc_hz": stats(self.fc),
+                "gm_db": stats(self.gm), "bw_hz": stats(self.bw)}
+
+
+# --- TÍNH MỘT LÔ MẪU (chạy trong process con) ---
+def _sample_roots(model, spec, rng, n):
+    pr = spec.sample(rng, model.pole_r, spec.r_pct, n)
+    pc = spec.sample(rng, model.pole_c, spec.c_pct, n)
+    if model.miller_mode:
+        av2 = spec.sample(rng, model.miller_av2, spec.av2_pct, n)
+        cc = spec.sample(rng, model.cc_val, spec.cc_pct, n)
+        if pc.shape[1] > 0: pc[:, 0] += cc * (1 + av2)
+        if pc.shape[1] > 1: pc[:, 1] += cc * (1 + 1.0/av2)
+    zr = spec.sample(rng, model.zero_r, spec.r_pct, n)
+    zc = spec.sample(rng, model.zero_c, spec.c_pct, n)
+    return -1.0 / (pr * pc), 1.0 / (zr * zc)
+
+
+def run_chunk(model_dict, spec, f, blocks, export=None):
+    # blocks: [(số mẫu, seed)] liên tiếp của seed_blocks(). Mỗi khối được lấy mẫu bằng rng riêng và
+    # tính riêng (phép giải chỉ số theo lô dừng khi cả lô hội tụ, nên gộp khối khác nhau sẽ lệch vài ulp).
+    # export=(đường dẫn .bodemm đã cấp phát, chỉ số mẫu đầu tiên): ghi đáp ứng từng mẫu vào vùng riêng
+    model = bode_model.SystemModel.from_dict(model_dict)
+    log_h, ms = [], []
+    for k, seed in blocks:
+        P, Z = _sample_roots(model, spec, np.random.default_rng(seed), k)
+        gains = np.full(k, model.gain_val)
+        log_h.append(bode_engine.batch_log_response_chunked(gains, P, Z, f))
+        ms += bode_metrics.compute_metrics_arrays(gains, P, Z, f, log_h[-1])
+    log_h = np.concatenate(log_h)
+    n = len(log_h)
+    if export is not None:
+        path, start = export
+        bode_export.write_records(path, start, [f"mc{start + i}" for i in range(n)], log_h, ms)
+    nan = float("nan")
+    mag = log_h.real * bode_metrics.DB_PER_NEPER
+    phase = np.degrees(log_h.imag)
+    return {"pm": np.array([m.pm if m.pm is not None else nan for m in ms]),
+            "fc": np.array([m.fc if m.fc is not None else nan for m in ms]),
+            "gm": np.array([m.gm if m.gm is not None else nan for m in ms]),
+            "bw": np.array([m.bandwidth if m.bandwidth is not None else nan for m in ms]),
+            "mag_lo": mag.min(axis=0), "mag_hi": mag.max(axis=0),
+            "phase_lo": phase.min(axis=0), "phase_hi": phase.max(axis=0)}
+
+
+def _merge(f, parts, errors=()):
+    cat = lambda k: np.concatenate([p[k] for p in parts]) if parts else np.empty(0)
+    lo = lambda k: np.min([p[k] for p in parts], axis=0) if parts else np.full(len(f), np.nan)
+    hi = lambda k: np.max([p[k] for p in parts], axis=0) if parts else np.full(len(f), np.nan)
+    return MonteCarloResult(f, cat("pm"), cat("fc"), cat("gm"), cat("bw"),
+                            lo("mag_lo"), hi("mag_hi"), lo("phase_lo"), hi("phase_hi"), errors)
+
+
+# --- ĐIỀU PHỐI ---
+class MonteCarloRun:
+    # Chia n_samples thành các lô, gửi lên process pool; giao diện hỏi progress() định kỳ
+    # và có thể cancel() bất cứ lúc nào. workers=0 chạy tuần tự trong process hiện tại.
+    # export_path: ghi thêm đáp ứng + chỉ số của từng mẫu vào file .bodemm (mỗi lô ghi vùng riêng).
+    # chunk=None: chọn theo chunk_size(); chunk được làm tròn lên bội của SEED_BLOCK và không ảnh hưởng
+    # tới các mẫu (xem seed_blocks). Lô lỗi (kể cả pool bị hỏng) không làm hỏng cả lần chạy:
+    # các lô còn lại vẫn được gộp, lỗi nằm trong result().errors
+    def __init__(self, model, f, spec, n_samples, chunk=None, seed=None, workers=None, export_path=None):
+        self.model_dict = model.to_dict()
+        self.f = np.asarray(f, dtype=float)
+        self.spec = spec
+        self.workers = os.cpu_count() if workers is None else workers
+        if chunk is None:
+            chunk = chunk_size(n_samples, self.workers or 1)
+        blocks = seed_blocks(n_samples, seed)
+        per_task = max(math.ceil(chunk / SEED_BLOCK), 1)
+        self.tasks = [blocks[i:i + per_task] for i in range(0, len(blocks), per_task)]
+        sizes = [sum(k for k, _ in t) for t in self.tasks]
+        self.sizes = sizes
+        self.exports = [None] * len(sizes)
+        if export_path is not None:
+            bode_export.preallocate(export_path, self.f, n_samples,
+                                    meta={"source": "montecarlo", "model": self.model_dict, "spec": vars(spec),
+                                          "seed": seed, "seed_block": SEED_BLOCK})
+            self.exports = [(export_path, start) for start in np.cumsum([0] + sizes[:-1]).tolist()]
+        self.cancelled = False
+        self._pool = None
+        self._futures = []
+        self._parts = []
+        self._n_run = 0
+        self.errors = []
+
+    def start(self):
+        if self.workers == 0:
+            return self
+        # "spawn": process con không kế thừa trạng thái Tk của giao diện
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._futures = [self._pool.submit(run_chunk, self.model_dict, self.spec, self.f, blocks, export)
+                         for blocks, export in zip(self.tasks, self.exports)]
+        return self
+
+    def progress(self):
+        # (số mẫu đã xong, tổng số mẫu)
+        total = sum(self.sizes)
+        if self.workers == 0:
+            return sum(self.sizes[:self._n_run]), total
+        done = sum(n for n, fu in zip(self.sizes, self._futures) if fu.done() and not fu.cancelled())
+        return done, total
+
+    def finished(self):
+        if self.workers == 0:
+            return self._n_run == len(self.tasks) or self.cancelled
+        return all(fu.done() for fu in self._futures)
+
+    def step(self):
+        # Chế độ tuần tự: tính thêm một lô mỗi lần gọi
+        if self.workers == 0 and not self.finished():
+            k = self._n_run
+            self._n_run += 1
+            try:
+                self._parts.append(run_chunk(self.model_dict, self.spec, self.f, self.tasks[k], self.exports[k]))
+            except Exception as e:
+                self._add_error(e)
+
+    def _add_error(self, e):
+        # Pool hỏng làm mọi lô còn lại lỗi cùng một thông báo; chỉ giữ một bản
+        msg = f"{type(e).__name__}: {e}"
+        if msg not in self.errors:
+            self.errors.append(msg)
+
+    def cancel(self):
+        self.cancelled = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def result(self):
+        # Gộp các lô đã xong (kể cả khi đã hủy giữa chừng)
+        if self.workers != 0:
+            self._parts, self.errors = [], []
+            for fu in self._futures:
+                if not fu.done() or fu.cancelled():
+                    continue
+                e = fu.exception()
+                if e is None:
+                    self._parts.append(fu.result())
+                else:
+                    self._add_error(e)
+            if self._pool is not None and self.finished():
+                self._pool.shutdown(wait=False)
+                self._pool = None
+        return _merge(self.f, self._parts, self.errors)
+
+
+def run_monte_carlo(model, f, spec, n_samples, chunk=None, seed=None, workers=None, export_path=None):
+    # Bản chặn (không giao diện): chạy hết rồi trả kết quả; lô lỗi nằm trong kết quả .errors
+    run = MonteCarloRun(model, f, spec, n_samples, chunk=chunk, seed=seed, workers=workers,
+                        export_path=export_path).start()
+    if run.workers == 0:
+        while not run.finished():
+            run.step()
+    else:
+        wait(run._futures)
+    return run.result()
@@ -0,0 +1,504 @@
+"""Vẽ đồ thị Bode hai tầng (Gain & Phase) với artist tái sử dụng và blitting."""
+import bisect
+
+import numpy as np
+
+import bode_metrics
+import bode_profiling
+
+# Chỉ vẽ phần đường cong có biên độ >= -40 dB
+MAG_FLOOR_DB = -40
+
+# Số hệ tối đa ghi trong ô đọc giá trị khi rê chuột (điểm đánh dấu vẫn vẽ cho mọi hệ)
+HOVER_MAX_LINES = 10
+
+# Màu và kiểu đường lần lượt cho các hệ Av1, Av2, Av3, ... (giao diện, vẽ ra file, benchmark)
+SYSTEM_COLORS = ["blue", "orange", "green", "red", "purple", "brown", "magenta", "gray", "olive", "cyan"]
+SYSTEM_STYLES = ["-", "-.", "--", ":"]
+
+
+def system_style(i):
+    # (màu, kiểu nét) của hệ thứ i (đếm từ 0)
+    return SYSTEM_COLORS[i % len(SYSTEM_COLORS)], SYSTEM_STYLES[i % len(SYSTEM_STYLES)]
+
+
+class PlotSystem:
+    # Thay cho SystemManager khi vẽ không có Tk: chỉ các thuộc tính mà BodePlotView đọc
+    def __init__(self, key, name, model, color="blue", line_style="-"):
+        self.key = key
+        self.name = name
+        self.model = model
+        self.color = color
+        self.line_style = line_style
+
+    @property
+    def gain_val(self):
+        return self.model.gain_val
+
+    @property
+    def beta(self):
+        return self.model.beta
+
+
+# beta=None của SystemTrace nghĩa là không hồi tiếp, nên "lấy từ sys" cần giá trị riêng
+_UNSET = object()
+
+
+class SystemTrace:
+    # Dữ liệu cần vẽ cho một hệ: sys (name/color/line_style), pole/zero (rad/s), đáp ứng.
+    # gain/beta là giá trị lúc chụp trạng thái, không đọc lại từ sys (có thể đã bị sửa)
+    def __init__(self, key, sys, poles_rad, zeros_rad, resp, gain=None, beta=_UNSET):
+        self.key = key
+        self.sys = sys
+        self.gain = sys.gain_val if gain is None else gain
+        self.beta = sys.beta if beta is _UNSET else beta
+        self.poles_rad = poles_rad
+        self.zeros_rad = zeros_rad
+        self.resp = resp
+        self._metrics = None
+        self._closed_loop = None
+
+    @property
+    def metrics(self):
+        # Chỉ số ổn định chính xác, tính một lần cho mỗi trace
+        if self._metrics is None:
+            self._metrics = bode_metrics.compute_metrics(self.gain, self.poles_rad, self.zeros_rad, self.resp)
+        return self._metrics
+
+    def closed_loop(self, beta):
+        # (BodeResponse vòng kín, ClosedLoopMetrics) suy từ log H vòng hở, nhớ theo beta
+        if self._closed_loop is None or self._closed_loop[0] != beta:
+            self._closed_loop = (beta, bode_metrics.compute_closed_loop(self.gain, self.poles_rad, self.zeros_rad,
+                                                                        self.resp, beta))
+        return self._closed_loop[1]
+
+
+def fill_metrics(traces):
+    # Tính chỉ số cho mọi trace chưa có, gộp thành một lần tìm nghiệm theo lô; kèm đáp ứng và
+    # chỉ số vòng kín của trace có beta, để phần vẽ chỉ còn đọc kết quả
+    for t in traces:
+        if t.beta is not None:
+            t.closed_loop(t.beta)
+    todo = [t for t in traces if t._metrics is None]
+    if not todo:
+        return
+    groups = {}
+    for t in todo:
+        groups.setdefault(t.resp.f.tobytes(), []).append(t)
+    for group in groups.values():
+        ms = bode_metrics.compute_metrics_batch([(t.gain, t.poles_rad, t.zeros_rad) for t in group], group[0].resp.f,
+                                                log_h=np.stack([t.resp.log_h for t in group]))
+        for t, m in zip(group, ms):
+            t._metrics = m
+
+
+def _fmt_list(values, fmt):
+    return ", ".join(format(v, fmt) for v in values[:3]) + (", ..." if len(values) > 3 else "")
+
+
+# --- CHỈ MỤC MARKER POLE/ZERO ---
+class MarkerIndex:
+    # Mọi marker của mọi hệ, sắp theo log10(tần số) để tìm marker gần nhất bằng bisect.
+    # entries[i] = (system, "P"/"Z", hàng trong model, tần số Hz)
+    def __init__(self, systems):
+        items = []
+        for sys in systems:
+            for c_type, roots, rows in (("P", sys.model.poles_rad(), sys.model.pole_rows()),
+                                        ("Z", sys.model.zeros_rad(), sys.model.zero_rows())):
+                f_hz = np.abs(roots) / (2 * np.pi)
+                items += [(float(np.log10(f)), sys, c_type, int(row), float(f)) for f, row in zip(f_hz, rows)]
+        items.sort(key=lambda it: it[0])
+        self.log_f = [it[0] for it in items]
+        self.entries = [it[1:] for it in items]
+
+    @staticmethod
+    def signature(systems):
+        # Theo khóa trạng thái của model (không theo id() của mảng: CPython dùng lại id khi mảng cũ
+        # bị giải phóng). Giữ chính đối tượng model để so danh tính khi một hệ được gán model khác
+        return tuple((sys.key, sys.model, sys.model.state_key()) for sys in systems)
+
+    def nearest(self, f_hz, tol_decades=0.05):
+        x = np.log10(f_hz)
+        i = bisect.bisect_left(self.log_f, x)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self.log_f):
+                d = abs(self.log_f[j] - x)
+                if d < tol_decades and (best is None or d < best[0]):
+                    best = (d, j)
+        return self.entries[best[1]] if best is not None else None
+
+
+# --- ARTIST CỦA MỘT HỆ THỐNG ---
+class SystemArtists:
+    # Tạo một lần cho mỗi hệ, sau đó chỉ cập nhật bằng set_data/set_xdata
+    def __init__(self, ax1, ax2, trace):
+        sys = trace.sys
+        self.line_mag, = ax1.semilogx([], [], color=sys.color, ls=sys.line_style, lw=2, label=f'{sys.name} (Gain)')
+        self.line_phase, = ax2.semilogx([], [], color=sys.color, ls=sys.line_style, lw=2, label=f'{sys.name} (Phase)')
+        # Đáp ứng vòng kín (khi hệ có beta): nét mảnh, ẩn khỏi chú thích khi tắt
+        self.line_cl_mag, = ax1.semilogx([], [], color=sys.color, lw=1, alpha=0.7, label=f'_{sys.name} (Vòng kín)')
+        self.line_cl_phase, = ax2.semilogx([], [], color=sys.color, lw=1, alpha=0.7)
+
+        xaxis = ax1.get_xaxis_transform()
+        self.pole_marks = []
+        for i in range(len(trace.poles_rad)):
+            self.pole_marks.append((
+                ax1.axvline(x=1, color=sys.color, ls='--', alpha=0.5),
+                ax2.axvline(x=1, color=sys.color, ls='--', alpha=0.5),
+                ax1.text(1, -0.1, f"P{i+1}", transform=xaxis, rotation=0, va='top', ha='center', fontweight='bold', color=sys.color)))
+        self.zero_marks = []
+        for i in range(len(trace.zeros_rad)):
+            self.zero_marks.append((
+                ax1.axvline(x=1, color=sys.color, ls=':', alpha=0.8, lw=2),
+                ax2.axvline(x=1, color=sys.color, ls=':', alpha=0.8, lw=2),
+                ax1.text(1, -0.15, f"Z{i+1}", transform=xaxis, rotation=0, va='top', ha='center', fontweight='bold', color='red')))
+        # Vị trí/hiển thị hiện tại của từng marker, để biết marker nào vừa di chuyển
+        self._mark_state = {}
+
+        self.fc_dot, = ax1.plot([], [], 'o', color=sys.color)
+        self.fc_lines = (ax1.axvline(x=1, color=sys.color, ls='-.', alpha=0.8),
+                         ax2.axvline(x=1, color=sys.color, ls='-.', alpha=0.8))
+
+    def relabel(self, name):
+        # Đổi tên hệ trong chú thích khi dùng lại artist cho hệ khác (vẽ hàng loạt)
+        self.line_mag.set_label(f'{name} (Gain)')
+        self.line_phase.set_label(f'{name} (Phase)')
+        hidden = self.line_cl_mag.get_label().startswith('_')
+        self.line_cl_mag.set_label(('_' if hidden else '') + f'{name} (Vòng kín)')
+
+    def curve_artists(self):
+        return [self.line_mag, self.line_phase, self.line_cl_mag, self.line_cl_phase, self.fc_dot, *self.fc_lines]
+
+    def artists(self):
+        out = self.curve_artists()
+        for marks in self.pole_marks + self.zero_marks:
+            out.extend(marks)
+        return out
+
+    def set_visible(self, visible):
+        for a in self.artists():
+            a.set_visible(visible)
+        self._mark_state.clear()
+
+    def _move_marks(self, marks, roots_rad, f_max_hz):
+        moved = []
+        for mark, r in zip(marks, roots_rad):
+            f_hz = abs(r) / (2 * np.pi)
+            vis = bool(f_hz <= f_max_hz)
+            if self._mark_state.get(mark) == (f_hz, vis):
+                continue
+            self._mark_state[mark] = (f_hz, vis)
+            v1, v2, lbl = mark
+            v1.set_xdata([f_hz, f_hz]); v2.set_xdata([f_hz, f_hz]); lbl.set_x(f_hz)
+            v1.set_visible(vis); v2.set_visible(vis); lbl.set_visible(vis)
+            moved.extend(mark)
+        return moved
+
+    def update(self, trace, fm, mm, pm, fc):
+        # Trả về các artist marker đã đổi vị trí
+        self.line_mag.set_data(fm, mm)
+        self.line_phase.set_data(fm, pm)
+        f_max_hz = trace.resp.f[-1]
+        moved = self._move_marks(self.pole_marks, trace.poles_rad, f_max_hz)
+        moved += self._move_marks(self.zero_marks, trace.zeros_rad, f_max_hz)
+
+        beta = trace.beta
+        if beta is None:
+            self.line_cl_mag.set_data([], []); self.line_cl_phase.set_data([], [])
+        else:
+            cl = trace.closed_loop(beta)[0]
+            mask = cl.mag_db >= MAG_FLOOR_DB
+            self.line_cl_mag.set_data(cl.f[mask], cl.mag_db[mask])
+            self.line_cl_phase.set_data(cl.f[mask], cl.phase_deg[mask])
+        label = self.line_cl_mag.get_label().lstrip('_')
+        self.line_cl_mag.set_label(label if beta is not None else '_' + label)
+
+        has_fc = fc is not None
+        self.fc_dot.set_data([fc] if has_fc else [], [0] if has_fc else [])
+        for line in self.fc_lines:
+            if has_fc: line.set_xdata([fc, fc])
+            line.set_visible(has_fc)
+        return moved
+
+
+# --- VIEW ĐỒ THỊ BODE ---
+class BodePlotView:
+    # Khi không tương tác, mọi artist đều tĩnh và canvas.draw() vẽ toàn bộ.
+    # Trong lúc kéo (begin_interaction), đường cong và đường dọc marker của hệ đang kéo
+    # được chuyển sang animated một lần cho cả lần kéo; phần còn lại nằm trong nền đã cache
+    # và mỗi khung hình chỉ restore nền + vẽ lại các artist động + blit vùng hai trục.
+    # Chữ (nhãn P/Z, ô chỉ số) vẽ chậm nên giữ tĩnh, cập nhật khi thả chuột.
+    def __init__(self, fig, ax1, ax2, blit=True, profiler=None):
+        self.fig, self.ax1, self.ax2 = fig, ax1, ax2
+        self.canvas = fig.canvas
+        self.blit = blit
+        self.profiler = profiler or bode_profiling.DISABLED
+        self.system_artists = {}
+        self.info_text = None
+        # Dải bao Monte Carlo theo hệ: key -> (f, mag_lo, mag_hi, phase_lo, phase_hi)
+        self.envelopes = {}
+        self._envelope_artists = {}
+        self._structure = None
+        self._background = None
+        self._animated = set()
+        self._interaction = None
+        self._traces = []
+        # Con trỏ dọc + điểm đọc giá trị khi rê chuột; luôn animated, chỉ vẽ bằng blit
+        self._hover = None
+        # Overlay thời gian khung (khi bật đo hiệu năng); cũng luôn animated
+        self._overlay = None
+        if self.blit:
+            self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    # Lưu nền tĩnh sau mỗi lần vẽ đầy đủ (kể cả khi resize cửa sổ)
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for a in self._animated:
+            self.fig.draw_artist(a)
+        if self._hover is not None and self._hover[0].get_visible():
+            for a in self._hover:
+                self.fig.draw_artist(a)
+        if self._overlay is not None and self._overlay.get_visible():
+            self.fig.draw_artist(self._overlay)
+
+    def _blit(self):
+        if self._background is None:
+            with self.profiler.stage("draw"):
+                self.canvas.draw()
+        else:
+            with self.profiler.stage("blit"):
+                self.canvas.restore_region(self._background)
+                self._draw_animated()
+                if self._overlay is not None and self._overlay.get_visible():
+                    # Overlay nằm ngoài hai trục
+                    self.canvas.blit(self.fig.bbox)
+                else:
+                    self.canvas.blit(self.ax1.bbox)
+                    self.canvas.blit(self.ax2.bbox)
+
+    def set_overlay(self, text):
+        # text=None: ẩn overlay. Được vẽ cùng lần vẽ/blit kế tiếp
+        if text is None:
+            if self._overlay is not None:
+                self._overlay.set_visible(False)
+            return
+        if self._overlay is None:
+            self._overlay = self.fig.text(0.995, 0.995, "", ha='right', va='top', fontsize=7, family='monospace',
+                                          bbox=dict(boxstyle='round', facecolor='black', alpha=0.6), color='white')
+            # Không blit (vẽ ra file) thì overlay vẽ cùng các artist tĩnh
+            self._overlay.set_animated(self.blit)
+        self._overlay.set_text(text)
+        self._overlay.set_visible(True)
+
+    # --- CON TRỎ ĐỌC GIÁ TRỊ ---
+    def _make_hover(self):
+        arts = (self.ax1.axvline(x=1, color='k', lw=0.8, alpha=0.6),
+                self.ax2.axvline(x=1, color='k', lw=0.8, alpha=0.6),
+                self.ax1.scatter([], [], s=25, zorder=5),
+                self.ax2.scatter([], [], s=25, zorder=5),
+                self.ax1.text(0.98, 0.95, "", transform=self.ax1.transAxes, fontsize=8, va='top', ha='right',
+                              bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.9)))
+        for a in arts:
+            a.set_animated(True)
+            a.set_visible(False)
+        return arts
+
+    def hover(self, f_hz):
+        # Đọc dB/độ của mọi hệ tại f_hz (nội suy trên lưới log, O(log N) mỗi hệ)
+        if not self.blit or not self._traces:
+            return
+        if self._hover is None:
+            self._hover = self._make_hover()
+        v1, v2, dots_mag, dots_phase, text = self._hover
+        x = np.log10(f_hz)
+        lines = [f"f = {f_hz:.3e} Hz"]
+        pts_mag, pts_phase, colors = [], [], []
+        for t in self._traces:
+            lf = np.log10(t.resp.f)
+            if not lf[0] <= x <= lf[-1]:
+                continue
+            i = min(int(np.searchsorted(lf, x)), len(lf) - 1)
+            j = max(i - 1, 0)
+            w = 0.0 if i == j else (x - lf[j]) / (lf[i] - lf[j])
+            mag = (1 - w) * t.resp.mag_db[j] + w * t.resp.mag_db[i]
+            phase = (1 - w) * t.resp.phase_deg[j] + w * t.resp.phase_deg[i]
+            if len(lines) <= HOVER_MAX_LINES:
+                lines.append(f"[{t.sys.name}] {mag:.2f} dB | {phase:.1f}°")
+            elif len(lines) == HOVER_MAX_LINES + 1:
+                lines.append("...")
+            pts_mag.append((f_hz, max(mag, MAG_FLOOR_DB))); pts_phase.append((f_hz, phase)); colors.append(t.sys.color)
+        for v in (v1, v2):
+            v.set_xdata([f_hz, f_hz])
+        dots_mag.set_offsets(np.array(pts_mag).reshape(-1, 2)); dots_mag.set_color(colors)
+        dots_phase.set_offsets(np.array(pts_phase).reshape(-1, 2)); dots_phase.set_color(colors)
+        text.set_text("\n".join(lines))
+        for a in self._hover:
+            a.set_visible(True)
+        self._blit()
+
+    def clear_hover(self):
+        if self._hover is None or not self._hover[0].get_visible():
+            return
+        for a in self._hover:
+            a.set_visible(False)
+        self._blit()
+
+    def _set_animated(self, artists):
+        artists = set(artists)
+        for a in self._animated - artists:
+            a.set_animated(False)
+        for a in artists - self._animated:
+            a.set_animated(True)
+        if artists != self._animated:
+            self._background = None
+        self._animated = artists
+
+    def begin_interaction(self, key):
+        # Bắt đầu kéo một thành phần của hệ `key`. Mọi đường dọc marker của hệ đều động ngay từ đầu
+        # (sắp lại pole hay Miller có thể làm marker khác di chuyển) để tập animated không đổi
+        # giữa chừng, vì mỗi lần đổi là một lần canvas.draw() đầy đủ.
+        self._interaction = key
+        arts = self.system_artists.get(key)
+        if arts is None or not self.blit:
+            return
+        dynamic = arts.curve_artists()
+        for v1, v2, _ in arts.pole_marks + arts.zero_marks:
+            dynamic += [v1, v2]
+        self._set_animated(dynamic)
+
+    def end_interaction(self):
+        self._interaction = None
+        self._set_animated([])
+
+    # --- DẢI BAO MONTE CARLO ---
+    def set_envelope(self, key, f, mag_lo, mag_hi, phase_lo, phase_hi):
+        self.envelopes[key] = (f, mag_lo, mag_hi, phase_lo, phase_hi)
+        self._draw_envelope(key)
+
+    def clear_envelope(self, key):
+        self.envelopes.pop(key, None)
+        for a in self._envelope_artists.pop(key, ()):
+            a.remove()
+
+    def _draw_envelope(self, key):
+        for a in self._envelope_artists.pop(key, ()):
+            a.remove()
+        arts = self.system_artists.get(key)
+        if arts is None or key not in self.envelopes:
+            return
+        f, mag_lo, mag_hi, phase_lo, phase_hi = self.envelopes[key]
+        color = arts.line_mag.get_color()
+        self._envelope_artists[key] = (
+            self.ax1.fill_between(f, np.maximum(mag_lo, MAG_FLOOR_DB), np.maximum(mag_hi, MAG_FLOOR_DB),
+                                  color=color, alpha=0.2, lw=0),
+            self.ax2.fill_between(f, phase_lo, phase_hi, color=color, alpha=0.2, lw=0))
+
+    def _rebuild(self, traces):
+        self._set_animated([])
+        self.ax1.clear(); self.ax2.clear()
+        self._hover = None
+        self.system_artists = {t.key: SystemArtists(self.ax1, self.ax2, t) for t in traces}
+        self._envelope_artists = {}
+        for key in list(self.envelopes):
+            if key in self.system_artists:
+                self._draw_envelope(key)
+            else:
+                del self.envelopes[key]
+        self.info_text = self.ax1.text(0.02, 0.05, "", transform=self.ax1.transAxes, fontsize=9, va='bottom',
+                                       bbox=dict(boxstyle='round', facecolor='white', alpha=0.9))
+
+        self.ax1.set_title("Biểu đồ Bode (Gain & Phase)")
+        self.ax1.axhline(0, color='k', lw=1.5); self.ax1.grid(True, which="major", alpha=0.5)
+        self.ax1.set_ylabel('|H(s)| (dB)')
+        self.ax2.set_ylabel('Phase (deg)'); self.ax2.set_xlabel('Freq (Hz)'); self.ax2.grid(True, which="major", alpha=0.5)
+        if not traces:
+            self.ax1.set_xscale('log')
+        if self._interaction is not None:
+            self.begin_interaction(self._interaction)
+
+    def _update_artists(self, traces):
+        plot_data = {}
+        moved = []
+        info_str = ""
+        for t in traces:
+            arts = self.system_artists[t.key]
+            mag, phase, f = t.resp.mag_db, t.resp.phase_deg, t.resp.f
+            mask = mag >= MAG_FLOOR_DB
+            if not np.any(mask):
+                arts.set_visible(False)
+                continue
+            if not arts.line_mag.get_visible():
+                arts.set_visible(True)
+            fm, mm, pm = f[mask], mag[mask], phase[mask]
+            plot_data[t.key] = (fm, mm, pm)
+
+            m = t.metrics
+            moved += arts.update(t, fm, mm, pm, m.fc)
+            f0_str = f"{_fmt_list(m.gain_crossovers, '.2e')} Hz" if m.fc is not None else "N/A"
+            pm_str = f"{m.pm:.1f}°" if m.pm is not None else "N/A"
+            gm_str = f"{m.gm:.1f} dB" if m.gm is not None else "∞"
+            bw_hz = m.bandwidth if m.bandwidth is not None else 0
+            cl_str = ""
+            if t.beta is not None:
+                c = t.closed_loop(t.beta)[1]
+                loop_pm = f"{c.loop.pm:.1f}°" if c.loop.pm is not None else "N/A"
+                cl_bw = f"{c.bandwidth:.2e}Hz" if c.bandwidth is not None else "N/A"
+                cl_str = f"β={t.beta:g}: Acl {c.dc_db:.1f}dB | peaking {c.peaking_db:.2f}dB | BW {cl_bw} | PM(βA) {loop_pm}"
+            if len(traces) <= 2:
+                info_str += (f"[{t.sys.name}]\nAv: {m.dc_db:.1f}dB | BW: {bw_hz:.2e}Hz\nGain Cross: {f0_str}\n"
+                             f"PM: {pm_str} | GM: {gm_str}\n" + (cl_str + "\n" if cl_str else "") + "\n")
+            else:
+                # Nhiều hệ: mỗi hệ một dòng cho gọn
+                fc_str = f"{m.fc:.2e}Hz" if m.fc is not None else "N/A"
+                info_str += f"[{t.sys.name}] fc: {fc_str} | PM: {pm_str} | GM: {gm_str}" + (f" | {cl_str}" if cl_str else "") + "\n"
+
+        self.info_text.set_text(info_str.strip())
+        self.info_text.set_visible(bool(info_str))
+        return plot_data, moved
+
+    def _rescale(self, traces):
+        for ax in (self.ax1, self.ax2):
+            ax.relim(visible_only=True)
+            ax.set_autoscale_on(True)
+            ax.autoscale_view()
+        self.ax1.legend(fontsize='small', ncol=1 + len(traces) // 8)
+        self.ax1.set_ylim(bottom=MAG_FLOOR_DB, top=max(self.ax1.get_ylim()[1], 10))
+        # [UPDATE] X-Axis start at 0.01Hz explicitly
+        self.ax2.set_xlim(left=0.01)
+
+        global_min_phase = min([0] + [np.min(t.resp.phase_deg) for t in traces])
+        pb = max(np.floor(global_min_phase/45)*45, -270)
+        self.ax2.set_ylim(bottom=pb, top=10); self.ax2.set_yticks(np.arange(0, pb-1, -45))
+
+    def render(self, traces, fast=False, draw=True):
+        # fast=True (khi kéo): giữ nguyên trục, chỉ vẽ lại các artist động bằng blit.
+        # draw=False: chỉ cập nhật artist/trục, để savefig tự vẽ một lần
+        structure = tuple((t.key, len(t.poles_rad), len(t.zeros_rad)) for t in traces)
+        if fast and self._interaction is not None and structure == self._structure:
+            with self.profiler.stage("artists"):
+                plot_data, _ = self._update_artists(traces)
+            self._traces = traces
+            self._blit()
+            return plot_data
+
+        if structure != self._structure:
+            with self.profiler.stage("rebuild"):
+                self._rebuild(traces)
+            self._structure = structure
+        self._traces = traces
+        if self._hover is not None:
+            # Đường gióng không được tính vào giới hạn trục khi co giãn lại
+            for a in self._hover:
+                a.set_visible(False)
+        with self.profiler.stage("artists"):
+            plot_data, _ = self._update_artists(traces)
+        with self.profiler.stage("rescale"):
+            self._rescale(traces)
+        if draw:
+            with self.profiler.stage("draw"):
+                self.canvas.draw()
+        return plot_data
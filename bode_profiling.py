@@ -0,0 +1,139 @@
+"""Đo thời gian từng giai đoạn của đường nóng (tính đáp ứng, vẽ, kéo): phân vị trượt, trace, cProfile.
+
+Khi tắt, stage() trả về một context rỗng dùng chung nên chi phí chỉ là một lần kiểm tra cờ.
+"""
+import collections
+import cProfile
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Số mẫu gần nhất giữ cho mỗi giai đoạn (phân vị tính trên cửa sổ này)
+WINDOW = 512
+# Số sự kiện tối đa giữ lại để ghi trace
+TRACE_EVENTS = 50000
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.record(self.name, self.t0, time.perf_counter())
+        return False
+
+
+class Profiler:
+    # Dùng được từ cả luồng giao diện và luồng tính toán nền (ghi dưới khóa)
+    def __init__(self, enabled=False, window=WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}                                      # tên -> deque thời gian (s)
+        self.events = collections.deque(maxlen=TRACE_EVENTS)   # (tên, luồng, t0, t1)
+        self._lock = threading.Lock()
+        self._cprofile = None
+
+    def stage(self, name):
+        # with profiler.stage("render"): ...
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, t0, t1):
+        if not self.enabled:
+            return
+        with self._lock:
+            d = self.samples.get(name)
+            if d is None:
+                d = self.samples[name] = collections.deque(maxlen=self.window)
+            d.append(t1 - t0)
+            self.events.append((name, threading.get_ident(), t0, t1))
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.events.clear()
+
+    # --- THỐNG KÊ ---
+    def summary(self):
+        # {tên: {n, p50_ms, p95_ms, p99_ms, max_ms}} trên cửa sổ trượt
+        with self._lock:
+            data = {k: np.array(v) * 1e3 for k, v in self.samples.items() if v}
+        out = {}
+        for name, ms in data.items():
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            out[name] = {"n": len(ms), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                         "max_ms": float(ms.max())}
+        return out
+
+    def overlay_text(self, frame_stage="frame"):
+        # Vài dòng gọn cho overlay trên đồ thị: thời gian khung + các giai đoạn tốn nhất
+        s = self.summary()
+        lines = []
+        frame = s.pop(frame_stage, None)
+        if frame is not None:
+            fps = 1e3 / frame["p50_ms"] if frame["p50_ms"] > 0 else float("inf")
+            lines.append(f"khung p50 {frame['p50_ms']:.1f} / p95 {frame['p95_ms']:.1f} ms (~{fps:.0f} fps)")
+        for name, st in sorted(s.items(), key=lambda kv: -kv[1]["p50_ms"])[:6]:
+            lines.append(f"{name:<10} {st['p50_ms']:7.2f} / {st['p95_ms']:7.2f} ms")
+        return "\n".join(lines)
+
+    # --- GHI RA FILE ---
+    def dump_trace(self, path):
+        # Định dạng Chrome trace ("X" = sự kiện có độ dài), mở bằng chrome://tracing hoặc Perfetto
+        with self._lock:
+            events = list(self.events)
+        t_origin = min((e[2] for e in events), default=0.0)
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (t0 - t_origin) * 1e6, "dur": (t1 - t0) * 1e6} for name, tid, t0, t1 in events]
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": trace, "summary": self.summary()}, fh)
+        return len(trace)
+
+    @property
+    def cprofile_running(self):
+        return self._cprofile is not None
+
+    def start_cprofile(self):
+        # cProfile chỉ theo dõi luồng gọi hàm này (luồng giao diện)
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop_cprofile(self, path=None):
+        # Dừng và ghi file .prof (đọc bằng pstats / snakeviz) nếu có path
+        prof, self._cprofile = self._cprofile, None
+        if prof is None:
+            return None
+        prof.disable()
+        if path:
+            prof.dump_stats(path)
+        return prof
+
+
+# Profiler luôn tắt, làm giá trị mặc định cho các lớp nhận profiler tùy chọn
+DISABLED = Profiler(enabled=False)
@@ -0,0 +1,187 @@
+"""Vẽ đồ thị Bode hai tầng ra file PNG/SVG/PDF không cần Tk, và vẽ hàng loạt thiết kế trên process pool.
+
+Ví dụ:
+    python bode_render.py designs.jsonl -o plots/
+    python bode_render.py designs.csv -o plots/ --format svg --workers 8
+    python bode_render.py a.json b.json --overlay -o compare.png
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import bode_cli
+import bode_engine
+import bode_model
+import bode_plot
+
+FIGSIZE = (10, 7)
+DPI = 100
+FORMATS = ("png", "svg", "pdf")
+
+
+def make_systems(named_models):
+    # [(tên, SystemModel)] -> PlotSystem; key theo vị trí để artist được dùng lại giữa các ảnh,
+    # màu / kiểu nét giống giao diện
+    return [bode_plot.PlotSystem(f"sys{i}", name, model, *bode_plot.system_style(i))
+            for i, (name, model) in enumerate(named_models)]
+
+
+def make_traces(systems, n_points=bode_engine.N_POINTS, adaptive=False):
+    # Một lưới tần số chung, đáp ứng và chỉ số của mọi hệ tính theo lô (như update_plot)
+    zpk = [(s.gain_val, s.model.poles_rad(), s.model.zeros_rad()) for s in systems]
+    if adaptive:
+        f = bode_engine.adaptive_grid(zpk, n_points=n_points)
+    else:
+        f = bode_engine.frequency_grid(np.concatenate([np.concatenate([p, z]) for _, p, z in zpk]), n_points=n_points)
+    resps = bode_engine.evaluate_batch(zpk, f)
+    traces = [bode_plot.SystemTrace(s.key, s, p, z, r) for s, (_, p, z), r in zip(systems, zpk, resps)]
+    bode_plot.fill_metrics(traces)
+    return traces
+
+
+# --- VẼ RA FILE ---
+class BodeRenderer:
+    # Một Figure Agg dùng lại cho mọi ảnh. BodePlotView(blit=False) giữ nguyên artist khi cấu trúc
+    # (số hệ, số pole/zero) không đổi, nên ảnh kế tiếp chỉ cần set_data + co giãn trục + savefig.
+    def __init__(self, figsize=FIGSIZE, dpi=DPI, n_points=bode_engine.N_POINTS, adaptive=False):
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        ax1, ax2 = self.fig.subplots(2, 1, sharex=True)
+        self.view = bode_plot.BodePlotView(self.fig, ax1, ax2, blit=False)
+        self.dpi = dpi
+        self.n_points = n_points
+        self.adaptive = adaptive
+
+    def draw(self, named_models, title=None):
+        # Cập nhật figure cho các (tên, SystemModel); trả về các trace (có chỉ số) đã vẽ
+        systems = make_systems(named_models)
+        traces = make_traces(systems, n_points=self.n_points, adaptive=self.adaptive)
+        for t in traces:
+            arts = self.view.system_artists.get(t.key)
+            if arts is not None:
+                arts.relabel(t.sys.name)
+        self.view.render(traces, draw=False)
+        self.view.ax1.set_title(title or "Biểu đồ Bode (Gain & Phase)")
+        return traces
+
+    def save(self, path, fmt=None):
+        # fmt mặc định lấy theo đuôi file
+        self.fig.savefig(path, format=fmt, dpi=self.dpi)
+
+    def render(self, named_models, path, fmt=None, title=None):
+        traces = self.draw(named_models, title=title)
+        self.save(path, fmt=fmt)
+        return traces
+
+
+def render_design(model, path, name="Av", fmt=None, **kwargs):
+    # Tiện dụng cho một thiết kế; vẽ nhiều ảnh thì nên giữ một BodeRenderer
+    return BodeRenderer(**kwargs).render([(name, model)], path, fmt=fmt, title=name)
+
+
+# --- VẼ HÀNG LOẠT (chạy trong process con) ---
+# Mỗi process giữ một BodeRenderer suốt đời, tạo trong initializer
+_renderer = None
+
+
+def _init_worker(figsize, dpi, n_points, adaptive):
+    global _renderer
+    _renderer = BodeRenderer(figsize=figsize, dpi=dpi, n_points=n_points, adaptive=adaptive)
+
+
+def render_job(name, design, path, fmt):
+    # -> (tên, đường dẫn hoặc None, lỗi hoặc None). Lỗi của một thiết kế không làm dừng cả lô
+    try:
+        model = bode_model.SystemModel.from_dict(design)
+        _renderer.render([(name, model)], path, fmt=fmt, title=name)
+        return name, path, None
+    except (ValueError, KeyError, TypeError) as e:
+        return name, None, str(e)
+
+
+def _jobs(designs, out_dir, fmt):
+    # (tên, dict thiết kế, đường dẫn ảnh); tên trùng được thêm hậu tố để không ghi đè
+    used = set()
+    for i, d in enumerate(designs):
+        name = d.get("name") or f"design{i}"
+        stem = bode_cli.safe_filename(name)
+        k = 1
+        while stem in used:
+            k += 1
+            stem = f"{bode_cli.safe_filename(name)}_{k}"
+        used.add(stem)
+        yield name, d, os.path.join(out_dir, f"{stem}.{fmt}")
+
+
+def render_batch(designs, out_dir, fmt="png", workers=None, figsize=FIGSIZE, dpi=DPI,
+                 n_points=bode_engine.N_POINTS, adaptive=False, chunksize=8):
+    # designs: iterable dict thiết kế (như bode_model.iter_design_dicts). Trả về lần lượt
+    # (tên, đường dẫn hoặc None, lỗi hoặc None) theo thứ tự đầu vào. workers <= 1 vẽ tuần tự
+    # trong process hiện tại; mặc định mỗi nhân một process, mỗi process một figure.
+    if fmt not in FORMATS:
+        raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = _jobs(designs, out_dir, fmt)
+    workers = os.cpu_count() if workers is None else workers
+    init_args = (figsize, dpi, n_points, adaptive)
+    if workers <= 1:
+        _init_worker(*init_args)
+        for name, d, path in jobs:
+            yield render_job(name, d, path, fmt)
+        return
+    # "spawn": giống Monte Carlo, process con không kế thừa trạng thái Tk nếu gọi từ giao diện.
+    # Gửi theo cụm chunksize thiết kế để giảm chi phí IPC
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=init_args) as pool:
+        names, ds, paths = [], [], []
+        for name, d, path in jobs:
+            names.append(name); ds.append(d); paths.append(path)
+        yield from pool.map(render_job, names, ds, paths, [fmt] * len(names), chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vẽ đồ thị Bode (Gain & Phase) của các thiết kế ra file ảnh, không cần giao diện.")
+    parser.add_argument("inputs", nargs="+", help="File thiết kế (.json, .jsonl, .csv) hoặc '-' để đọc JSON Lines từ stdin")
+    parser.add_argument("-o", "--output", default="plots",
+                        help="Thư mục ảnh (mỗi thiết kế một ảnh), hoặc file ảnh khi dùng --overlay")
+    parser.add_argument("--format", choices=FORMATS, default="png", help="Định dạng ảnh (mặc định png)")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định số nhân CPU, 0 hoặc 1 = tuần tự)")
+    parser.add_argument("--chunksize", type=int, default=8, help="Số thiết kế mỗi lần gửi cho một process")
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("--size", type=float, nargs=2, default=FIGSIZE, metavar=("W", "H"), help="Kích thước ảnh (inch)")
+    parser.add_argument("--points", type=int, default=bode_engine.N_POINTS, help="Số điểm tần số")
+    parser.add_argument("--adaptive", action="store_true", help="Dùng lưới tần số thích ứng")
+    parser.add_argument("--overlay", action="store_true", help="Vẽ mọi thiết kế chồng lên một ảnh để so sánh")
+    args = parser.parse_args(argv)
+
+    designs = (d for path in args.inputs for d in bode_model.iter_design_dicts(path))
+    t0 = time.perf_counter()
+    if args.overlay:
+        named = list(bode_cli.iter_valid(designs, sys.stderr))
+        renderer = BodeRenderer(figsize=tuple(args.size), dpi=args.dpi, n_points=args.points, adaptive=args.adaptive)
+        renderer.render(named, args.output, fmt=os.path.splitext(args.output)[1][1:] or args.format)
+        print(f"Đã vẽ {len(named)} thiết kế vào {args.output}.", file=sys.stderr)
+        return 0
+
+    count = 0
+    for name, path, err in render_batch(designs, args.output, fmt=args.format, workers=args.workers,
+                                        figsize=tuple(args.size), dpi=args.dpi, n_points=args.points,
+                                        adaptive=args.adaptive, chunksize=args.chunksize):
+        if err is not None:
+            print(f"[bỏ qua] {name}: {err}", file=sys.stderr)
+        else:
+            count += 1
+    dt = time.perf_counter() - t0
+    print(f"Đã vẽ {count} ảnh vào {args.output} trong {dt:.1f} s ({count / max(dt, 1e-9):.1f} ảnh/s).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
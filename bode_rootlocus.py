@@ -0,0 +1,134 @@
+"""Quỹ đạo nghiệm (root locus): pole vòng kín của 1 + L(s) khi quét Gain DC hoặc tụ Miller Cc."""
+import numpy as np
+
+import bode_miller
+
+
+def _scale(poles_2d, zeros_2d):
+    # Đổi biến u = s / w0 (w0 = trung bình nhân |pole|, |zero|) để hệ số đa thức không chênh lệch quá lớn
+    roots = np.abs(np.concatenate([poles_2d.ravel(), zeros_2d.ravel()]))
+    roots = roots[roots > 0]
+    return float(np.exp(np.mean(np.log(roots)))) if len(roots) else 1.0
+
+
+def _factor_poly(roots_2d, degree):
+    # Hệ số (tăng dần theo bậc u) của prod(1 - u/r) cho từng hàng, đệm 0 tới `degree`
+    S = roots_2d.shape[0]
+    c = np.zeros((S, degree + 1), dtype=complex)
+    c[:, 0] = 1.0
+    for k in range(roots_2d.shape[1]):
+        inv = (1.0 / roots_2d[:, k])[:, None]
+        c[:, 1:k + 2] = c[:, 1:k + 2] - c[:, 0:k + 1] * inv
+    return c
+
+
+def closed_loop_poles(gains, poles_2d, zeros_2d):
+    # gains (S,), poles_2d (S, n), zeros_2d (S, m) rad/s -> nghiệm (S, max(n, m)) của
+    # prod(1 - s/p) + A0 * prod(1 - s/z) = 0, giải một lần bằng eigvals trên chồng ma trận đồng hành
+    gains = np.asarray(gains, dtype=float)
+    poles_2d = np.asarray(poles_2d, dtype=complex)
+    zeros_2d = np.asarray(zeros_2d, dtype=complex)
+    S, n = poles_2d.shape
+    m = zeros_2d.shape[1]
+    d = max(n, m)
+    if d == 0:
+        return np.empty((S, 0), dtype=complex)
+    w0 = _scale(poles_2d, zeros_2d)
+    a = _factor_poly(poles_2d / w0, d) + gains[:, None] * _factor_poly(zeros_2d / w0, d)
+
+    # Bậc cao nhất bằng 0 (vd. m > n với gain = 0) -> hạ bậc, đệm NaN cho đủ cột
+    lead = np.abs(a) > 1e-300
+    deg = np.where(lead.any(axis=1), d - np.argmax(lead[:, ::-1], axis=1), 0)
+    out = np.full((S, d), np.nan, dtype=complex)
+    for dk in np.unique(deg):
+        rows = np.nonzero(deg == dk)[0]
+        if dk == 0:
+            continue
+        coef = a[rows, :dk + 1]
+        comp = np.zeros((len(rows), dk, dk), dtype=complex)
+        comp[:, 0, :] = -coef[:, dk - 1::-1] / coef[:, dk:dk + 1]
+        comp[:, np.arange(1, dk), np.arange(dk - 1)] = 1.0
+        out[rows, :dk] = np.linalg.eigvals(comp) * w0
+    return out
+
+
+def track_branches(roots):
+    # Sắp lại cột của từng điểm quét để mỗi cột là một nhánh liên tục:
+    # ghép tham lam các cặp (nghiệm trước, nghiệm mới) theo khoảng cách tăng dần.
+    # Phép ghép giữa hai điểm quét liền nhau không phụ thuộc thứ tự cột đã sắp, nên mọi cặp điểm
+    # được ghép cùng lúc trên khối khoảng cách (S-1, d, d) bằng d lần argmin; chỉ bước hợp các
+    # hoán vị (mảng độ dài d) là tuần tự
+    roots = np.asarray(roots)
+    S, d = roots.shape
+    if S < 2 or d < 2:
+        return roots.copy()
+    dist = np.abs(roots[:-1, :, None] - roots[1:, None, :])
+    # NaN (nghiệm không tồn tại) ghép sau cùng; inf đánh dấu hàng/cột đã dùng
+    dist[np.isnan(dist)] = np.finfo(float).max
+    steps = np.arange(S - 1)
+    match = np.empty((S - 1, d), dtype=int)     # match[k, i]: cột của điểm k+1 nối với cột i của điểm k
+    for _ in range(d):
+        i, j = np.divmod(np.argmin(dist.reshape(S - 1, -1), axis=1), d)
+        match[steps, i] = j
+        dist[steps, i, :] = np.inf
+        dist[steps, :, j] = np.inf
+    out = np.empty_like(roots)
+    out[0] = roots[0]
+    order = np.arange(d)
+    for k in range(S - 1):
+        order = match[k, order]
+        out[k + 1] = roots[k + 1, order]
+    return out
+
+
+def overshoot_pct(zeta):
+    # Độ vọt lố đáp ứng bước của cặp pole bậc hai với hệ số tắt dần zeta
+    zeta = np.clip(np.asarray(zeta, dtype=float), 0.0, None)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        os_ = 100 * np.exp(-np.pi * zeta / np.sqrt(1 - zeta**2))
+    return np.where(zeta < 1, os_, 0.0)
+
+
+def dominant_damping(roots):
+    # Pole trội = pole gần trục ảo nhất (phần thực lớn nhất). Trả về zeta, wn (rad/s), ổn định hay không
+    re = np.where(np.isnan(roots.real), -np.inf, roots.real)
+    idx = np.argmax(re, axis=1)
+    dom = roots[np.arange(len(roots)), idx]
+    wn = np.abs(dom)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zeta = np.where(wn > 0, -dom.real / wn, 1.0)
+    return zeta, wn, re.max(axis=1) < 0
+
+
+class RootLocus:
+    def __init__(self, param, values, roots, poles, zeros):
+        self.param = param          # "gain" hoặc "cc"
+        self.values = values        # (S,) giá trị quét
+        self.roots = roots          # (S, d) pole vòng kín, mỗi cột một nhánh
+        self.open_poles = poles     # pole/zero vòng hở tại điểm làm việc hiện tại
+        self.open_zeros = zeros
+        self.zeta, self.wn, self.stable = dominant_damping(roots)
+        self.overshoot = overshoot_pct(self.zeta)
+
+    def at(self, value):
+        # Chỉ số điểm quét gần giá trị (theo thang log) nhất
+        value = max(value, self.values[0])
+        return int(np.argmin(np.abs(np.log10(self.values) - np.log10(value))))
+
+
+def sweep_gain(model, gain_values):
+    gain_values = np.asarray(gain_values, dtype=float)
+    S = len(gain_values)
+    P = np.broadcast_to(model.poles_rad(), (S, model.count("P")))
+    Z = np.broadcast_to(model.zeros_rad(), (S, model.count("Z")))
+    roots = track_branches(closed_loop_poles(gain_values, P, Z))
+    return RootLocus("gain", gain_values, roots, model.poles_rad(), model.zeros_rad())
+
+
+def sweep_cc(model, cc_values):
+    cc_values = np.asarray(cc_values, dtype=float)
+    S = len(cc_values)
+    P = bode_miller.miller_poles_rad(model, cc_values, np.full(S, model.miller_av2))
+    Z = np.broadcast_to(model.zeros_rad(), (S, model.count("Z")))
+    roots = track_branches(closed_loop_poles(np.full(S, model.gain_val), P, Z))
+    return RootLocus("cc", cc_values, roots, model.poles_rad(), model.zeros_rad())
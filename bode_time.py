@@ -0,0 +1,182 @@
+"""Đáp ứng bước / xung (vòng hở và vòng kín) tính giải tích từ tập pole/zero, không phụ thuộc Tk."""
+import numpy as np
+
+import bode_rootlocus
+
+N_TIME_POINTS = 500
+# Hai pole cách nhau (tương đối) dưới ngưỡng này coi như pole lặp -> phân thức từng phần mất ổn định số
+REPEATED_TOL = 1e-4
+
+
+class TimeResponse:
+    # t (s), step và impulse trên cùng lưới. Khi bậc tử = bậc mẫu, xung còn thêm thành phần
+    # direct * delta(t) không vẽ được; method: "residue" hoặc "expm" (phương án dự phòng)
+    def __init__(self, t, step, impulse, direct, method):
+        self.t = t
+        self.step = step
+        self.impulse = impulse
+        self.direct = direct
+        self.method = method
+
+    @property
+    def final_value(self):
+        return float(self.step[-1])
+
+    @property
+    def overshoot_pct(self):
+        # Độ vọt lố so với giá trị xác lập (chỉ có nghĩa khi hệ ổn định)
+        final = self.final_value
+        if final == 0 or not np.all(np.isfinite(self.step)):
+            return None
+        peak = np.max(self.step / final)
+        return float(max(peak - 1, 0) * 100)
+
+    def settling_time(self, band=0.02):
+        # Thời điểm cuối cùng đáp ứng bước còn nằm ngoài dải ±band quanh giá trị xác lập
+        final = self.final_value
+        outside = np.nonzero(np.abs(self.step - final) > band * abs(final))[0]
+        if len(outside) == 0:
+            return 0.0
+        if outside[-1] == len(self.t) - 1:
+            return None
+        return float(self.t[outside[-1] + 1])
+
+
+# --- LƯỚI THỜI GIAN ---
+def time_grid(poles, n_points=N_TIME_POINTS):
+    # Đủ dài cho pole chậm nhất tắt ~8 hằng số thời gian, nhưng không quá ~40 chu kỳ
+    # dao động của pole đó (pole gần trục ảo / không ổn định)
+    poles = np.asarray(poles, dtype=complex)
+    poles = poles[np.isfinite(poles) & (np.abs(poles) > 0)]
+    if len(poles) == 0:
+        return np.linspace(0.0, 1.0, n_points)
+    slow = poles[np.argmin(np.abs(poles))]
+    decay = max(abs(slow.real), 1e-300)
+    t_end = min(8.0 / decay, 40 * 2 * np.pi / abs(slow))
+    return np.linspace(0.0, t_end, n_points)
+
+
+# --- PHÂN THỨC TỪNG PHẦN ---
+# H(s) = K * prod(1 - s/z) / prod(1 - s/p) = direct + sum r_j / (s - p_j)
+def _residues(gain, poles, zeros):
+    # (s - p_j) / (1 - s/p_j) = -p_j, nên r_j = -p_j * K * prod(1 - p_j/z) / prod_{k != j}(1 - p_j/p_k)
+    ratio = 1 - poles[:, None] / poles[None, :]
+    np.fill_diagonal(ratio, 1.0)
+    num = np.prod(1 - poles[:, None] / zeros[None, :], axis=1) if len(zeros) else np.ones(len(poles))
+    return -poles * gain * num / np.prod(ratio, axis=1)
+
+
+def _direct(gain, poles, zeros):
+    # H(oo): khác 0 chỉ khi số zero bằng số pole
+    if len(zeros) < len(poles):
+        return 0.0
+    return gain * np.prod(poles / zeros)
+
+
+def _is_repeated(poles):
+    if len(poles) < 2:
+        return False
+    sep = np.abs(poles[:, None] - poles[None, :])
+    scale = np.maximum(np.abs(poles[:, None]), np.abs(poles[None, :]))
+    np.fill_diagonal(sep, np.inf)
+    return bool(np.any(sep < REPEATED_TOL * scale))
+
+
+def _residue_response(gain, poles, zeros, t):
+    r = _residues(gain, poles, zeros)
+    d = _direct(gain, poles, zeros)
+    pt = t[:, None] * poles[None, :]
+    impulse = np.exp(pt) @ r
+    # Bước: d + sum r_j/p_j * (e^{p_j t} - 1); expm1 giữ chính xác khi p_j t nhỏ
+    step = d + np.expm1(pt) @ (r / poles)
+    return step.real, impulse.real, d
+
+
+# --- DỰ PHÒNG: CHUỖI KHÂU BẬC MỘT + HÀM MŨ MA TRẬN ---
+def _cascade_ss(gain, poles, zeros):
+    # Ghép nối tiếp các khâu (1 - s/z_j)/(1 - s/p_j) rồi 1/(1 - s/p_j): mỗi khâu có trạng thái
+    # x' = p x - p u và đầu ra (p/z) u + (1 - p/z) x. Ma trận A tam giác dưới, không chia cho
+    # hiệu hai pole nên pole lặp không gây vấn đề.
+    n = len(poles)
+    A = np.zeros((n, n), dtype=complex)
+    B = np.zeros(n, dtype=complex)
+    # Đầu vào của khâu hiện tại = cu · x + du · u
+    cu = np.zeros(n, dtype=complex)
+    du = complex(gain)
+    for j, p in enumerate(poles):
+        A[j] = -p * cu
+        A[j, j] += p
+        B[j] = -p * du
+        d_j, e_j = (p / zeros[j], 1 - p / zeros[j]) if j < len(zeros) else (0.0, 1.0)
+        cu = d_j * cu
+        cu[j] += e_j
+        du = d_j * du
+    return A, B, cu, du
+
+
+def _expm(M):
+    # Scaling and squaring + Taylor bậc 16 (đủ chính xác cho ma trận nhỏ của hệ RC)
+    norm = np.max(np.sum(np.abs(M), axis=1)) if M.size else 0.0
+    k = max(0, int(np.ceil(np.log2(norm))) + 1) if norm > 0.5 else 0
+    X = M / 2**k
+    E = np.eye(len(M), dtype=M.dtype)
+    term = E.copy()
+    for i in range(1, 17):
+        term = term @ X / i
+        E = E + term
+    for _ in range(k):
+        E = E @ E
+    return E
+
+
+def _expm_response(gain, poles, zeros, t):
+    # Lưới t đều: rời rạc hóa chính xác (ZOH với đầu vào bước) bằng expm của ma trận mở rộng
+    A, B, C, D = _cascade_ss(gain, poles, zeros)
+    n = len(poles)
+    dt = t[1] - t[0]
+    M = np.zeros((n + 1, n + 1), dtype=complex)
+    M[:n, :n] = A * dt
+    M[:n, n] = B * dt
+    E = _expm(M)
+    Phi, Gam = E[:n, :n], E[:n, n]
+    xs = np.zeros(n, dtype=complex)
+    xi = B.copy()
+    step = np.empty(len(t))
+    impulse = np.empty(len(t))
+    for k in range(len(t)):
+        step[k] = (C @ xs + D).real
+        impulse[k] = (C @ xi).real
+        xs = Phi @ xs + Gam
+        xi = Phi @ xi
+    return step, impulse, D
+
+
+def zpk_time_response(gain, poles, zeros, t=None, n_points=N_TIME_POINTS):
+    # Cần số zero <= số pole (hệ hợp thức); dùng phân thức từng phần, chuyển sang expm khi pole lặp
+    poles = np.asarray(poles, dtype=complex)
+    zeros = np.asarray(zeros, dtype=complex)
+    if len(zeros) > len(poles):
+        raise ValueError("Hệ không hợp thức (số Zero nhiều hơn số Pole).")
+    t = time_grid(poles, n_points) if t is None else np.asarray(t, dtype=float)
+    if len(poles) == 0:
+        return TimeResponse(t, np.full(len(t), float(gain)), np.zeros(len(t)), float(gain), "residue")
+    if _is_repeated(poles) or np.any(poles == 0):
+        step, impulse, d = _expm_response(gain, poles, zeros, t)
+        method = "expm"
+    else:
+        step, impulse, d = _residue_response(gain, poles, zeros, t)
+        method = "residue"
+    return TimeResponse(t, step, impulse, complex(d).real, method)
+
+
+def open_loop(gain, poles, zeros, n_points=N_TIME_POINTS):
+    return zpk_time_response(gain, poles, zeros, n_points=n_points)
+
+
+def closed_loop(gain, poles, zeros, beta=1.0, n_points=N_TIME_POINTS):
+    # Hồi tiếp beta: T = A / (1 + beta*A), cùng zero với A, pole là pole vòng kín của độ lợi vòng
+    # beta*A (bode_rootlocus), hệ số DC A0 / (1 + beta*A0). beta = 1: hồi tiếp đơn vị.
+    # T luôn hợp thức kể cả khi A có nhiều zero hơn pole.
+    cl = bode_rootlocus.closed_loop_poles([beta * gain], np.asarray(poles)[None], np.asarray(zeros)[None])[0]
+    cl = cl[np.isfinite(cl)]
+    return zpk_time_response(gain / (1 + beta * gain), cl, zeros, n_points=n_points)
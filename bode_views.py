@@ -0,0 +1,249 @@
+"""Các đồ thị phụ ngoài Bode (root locus, Nyquist, Nichols, đáp ứng thời gian), mỗi đồ thị vẽ trên một Figure riêng."""
+import numpy as np
+
+import bode_metrics
+import bode_time
+
+
+# --- ROOT LOCUS ---
+class RootLocusView:
+    # Trục thực/ảo dùng thang symlog vì pole vòng kín trải qua nhiều decade
+    PARAM_LABELS = {"gain": "Gain DC", "cc": "Cc (F)"}
+
+    def __init__(self, fig):
+        self.fig = fig
+        self.ax = fig.add_subplot(111)
+
+    def render(self, locus, sys, current_value, pm=None):
+        ax = self.ax
+        ax.clear()
+        roots = locus.roots
+        for col in range(roots.shape[1]):
+            ax.plot(roots[:, col].real, roots[:, col].imag, lw=1.5)
+        ax.plot(locus.open_poles.real, locus.open_poles.imag, 'x', color='k', ms=9, mew=2, label='Pole vòng hở')
+        if len(locus.open_zeros):
+            ax.plot(locus.open_zeros.real, locus.open_zeros.imag, 'o', mfc='none', color='k', ms=9, mew=2,
+                    label='Zero vòng hở')
+        i = locus.at(current_value)
+        cur = roots[i]
+        ax.plot(cur.real, cur.imag, 'o', color=sys.color, ms=7, label='Điểm làm việc')
+
+        mags = np.abs(roots[np.isfinite(roots)])
+        linthresh = max(float(np.min(mags[mags > 0])) / 10, 1e-12) if np.any(mags > 0) else 1.0
+        ax.set_xscale('symlog', linthresh=linthresh)
+        ax.set_yscale('symlog', linthresh=linthresh)
+        ax.axvline(0, color='gray', lw=1)
+        ax.axhline(0, color='gray', lw=1)
+        ax.grid(True, which="major", alpha=0.5)
+        ax.set_xlabel('Re (rad/s)'); ax.set_ylabel('Im (rad/s)')
+        ax.set_title(f"Root Locus [{sys.name}] theo {self.PARAM_LABELS[locus.param]}")
+        ax.legend(fontsize='small', loc='upper left')
+
+        zeta, wn = locus.zeta[i], locus.wn[i]
+        lines = [f"{self.PARAM_LABELS[locus.param]} = {locus.values[i]:.3g}",
+                 "Ổn định" if locus.stable[i] else "KHÔNG ổn định (pole vòng kín ở RHP)",
+                 f"Pole trội: ζ = {zeta:.3f}, ωn = {wn:.3e} rad/s",
+                 f"Vọt lố dự đoán: {locus.overshoot[i]:.1f}%"]
+        if pm is not None:
+            # Xấp xỉ kinh điển cho hệ bậc hai: ζ ≈ PM/100
+            lines.append(f"Từ PM {pm:.1f}°: ζ ≈ {pm / 100:.2f}")
+        ax.text(0.98, 0.02, "\n".join(lines), transform=ax.transAxes, fontsize=9, va='bottom', ha='right',
+                bbox=dict(boxstyle='round', facecolor='white', alpha=0.9))
+        self.fig.canvas.draw_idle()
+
+
+# --- NYQUIST / NICHOLS: dùng lại log H của trace, không tính lại đáp ứng ---
+def _loop_log_h(trace):
+    # log của độ lợi vòng L = beta*A khi hệ có beta, ngược lại hồi tiếp đơn vị L = A
+    return trace.resp.log_h if trace.beta is None else trace.resp.log_h + np.log(trace.beta)
+
+
+def _loop_label(traces):
+    return "L = βA" if any(t.beta is not None for t in traces) else "L = A"
+
+
+class _CurveView:
+    # Mỗi hệ một (vài) Line2D tái sử dụng; chỉ dựng lại khi danh sách hệ / màu / tên đổi,
+    # còn lại chỉ set_data nên vẽ lại được ở mọi khung (kể cả khung nhanh khi kéo).
+    # curve(trace) -> [(x, y), ...]: một cặp cho mỗi đường của hệ; line_styles: tham số riêng của
+    # từng đường (đường đầu tiên mang tên hệ trong chú thích). Tiêu đề / nhãn trục y có thể đổi theo
+    # các hệ hoặc chế độ đang vẽ: lớp con ghi đè _axis_labels()
+    def __init__(self, fig, curve, xlabel, ylabel, title="", line_styles=({},)):
+        self.fig = fig
+        self.ax = fig.add_subplot(111)
+        self.curve = curve
+        self.xlabel, self.ylabel, self.title = xlabel, ylabel, title
+        self.line_styles = line_styles
+        self._sig = None
+        self._lines = {}
+        self.info = None
+
+    def _setup_axes(self):
+        ax = self.ax
+        ax.axhline(0, color='gray', lw=1)
+        ax.grid(True, alpha=0.5)
+        ax.set_xlabel(self.xlabel)
+
+    def _axis_labels(self, traces):
+        # -> (tiêu đề, nhãn trục y)
+        return self.title, self.ylabel
+
+    def _make_lines(self, sys):
+        lines = []
+        for k, style in enumerate(self.line_styles):
+            kw = dict(color=sys.color, ls=sys.line_style, lw=2)
+            if k == 0:
+                kw["label"] = sys.name
+            kw.update(style)
+            lines.append(self.ax.plot([], [], **kw)[0])
+        return lines
+
+    def _info_text(self, traces):
+        return None
+
+    def render(self, traces):
+        sig = tuple((t.key, t.sys.name, t.sys.color, t.sys.line_style) for t in traces)
+        if sig != self._sig:
+            self._sig = sig
+            self.ax.clear()
+            self._setup_axes()
+            self._lines = {t.key: self._make_lines(t.sys) for t in traces}
+            self.info = self.ax.text(0.98, 0.02, "", transform=self.ax.transAxes, fontsize=9, va='bottom',
+                                     ha='right', bbox=dict(boxstyle='round', facecolor='white', alpha=0.9))
+            if traces:
+                self.ax.legend(fontsize='small', loc='upper left')
+        for t in traces:
+            for line, (x, y) in zip(self._lines[t.key], self.curve(t)):
+                line.set_data(x, y)
+        title, ylabel = self._axis_labels(traces)
+        self.ax.set_title(title); self.ax.set_ylabel(ylabel)
+        text = self._info_text(traces)
+        self.info.set_text(text or "")
+        self.info.set_visible(bool(text))
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.fig.canvas.draw_idle()
+
+
+class NyquistView(_CurveView):
+    # Vẽ độ lợi vòng L (βA nếu hệ có β). |L| của mạch khuếch đại trải nhiều decade nên bán kính
+    # được nén log: r = log10(1 + |L|), góc giữ nguyên. Điểm -1 nằm ở (-log10 2, 0) và đường tròn |H| = 1 có bán kính log10 2,
+    # phép nén giữ thứ tự bán kính nên số vòng bao -1 không đổi.
+    R_UNIT = np.log10(2.0)
+
+    def __init__(self, fig):
+        super().__init__(fig, self._curve, 'Re (thang log-nén)', 'Im (thang log-nén)',
+                         'Nyquist {loop}  (r = log10(1 + |L|), nét đứt: ω < 0)',
+                         line_styles=({}, dict(ls='--', lw=1, alpha=0.6)))
+
+    def _setup_axes(self):
+        super()._setup_axes()
+        ax = self.ax
+        th = np.linspace(0, 2 * np.pi, 181)
+        ax.plot(self.R_UNIT * np.cos(th), self.R_UNIT * np.sin(th), color='gray', ls=':', lw=1, label='|L| = 1')
+        ax.plot([-self.R_UNIT], [0], '+', color='red', ms=12, mew=2, label='-1')
+        ax.axvline(0, color='gray', lw=1)
+        ax.set_aspect('equal', adjustable='datalim')
+
+    @staticmethod
+    def _curve(trace):
+        log_h = _loop_log_h(trace)
+        # log10(1 + |L|) tính thẳng từ log|L| để không tràn số khi |L| rất lớn
+        r = np.logaddexp(0.0, log_h.real) / np.log(10.0)
+        x, y = r * np.cos(log_h.imag), r * np.sin(log_h.imag)
+        return [(x, y), (x, -y)]
+
+    def _axis_labels(self, traces):
+        return self.title.format(loop=_loop_label(traces)), self.ylabel
+
+    def _info_text(self, traces):
+        rows = []
+        for t in traces:
+            n = bode_metrics.nyquist_encirclements(_loop_log_h(t))
+            # Pole vòng hở luôn ở LHP (P = 0) nên số pole vòng kín ở RHP Z = N
+            state = "ổn định" if n == 0 else f"KHÔNG ổn định, {n} pole vòng kín ở RHP"
+            rows.append(f"{t.sys.name}: N = {n} vòng quanh -1 ({state})")
+        return "\n".join(rows)
+
+
+class NicholsView(_CurveView):
+    # Độ lợi vòng L (βA nếu hệ có β): pha (đã unwrap) theo trục x, biên độ dB theo trục y;
+    # điểm tới hạn (-180° + k·360°, 0 dB)
+    def __init__(self, fig):
+        super().__init__(fig, lambda t: [(t.resp.phase_deg, _loop_log_h(t).real * bode_metrics.DB_PER_NEPER)],
+                         'Phase (deg)', 'Gain (dB)', 'Nichols {loop}')
+
+    def _axis_labels(self, traces):
+        return self.title.format(loop=_loop_label(traces)), self.ylabel
+
+    def _setup_axes(self):
+        super()._setup_axes()
+        self._crit, = self.ax.plot([], [], '+', color='red', ms=12, mew=2, label='Điểm tới hạn')
+
+    def render(self, traces):
+        super().render(traces)
+        # Điểm tới hạn cho mọi bội 360° nằm trong khoảng pha đang vẽ
+        if traces:
+            ph = np.concatenate([t.resp.phase_deg for t in traces])
+            k = np.arange(np.ceil((ph.min() + 180) / 360), np.floor((ph.max() + 180) / 360) + 1)
+            self._crit.set_data(k * 360 - 180, np.zeros(len(k)))
+
+
+class TimeResponseView(_CurveView):
+    # Đáp ứng bước/xung vòng hở hoặc vòng kín (hồi tiếp β của hệ, đơn vị nếu chưa đặt β) tính giải
+    # tích từ pole/zero của trace; độ vọt lố đặt cạnh PM của độ lợi vòng để đối chiếu
+    MODES = {"cl_step": "Vòng kín - bước", "cl_impulse": "Vòng kín - xung",
+             "ol_step": "Vòng hở - bước", "ol_impulse": "Vòng hở - xung"}
+
+    def __init__(self, fig):
+        super().__init__(fig, self._curve, 't (s)', 'y(t)')
+        self.mode = "cl_step"
+        self.responses = {}
+
+    def _setup_axes(self):
+        super()._setup_axes()
+        self.ax.ticklabel_format(axis='x', style='sci', scilimits=(-3, 3))
+
+    @staticmethod
+    def compute(traces, mode):
+        # {key: TimeResponse, hoặc None nếu hệ không hợp thức}; không đụng tới Figure nên
+        # giao diện gọi được trên luồng nền rồi đưa kết quả vào render()
+        out = {}
+        for t in traces:
+            try:
+                if mode.startswith("cl"):
+                    out[t.key] = bode_time.closed_loop(t.gain, t.poles_rad, t.zeros_rad,
+                                                       beta=1.0 if t.beta is None else t.beta)
+                else:
+                    out[t.key] = bode_time.open_loop(t.gain, t.poles_rad, t.zeros_rad)
+            except ValueError:
+                out[t.key] = None
+        return out
+
+    def render(self, traces, responses=None):
+        self.responses = self.compute(traces, self.mode) if responses is None else responses
+        super().render(traces)
+
+    def _curve(self, trace):
+        resp = self.responses.get(trace.key)
+        if resp is None:
+            return [([], [])]
+        return [(resp.t, resp.step if self.mode.endswith("step") else resp.impulse)]
+
+    def _axis_labels(self, traces):
+        return f"Đáp ứng thời gian: {self.MODES[self.mode]}", 'y(t)' if self.mode.endswith("step") else 'h(t)'
+
+    def _info_text(self, traces):
+        rows = []
+        for t in traces:
+            resp = self.responses.get(t.key)
+            if resp is None:
+                rows.append(f"{t.sys.name}: hệ không hợp thức (Zero nhiều hơn Pole)")
+                continue
+            pm = t.metrics.pm if t.beta is None else t.closed_loop(t.beta)[1].loop.pm
+            os_ = resp.overshoot_pct
+            ts = resp.settling_time()
+            rows.append(f"{t.sys.name}: vọt lố " + (f"{os_:.1f}%" if os_ is not None else "N/A")
+                        + ", ts(2%) " + (f"{ts:.3g} s" if ts is not None else "> cửa sổ")
+                        + (f", PM {pm:.1f}°" if pm is not None else ""))
+        return "\n".join(rows)
@@ -0,0 +1,79 @@
+"""Luồng tính toán nền: nhận yêu cầu có đánh số phiên bản, bỏ yêu cầu đã bị thay thế."""
+import threading
+
+
+class ComputeWorker:
+    # Chỉ giữ một yêu cầu chờ: yêu cầu mới thay thế yêu cầu chưa bắt đầu. Kết quả được
+    # luồng chính lấy bằng poll() (gọi từ root.after), nên Tk không bao giờ bị gọi từ luồng này.
+    # threaded=False: chạy ngay trong submit() (dùng khi không có giao diện hoặc để kiểm thử).
+    def __init__(self, threaded=True):
+        self.threaded = threaded
+        self.stats = {"submitted": 0, "superseded": 0, "completed": 0}
+        self._cond = threading.Condition()
+        self._version = 0
+        self._pending = None     # (version, job)
+        self._running = False
+        self._done = []          # (version, result, error)
+        self._thread = None
+
+    def submit(self, job, merge=None):
+        # job(): hàm không tham số, chạy trên luồng nền. merge(old_job, job) được gọi khi job
+        # thay thế một yêu cầu chưa chạy, để gộp thông tin (vd. cờ vẽ đầy đủ) của yêu cầu cũ.
+        with self._cond:
+            self._version += 1
+            self.stats["submitted"] += 1
+            if self._pending is not None:
+                self.stats["superseded"] += 1
+                if merge is not None:
+                    merge(self._pending[1], job)
+            self._pending = (self._version, job)
+            version = self._version
+            if self.threaded:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="bode-worker", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+        if not self.threaded:
+            self._run_pending()
+        return version
+
+    def _run_pending(self):
+        with self._cond:
+            if self._pending is None:
+                return False
+            version, job = self._pending
+            self._pending = None
+            self._running = True
+        try:
+            result, error = job(), None
+        except Exception as e:
+            result, error = None, e
+        with self._cond:
+            self._running = False
+            self.stats["completed"] += 1
+            self._done.append((version, result, error))
+        return True
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+            self._run_pending()
+
+    @property
+    def version(self):
+        # Phiên bản của yêu cầu mới nhất đã gửi
+        return self._version
+
+    @property
+    def busy(self):
+        # Còn yêu cầu chờ/đang chạy hoặc kết quả chưa được poll()
+        with self._cond:
+            return self._pending is not None or self._running or bool(self._done)
+
+    def poll(self):
+        # Các kết quả đã xong kể từ lần poll trước, theo thứ tự phiên bản
+        with self._cond:
+            done, self._done = self._done, []
+        return done
@@ -0,0 +1,22 @@
+"""Kiểm tra bode_cli: thiết kế lỗi bị bỏ qua kèm thông báo, các thiết kế còn lại vẫn được đánh giá."""
+import json
+
+import pytest
+
+import bode_cli
+
+
+@pytest.mark.parametrize("gain", [0, -1000.0, "nan"])
+def test_rejects_non_positive_gain(tmp_path, capsys, gain):
+    designs = tmp_path / "d.jsonl"
+    rows = [{"name": "ok", "gain": 1e3, "poles": [[1e3, 1e-6]]},
+            {"name": "bad", "gain": gain, "poles": [[1e3, 1e-6]]}]
+    designs.write_text("\n".join(json.dumps(r) for r in rows) + "\n", encoding="utf-8")
+    out = tmp_path / "out.jsonl"
+
+    assert bode_cli.main([str(designs), "-o", str(out)]) == 0
+
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["name"] for r in records] == ["ok"]
+    err = capsys.readouterr().err
+    assert "[bỏ qua] bad: gain phải dương" in err
@@ -0,0 +1,31 @@
+"""Kiểm tra Monte Carlo: cùng seed cho cùng các mẫu, bất kể số process hay kích thước lô."""
+import numpy as np
+
+import bode_engine
+import bode_model
+import bode_montecarlo as mc
+
+
+def _model():
+    return bode_model.SystemModel.from_dict({"gain": 1e3, "poles": [[1e5, 1e-12], [1e3, 1e-12], [10, 1e-9]]})
+
+
+def _run(**kwargs):
+    model = _model()
+    f = bode_engine.frequency_grid(model.poles_rad(), n_points=200)
+    return mc.run_monte_carlo(model, f, mc.ToleranceSpec(), 1050, seed=1, **kwargs)
+
+
+def test_same_seed_same_samples_for_any_worker_count():
+    a = _run(workers=0)
+    b = _run(workers=2)
+    assert not a.errors and not b.errors
+    for k in ("pm", "fc", "gm", "bw", "mag_lo", "mag_hi", "phase_lo", "phase_hi"):
+        np.testing.assert_array_equal(getattr(a, k), getattr(b, k))
+
+
+def test_chunk_only_groups_seed_blocks():
+    a = _run(workers=0, chunk=200)
+    b = _run(workers=0, chunk=5000)
+    np.testing.assert_array_equal(a.pm, b.pm)
+    np.testing.assert_array_equal(a.fc, b.fc)